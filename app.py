@@ -7,6 +7,20 @@ import numpy as np
 from datetime import datetime, timedelta
 import os
 
+from utils.agendador import agendador_precomputo
+from utils.alertas_estoque import LIMITE_ALERTAS, TOP_CRITICOS, indice_alertas
+from utils.agregados import kpis_financeiro, resumo_estoque, resumo_producao, resumo_rh
+from utils.amostragem import ORCAMENTO_PONTOS, serie_temporal
+from utils.cache_figuras import mostrar_grafico
+from utils.camada_dados import DadosSobDemanda, cache_datasets, usa_datasets
+from utils.esquema import uuid_para_texto
+from utils.filtros import IndiceVendas
+from utils.fora_da_memoria import DATASETS_FORA_DA_MEMORIA, agregado_vendas, cubo_financeiro, cubo_vendas
+from utils.instrumentacao import ETAPAS, instrumentacao, trecho
+from utils.rollups import COLUNAS_FINANCEIRO, COLUNAS_VENDAS, agregar_cubo
+from utils.series_empresas import SeriesEmpresas
+from utils.tabela_paginada import mostrar_tabela_paginada
+
 # Configuração da página
 st.set_page_config(
     page_title="AirCatering BI",
@@ -111,26 +125,13 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def carregar_dados():
-    """Carrega todos os datasets"""
-    dados = {}
-    
-    try:
-        if os.path.exists('data/vendas.csv'):
-            dados['vendas'] = pd.read_csv('data/vendas.csv', parse_dates=['data_venda'])
-        if os.path.exists('data/financeiro.csv'):
-            dados['financeiro'] = pd.read_csv('data/financeiro.csv', parse_dates=['data'])
-        if os.path.exists('data/estoque.csv'):
-            dados['estoque'] = pd.read_csv('data/estoque.csv')
-        if os.path.exists('data/rh.csv'):
-            dados['rh'] = pd.read_csv('data/rh.csv', parse_dates=['data_admissao'])
-        if os.path.exists('data/producao.csv'):
-            dados['producao'] = pd.read_csv('data/producao.csv', parse_dates=['data_producao'])
-        if os.path.exists('data/empresas_grupo.csv'):
-            dados['empresas_grupo'] = pd.read_csv('data/empresas_grupo.csv', parse_dates=['data'])
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
-    
+def carregar_dados(nomes=None):
+    """Datasets pedidos (todos por padrão), lidos em paralelo; cada falha é exibida com o nome do dataset"""
+    dados = DadosSobDemanda(
+        nomes, ao_falhar=lambda nome, e: st.error(f"Erro ao carregar dados ({nome}): {e}")
+    )
+    # Os do modo fora da memória não viram DataFrame: são agregados em blocos quando a página pede
+    dados.precarregar([nome for nome in dados.nomes if nome not in DATASETS_FORA_DA_MEMORIA])
     return dados
 
 def mostrar_logo():
@@ -213,7 +214,50 @@ def mostrar_logo_sidebar():
         </div>
         ''', unsafe_allow_html=True)
 
+def mostrar_painel_desempenho(execucoes):
+    """Painel da sidebar com os tempos do último rerun por etapa (AIRCATERING_INSTRUMENTACAO=1)
+
+    `execucoes` são as da sessão: o registro do processo mistura os reruns de todas as sessões.
+    """
+    if not execucoes:
+        return
+    ultima = execucoes[-1]
+    with st.expander("⏱️ Desempenho (último rerun)"):
+        st.caption(f"{ultima.pagina} · {ultima.duracao * 1000:,.0f} ms")
+        resumo = ultima.resumo()
+        st.dataframe(pd.DataFrame({
+            'etapa': [etapa for etapa in ETAPAS if etapa in resumo],
+            'ms': [round(resumo[etapa] * 1000, 1) for etapa in ETAPAS if etapa in resumo],
+        }), hide_index=True, use_container_width=True)
+        
+        # Trechos mais lentos, com a variação da memória residente do processo
+        trechos = pd.DataFrame(ultima.trechos)
+        if len(trechos):
+            trechos = trechos.sort_values('duracao_s', ascending=False).head(15)
+            st.dataframe(pd.DataFrame({
+                'trecho': trechos['etapa'] + ' · ' + trechos['nome'],
+                'ms': (trechos['duracao_s'] * 1000).round(1),
+                'Δ MB': trechos['memoria_delta_mb'].round(1),
+            }), hide_index=True, use_container_width=True)
+        
+        st.download_button(
+            "Baixar trace (JSON lines)",
+            '\n'.join(instrumentacao.linhas_json(execucoes)) + '\n',
+            file_name='aircatering_trace.jsonl',
+            mime='application/x-ndjson',
+        )
+
 def main():
+    # Cada página declara (@usa_datasets) os datasets que usa; só eles são lidos ao abri-la
+    paginas = {
+        "🏠 Dashboard Principal": mostrar_dashboard_principal,
+        "💰 Vendas": mostrar_vendas,
+        "💼 Financeiro": mostrar_financeiro,
+        "📦 Estoque": mostrar_estoque,
+        "👥 Recursos Humanos": mostrar_rh,
+        "🏭 Produção": mostrar_producao,
+    }
+    
     # Sidebar com logo e navegação com logo e navegação
     with st.sidebar:
         # Logo na sidebar
@@ -222,15 +266,32 @@ def main():
         st.markdown("### 📊 Navegação")
         pagina = st.selectbox(
             "Selecione o módulo:",
-            ["🏠 Dashboard Principal", "💰 Vendas", "💼 Financeiro", "📦 Estoque", "👥 Recursos Humanos", "🏭 Produção"]
+            list(paginas)
         )
         
         # st.markdown('<div class="sidebar-info"><strong>Sistema:</strong> AirCatering BI<br><strong>Versão:</strong> 2.0<br><strong>Última atualização:</strong> Hoje</div>', unsafe_allow_html=True)
     
-    # Carregar dados
-    dados = carregar_dados()
+    # Thread que recalcula os agregados quando os arquivos mudam (uma por processo)
+    agendador_precomputo.iniciar()
+    
+    mostrar_pagina = paginas[pagina]
+    # Os trechos medidos até o fim do bloco (carga, filtros, agregações, figuras, render) formam um rerun
+    with instrumentacao.execucao(pagina) as execucao:
+        with trecho('pagina', pagina):
+            renderizar_pagina(mostrar_pagina)
+    
+    if execucao is not None:
+        execucoes = st.session_state.setdefault('execucoes_instrumentadas', [])
+        execucoes.append(execucao)
+        del execucoes[:-instrumentacao.max_execucoes]
+        with st.sidebar:
+            mostrar_painel_desempenho(execucoes)
+
+def renderizar_pagina(mostrar_pagina):
+    """Carrega os datasets declarados pela página e a renderiza"""
+    dados = carregar_dados(mostrar_pagina.datasets)
     
-    if not dados:
+    if not dados.disponiveis():
         st.warning("⚠️ Dados não encontrados. Execute o gerador de dados primeiro.")
         if st.button("🔄 Gerar Dados de Exemplo"):
             with st.spinner("Gerando dados..."):
@@ -241,87 +302,91 @@ def main():
         return
     
     # Renderizar página selecionada
-    if pagina == "🏠 Dashboard Principal":
-        mostrar_dashboard_principal(dados)
-    elif pagina == "💰 Vendas":
-        mostrar_vendas(dados)
-    elif pagina == "💼 Financeiro":
-        mostrar_financeiro(dados)
-    elif pagina == "📦 Estoque":
-        mostrar_estoque(dados)
-    elif pagina == "👥 Recursos Humanos":
-        mostrar_rh(dados)
-    elif pagina == "🏭 Produção":
-        mostrar_producao(dados)
+    mostrar_pagina(dados)
+
+def obter_kpis_financeiro():
+    """KPIs financeiros a partir do cubo mensal (mesmo cálculo no dashboard e no módulo financeiro)
+
+    Retorna None se não há dados financeiros.
+    """
+    cubo = cubo_financeiro()
+    return None if cubo is None else kpis_financeiro(cubo)
 
+# Do dashboard só são lidas as colunas dos KPIs e dos cubos de vendas e financeiro
+@usa_datasets('empresas_grupo', vendas=COLUNAS_VENDAS, financeiro=COLUNAS_FINANCEIRO, estoque=['id'])
 def mostrar_dashboard_principal(dados):
     st.header("📈 Dashboard Principal")
     
     col1, col2, col3, col4 = st.columns(4)
     
-    # KPIs principais
-    if 'vendas' in dados:
-        total_vendas = dados['vendas']['valor_total'].sum()
+    # KPIs principais (vendas e receitas saem dos cubos: no modo fora da memória
+    # os arquivos são agregados em blocos, sem carregar os datasets)
+    cubo_vendas_mes = cubo_vendas()
+    if cubo_vendas_mes is not None:
+        total_vendas = cubo_vendas_mes['valor_total'].sum()
         col1.metric("💰 Total de Vendas", f"R$ {total_vendas:,.2f}")
     
-    if 'financeiro' in dados:
-        receitas = dados['financeiro'][dados['financeiro']['tipo'] == 'Receita']['valor'].sum()
-        col2.metric("📈 Receitas", f"R$ {receitas:,.2f}")
+    kpis = obter_kpis_financeiro()
+    if kpis is not None:
+        col2.metric("📈 Receitas", f"R$ {kpis['receitas']:,.2f}")
     
     if 'estoque' in dados:
         produtos_estoque = len(dados['estoque'])
         col3.metric("📦 Produtos em Estoque", f"{produtos_estoque}")
     
-    if 'rh' in dados:
-        funcionarios_ativos = len(dados['rh'][dados['rh']['status'] == 'Ativo'])
-        col4.metric("👥 Funcionários Ativos", f"{funcionarios_ativos}")
+    # Só os ativos: com snapshot, o filtro é aplicado na leitura e o rh não é carregado
+    ativos = cache_datasets.consultar('rh', ['status'], [('status', '==', 'Ativo')])
+    if ativos is not None:
+        col4.metric("👥 Funcionários Ativos", f"{len(ativos)}")
     
     # Gráficos
     col1, col2 = st.columns(2)
     
     with col1:
-        if 'vendas' in dados:
+        if cubo_vendas_mes is not None:
             st.subheader("📊 Vendas por Mês")
-            df_vendas_mes = dados['vendas'].copy()
-            df_vendas_mes['mes'] = df_vendas_mes['data_venda'].dt.to_period('M')
-            vendas_mes = df_vendas_mes.groupby('mes')['valor_total'].sum().reset_index()
-            vendas_mes['mes'] = vendas_mes['mes'].astype(str)
             
-            fig = px.line(vendas_mes, x='mes', y='valor_total', 
-                         title="Evolução das Vendas")
-            st.plotly_chart(fig, use_container_width=True)
+            def grafico_vendas_mes():
+                vendas_mes = agregar_cubo(cubo_vendas_mes, ['mes'], 'valor_total')
+                return px.line(vendas_mes, x='mes', y='valor_total', 
+                               title="Evolução das Vendas")
+            mostrar_grafico('dashboard_vendas_mes', ['vendas'], grafico_vendas_mes)
     
     with col2:
-        if 'vendas' in dados:
+        if cubo_vendas_mes is not None:
             st.subheader("🥧 Vendas por Categoria")
-            vendas_cat = dados['vendas'].groupby('categoria')['valor_total'].sum().reset_index()
             
-            fig = px.pie(vendas_cat, values='valor_total', names='categoria',
-                        title="Distribuição por Categoria")
-            st.plotly_chart(fig, use_container_width=True)
+            def grafico_vendas_categoria():
+                vendas_cat = agregar_cubo(cubo_vendas_mes, ['categoria'], 'valor_total')
+                return px.pie(vendas_cat, values='valor_total', names='categoria',
+                              title="Distribuição por Categoria")
+            mostrar_grafico('dashboard_vendas_categoria', ['vendas'], grafico_vendas_categoria)
     
     # Seção das Empresas do Grupo
-    if 'empresas_grupo' in dados:
+    # Séries empresa × mês com crescimentos e margem de 12 meses, calculadas uma vez por versão
+    series = cache_datasets.derivado('empresas_grupo', 'series', SeriesEmpresas) if 'empresas_grupo' in dados else None
+    if series is not None and series.ultimo_periodo is not None:
         st.markdown("---")
         st.subheader("🏢 Empresas do Grupo Air Catering")
         
-        df_empresas = dados['empresas_grupo']
-        
-        # Dados consolidados do último mês
-        ultimo_mes = df_empresas['ano_mes'].max()
-        df_ultimo_mes = df_empresas[df_empresas['ano_mes'] == ultimo_mes]
+        df_ultimo_mes = series.ultimo
+        grupo_ultimo_mes = series.grupo.iloc[-1]
         
         # KPIs consolidados das empresas
         col1, col2, col3, col4 = st.columns(4)
         
-        total_faturamento_grupo = df_ultimo_mes['faturamento'].sum()
-        total_vendas_grupo = df_ultimo_mes['vendas'].sum()
-        margem_media_grupo = df_ultimo_mes['margem_percentual'].mean()
-        total_funcionarios_grupo = df_ultimo_mes['funcionarios'].sum()
+        total_faturamento_grupo = grupo_ultimo_mes['faturamento']
+        total_vendas_grupo = grupo_ultimo_mes['vendas']
+        margem_media_grupo = grupo_ultimo_mes['margem_media']
+        total_funcionarios_grupo = int(grupo_ultimo_mes['funcionarios'])
+        crescimento_mom = grupo_ultimo_mes['crescimento_mom']
+        margem_12m = grupo_ultimo_mes['margem_12m']
         
-        col1.metric("💰 Faturamento Total", f"R$ {total_faturamento_grupo:,.2f}")
+        col1.metric("💰 Faturamento Total", f"R$ {total_faturamento_grupo:,.2f}",
+                    delta=None if pd.isna(crescimento_mom) else f"{crescimento_mom:+.1f}% vs mês anterior")
         col2.metric("🛒 Vendas Total", f"R$ {total_vendas_grupo:,.2f}")
-        col3.metric("📊 Margem Média", f"{margem_media_grupo:.1f}%")
+        col3.metric("📊 Margem Média", f"{margem_media_grupo:.1f}%",
+                    delta=None if pd.isna(margem_12m) else f"12 meses: {margem_12m:.1f}%", delta_color="off")
         col4.metric("👥 Total Funcionários", f"{total_funcionarios_grupo}")
         
         # Gráficos das empresas
@@ -329,24 +394,31 @@ def mostrar_dashboard_principal(dados):
         
         with col1:
             st.subheader("📈 Faturamento por Empresa")
-            faturamento_empresa = df_ultimo_mes.groupby('empresa')['faturamento'].sum().reset_index()
-            faturamento_empresa = faturamento_empresa.sort_values('faturamento', ascending=True)
             
-            fig = px.bar(faturamento_empresa, x='faturamento', y='empresa', 
-                        orientation='h', title="Faturamento Mensal por Empresa",
-                        color='faturamento', color_continuous_scale='Blues')
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            def grafico_faturamento_empresa():
+                faturamento_empresa = df_ultimo_mes.sort_values('faturamento', ascending=True)
+                
+                fig = px.bar(faturamento_empresa, x='faturamento', y='empresa', 
+                            orientation='h', title="Faturamento Mensal por Empresa",
+                            color='faturamento', color_continuous_scale='Blues',
+                            hover_data={'crescimento_mom': ':.1f', 'crescimento_yoy': ':.1f'})
+                fig.update_layout(height=400)
+                return fig
+            mostrar_grafico('dashboard_faturamento_empresa', ['empresas_grupo'], grafico_faturamento_empresa)
         
         with col2:
             st.subheader("🎯 Margem por Empresa")
-            margem_empresa = df_ultimo_mes.sort_values('margem_percentual', ascending=True)
             
-            fig = px.bar(margem_empresa, x='margem_percentual', y='empresa',
-                        orientation='h', title="Margem % por Empresa",
-                        color='margem_percentual', color_continuous_scale='Greens')
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            def grafico_margem_empresa():
+                margem_empresa = df_ultimo_mes.sort_values('margem_percentual', ascending=True)
+                
+                fig = px.bar(margem_empresa, x='margem_percentual', y='empresa',
+                            orientation='h', title="Margem % por Empresa",
+                            color='margem_percentual', color_continuous_scale='Greens',
+                            hover_data={'margem_12m': ':.1f'})
+                fig.update_layout(height=400)
+                return fig
+            mostrar_grafico('dashboard_margem_empresa', ['empresas_grupo'], grafico_margem_empresa)
         
         # Evolução temporal consolidada
         st.subheader("📊 Evolução Temporal do Grupo")
@@ -355,52 +427,90 @@ def mostrar_dashboard_principal(dados):
         
         with col1:
             # Evolução do faturamento
-            evolucao_faturamento = df_empresas.groupby('ano_mes')['faturamento'].sum().reset_index()
-            evolucao_faturamento = evolucao_faturamento.sort_values('ano_mes')
-            
-            fig = px.line(evolucao_faturamento, x='ano_mes', y='faturamento',
-                         title="Evolução do Faturamento Total",
-                         markers=True)
-            fig.update_layout(xaxis_title="Mês", yaxis_title="Faturamento (R$)")
-            st.plotly_chart(fig, use_container_width=True)
+            def grafico_evolucao_faturamento():
+                fig = px.line(series.grupo, x='ano_mes', y='faturamento',
+                             title="Evolução do Faturamento Total",
+                             markers=True, hover_data={'crescimento_mom': ':.1f', 'crescimento_yoy': ':.1f'})
+                fig.update_layout(xaxis_title="Mês", yaxis_title="Faturamento (R$)")
+                return fig
+            mostrar_grafico('dashboard_evolucao_faturamento', ['empresas_grupo'], grafico_evolucao_faturamento)
         
         with col2:
             # Evolução da margem média
-            evolucao_margem = df_empresas.groupby('ano_mes')['margem_percentual'].mean().reset_index()
-            evolucao_margem = evolucao_margem.sort_values('ano_mes')
-            
-            fig = px.line(evolucao_margem, x='ano_mes', y='margem_percentual',
-                         title="Evolução da Margem Média (%)",
-                         markers=True, color_discrete_sequence=['green'])
-            fig.update_layout(xaxis_title="Mês", yaxis_title="Margem (%)")
-            st.plotly_chart(fig, use_container_width=True)
+            def grafico_evolucao_margem():
+                fig = px.line(series.grupo, x='ano_mes', y='margem_media',
+                             title="Evolução da Margem Média (%)",
+                             markers=True, color_discrete_sequence=['green'])
+                # Margem dos últimos 12 meses (faturamento e margem somados na janela)
+                fig.add_scatter(x=series.grupo['ano_mes'], y=series.grupo['margem_12m'],
+                                mode='lines', name='Margem 12 meses', line=dict(dash='dash', color='darkgreen'))
+                fig.update_layout(xaxis_title="Mês", yaxis_title="Margem (%)")
+                return fig
+            mostrar_grafico('dashboard_evolucao_margem', ['empresas_grupo'], grafico_evolucao_margem)
+
+def mostrar_vendas_agregadas():
+    """Vendas no modo fora da memória: agregados do arquivo inteiro, lidos em blocos"""
+    parcial = agregado_vendas()
+    if parcial is None:
+        st.error("Dados de vendas não disponíveis")
+        return
+    st.info("ℹ️ Modo fora da memória: agregados de todo o período, sem filtros por linha nem tabela detalhada.")
+    
+    # Métricas
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total de Vendas", f"R$ {parcial.total_vendas:,.2f}")
+    col2.metric("Número de Vendas", f"{parcial.num_vendas}")
+    col3.metric("Ticket Médio", f"R$ {parcial.total_vendas / max(parcial.num_vendas, 1):,.2f}")
+    col4.metric("Maior Venda", f"R$ {parcial.maior_venda:,.2f}")
+    
+    def grafico_evolucao_mensal():
+        return px.line(parcial.por(['mes']), x='mes', y='valor_total', title="Evolução das Vendas (mensal)",
+                       labels={'mes': 'Mês', 'valor_total': 'Vendas (R$)'})
+    mostrar_grafico('vendas_evolucao_mensal', ['vendas'], grafico_evolucao_mensal)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        def grafico_top_vendedores():
+            top_vendedores = parcial.top_vendedores().sort_values('valor_total')
+            return px.bar(top_vendedores, x='valor_total', y='vendedor',
+                          orientation='h', title="Top 10 Vendedores")
+        mostrar_grafico('vendas_top_vendedores', ['vendas'], grafico_top_vendedores)
+    
+    with col2:
+        def grafico_vendas_canal():
+            return px.pie(parcial.por(['canal']), values='valor_total', names='canal',
+                          title="Vendas por Canal")
+        mostrar_grafico('vendas_canal', ['vendas'], grafico_vendas_canal)
 
+@usa_datasets('vendas')
 def mostrar_vendas(dados):
     st.header("💰 Módulo de Vendas")
     
+    # Arquivo maior que a memória: só os agregados, sem carregar as linhas
+    if 'vendas' in DATASETS_FORA_DA_MEMORIA:
+        mostrar_vendas_agregadas()
+        return
+    
     if 'vendas' not in dados:
         st.error("Dados de vendas não disponíveis")
         return
     
-    df = dados['vendas']
+    indice = cache_datasets.derivado('vendas', 'indice_filtros', IndiceVendas)
     
     # Filtros
     col1, col2, col3 = st.columns(3)
     with col1:
-        categorias = st.multiselect("Categorias", df['categoria'].unique(), default=df['categoria'].unique())
+        categorias = st.multiselect("Categorias", indice.categorias, default=indice.categorias)
     with col2:
-        regioes = st.multiselect("Regiões", df['regiao'].unique(), default=df['regiao'].unique())
+        regioes = st.multiselect("Regiões", indice.regioes, default=indice.regioes)
     with col3:
-        data_inicio = st.date_input("Data Início", df['data_venda'].min())
-        data_fim = st.date_input("Data Fim", df['data_venda'].max())
-    
-    # Filtrar dados
-    df_filtrado = df[
-        (df['categoria'].isin(categorias)) &
-        (df['regiao'].isin(regioes)) &
-        (df['data_venda'] >= pd.to_datetime(data_inicio)) &
-        (df['data_venda'] <= pd.to_datetime(data_fim))
-    ]
+        data_inicio = st.date_input("Data Início", indice.data_minima)
+        data_fim = st.date_input("Data Fim", indice.data_maxima)
+    
+    # Filtrar dados (busca binária nas datas + bitmaps de categoria e região)
+    with trecho('filtro', 'vendas'):
+        df_filtrado = indice.filtrar(categorias, regioes, data_inicio, data_fim)
     
     # Métricas
     col1, col2, col3, col4 = st.columns(4)
@@ -409,71 +519,85 @@ def mostrar_vendas(dados):
     col3.metric("Ticket Médio", f"R$ {df_filtrado['valor_total'].mean():,.2f}")
     col4.metric("Maior Venda", f"R$ {df_filtrado['valor_total'].max():,.2f}")
     
+    # Os gráficos dependem dos filtros: entram na chave do cache de figuras
+    filtros = dict(categorias=categorias, regioes=regioes, data_inicio=data_inicio, data_fim=data_fim)
+    
+    # Evolução na resolução que cabe no orçamento de pontos: reduzir o período refina o gráfico
+    def grafico_evolucao_vendas():
+        evolucao, resolucao, pontos = serie_temporal(df_filtrado['data_venda'], df_filtrado['valor_total'])
+        titulo = "Evolução das Vendas"
+        if resolucao is not None:
+            titulo += f" ({resolucao}, {len(evolucao):,} de {pontos:,} pontos)"
+        return px.line(evolucao, x='periodo', y='valor', title=titulo,
+                       labels={'periodo': 'Período', 'valor': 'Vendas (R$)'})
+    mostrar_grafico('vendas_evolucao', ['vendas'], grafico_evolucao_vendas, **filtros)
+    st.caption(f"Até {ORCAMENTO_PONTOS:,} pontos por gráfico; ajuste as datas para ver o período com mais detalhe.")
+    
     # Gráficos
     col1, col2 = st.columns(2)
     
     with col1:
-        vendas_vendedor = df_filtrado.groupby('vendedor')['valor_total'].sum().sort_values(ascending=False).head(10)
-        fig = px.bar(x=vendas_vendedor.values, y=vendas_vendedor.index, 
-                    orientation='h', title="Top 10 Vendedores")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_top_vendedores():
+            vendas_vendedor = df_filtrado.groupby('vendedor')['valor_total'].sum().sort_values(ascending=False).head(10)
+            return px.bar(x=vendas_vendedor.values, y=vendas_vendedor.index, 
+                          orientation='h', title="Top 10 Vendedores")
+        mostrar_grafico('vendas_top_vendedores', ['vendas'], grafico_top_vendedores, **filtros)
     
     with col2:
-        vendas_canal = df_filtrado.groupby('canal')['valor_total'].sum()
-        fig = px.pie(values=vendas_canal.values, names=vendas_canal.index,
-                    title="Vendas por Canal")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_vendas_canal():
+            vendas_canal = df_filtrado.groupby('canal', observed=True)['valor_total'].sum()
+            return px.pie(values=vendas_canal.values, names=vendas_canal.index,
+                          title="Vendas por Canal")
+        mostrar_grafico('vendas_canal', ['vendas'], grafico_vendas_canal, **filtros)
     
     # Tabela de dados
     st.subheader("📊 Dados Detalhados")
-    st.dataframe(df_filtrado.sort_values('data_venda', ascending=False), use_container_width=True)
+    mostrar_tabela_paginada(
+        df_filtrado, 'tabela_vendas', ['vendas'], filtros, ordenar_por='data_venda', ascendente=False,
+        formatar=lambda janela: janela.assign(id=uuid_para_texto(janela['id']))
+    )
 
+# Só o cubo mensal é usado: lê apenas as colunas dele
+@usa_datasets(financeiro=COLUNAS_FINANCEIRO)
 def mostrar_financeiro(dados):
     st.header("💼 Módulo Financeiro")
     
-    if 'financeiro' not in dados:
+    # Métricas principais, fluxo e categorias saem de uma única agregação do cubo mensal
+    kpis = obter_kpis_financeiro()
+    if kpis is None:
         st.error("Dados financeiros não disponíveis")
         return
     
-    df = dados['financeiro']
-    
-    # Métricas principais
-    receitas = df[df['tipo'] == 'Receita']['valor'].sum()
-    despesas = abs(df[df['tipo'] == 'Despesa']['valor'].sum())
-    lucro = receitas - despesas
-    
     col1, col2, col3 = st.columns(3)
-    col1.metric("💰 Receitas", f"R$ {receitas:,.2f}")
-    col2.metric("💸 Despesas", f"R$ {despesas:,.2f}")
-    col3.metric("📈 Lucro", f"R$ {lucro:,.2f}", delta=f"{((lucro/receitas)*100):.1f}%")
+    col1.metric("💰 Receitas", f"R$ {kpis['receitas']:,.2f}")
+    col2.metric("💸 Despesas", f"R$ {kpis['despesas']:,.2f}")
+    col3.metric("📈 Lucro", f"R$ {kpis['lucro']:,.2f}", delta=f"{kpis['margem']:.1f}%")
     
     # Gráfico de fluxo de caixa
-    df['data'] = pd.to_datetime(df['data'])
-    df_mes = df.copy()
-    df_mes['mes'] = df_mes['data'].dt.to_period('M')
-    
-    fluxo_mes = df_mes.groupby(['mes', 'tipo'])['valor'].sum().reset_index()
-    fluxo_mes['mes'] = fluxo_mes['mes'].astype(str)
-    
-    fig = px.bar(fluxo_mes, x='mes', y='valor', color='tipo',
-                title="Fluxo de Caixa Mensal", barmode='group')
-    st.plotly_chart(fig, use_container_width=True)
+    def grafico_fluxo_caixa():
+        fluxo_mes = kpis['fluxo_mensal']
+        return px.bar(fluxo_mes, x='mes', y='valor', color='tipo',
+                      title="Fluxo de Caixa Mensal", barmode='group')
+    mostrar_grafico('financeiro_fluxo_caixa', ['financeiro'], grafico_fluxo_caixa)
     
     # Gráfico por categoria
     col1, col2 = st.columns(2)
     
     with col1:
-        receitas_cat = df[df['tipo'] == 'Receita'].groupby('categoria')['valor'].sum()
-        fig = px.pie(values=receitas_cat.values, names=receitas_cat.index,
-                    title="Receitas por Categoria")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_receitas_categoria():
+            receitas_cat = kpis['receitas_categoria']
+            return px.pie(receitas_cat, values='valor', names='categoria',
+                          title="Receitas por Categoria")
+        mostrar_grafico('financeiro_receitas_categoria', ['financeiro'], grafico_receitas_categoria)
     
     with col2:
-        despesas_cat = df[df['tipo'] == 'Despesa'].groupby('categoria')['valor'].sum()
-        fig = px.pie(values=despesas_cat.values, names=despesas_cat.index,
-                    title="Despesas por Categoria")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_despesas_categoria():
+            despesas_cat = kpis['despesas_categoria']
+            return px.pie(despesas_cat, values='valor', names='categoria',
+                          title="Despesas por Categoria")
+        mostrar_grafico('financeiro_despesas_categoria', ['financeiro'], grafico_despesas_categoria)
 
+@usa_datasets('estoque')
 def mostrar_estoque(dados):
     st.header("📦 Módulo de Estoque")
     
@@ -482,36 +606,60 @@ def mostrar_estoque(dados):
         return
     
     df = dados['estoque']
-    
-    # Alertas de estoque baixo
-    estoque_baixo = df[df['quantidade_atual'] <= df['quantidade_minima']]
-    if len(estoque_baixo) > 0:
-        st.warning(f"⚠️ {len(estoque_baixo)} produtos com estoque baixo!")
+    # Agregados calculados uma vez por versão do arquivo (e recalculados em segundo plano)
+    resumo = cache_datasets.derivado('estoque', 'resumo', resumo_estoque)
+    # Margens e validades ordenadas: os alertas são buscas binárias, sem varrer o estoque
+    alertas = indice_alertas()
+    
+    # Alertas de estoque baixo (a lista mostra os mais críticos primeiro)
+    num_baixo = alertas.num_estoque_baixo
+    if num_baixo > 0:
+        st.warning(f"⚠️ {num_baixo} produtos com estoque baixo!")
         with st.expander("Ver produtos com estoque baixo"):
-            st.dataframe(estoque_baixo[['nome_produto', 'quantidade_atual', 'quantidade_minima']])
+            st.dataframe(alertas.estoque_baixo(limite=LIMITE_ALERTAS)[
+                ['nome_produto', 'quantidade_atual', 'quantidade_minima', 'margem']])
+            if num_baixo > LIMITE_ALERTAS:
+                st.caption(f"Mostrando os {LIMITE_ALERTAS} mais críticos de {num_baixo}")
+    with st.expander(f"Ver os {TOP_CRITICOS} produtos mais críticos"):
+        st.dataframe(alertas.mais_criticos(TOP_CRITICOS)[
+            ['nome_produto', 'categoria', 'quantidade_atual', 'quantidade_minima', 'margem']])
+    
+    # Alertas de validade
+    dias_validade = st.slider("Alertar produtos que vencem nos próximos (dias):", 7, 180, 30)
+    num_vencendo = alertas.num_vencendo(dias_validade)
+    if num_vencendo > 0:
+        st.warning(f"⏰ {num_vencendo} produtos vencem nos próximos {dias_validade} dias!")
+        with st.expander("Ver produtos próximos do vencimento"):
+            st.dataframe(alertas.vencendo(dias_validade, limite=LIMITE_ALERTAS)[
+                ['nome_produto', 'categoria', 'quantidade_atual', 'validade']])
+            if num_vencendo > LIMITE_ALERTAS:
+                st.caption(f"Mostrando os {LIMITE_ALERTAS} primeiros a vencer de {num_vencendo}")
     
     # Métricas
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Total de Produtos", len(df))
-    col2.metric("Valor Total Estoque", f"R$ {(df['quantidade_atual'] * df['preco_custo']).sum():,.2f}")
-    col3.metric("Produtos Baixo Estoque", len(estoque_baixo))
-    col4.metric("Categorias", df['categoria'].nunique())
+    col2.metric("Valor Total Estoque", f"R$ {resumo['valor_total']:,.2f}")
+    col3.metric("Produtos Baixo Estoque", num_baixo)
+    col4.metric("Categorias", resumo['num_categorias'])
     
     # Gráficos
     col1, col2 = st.columns(2)
     
     with col1:
-        estoque_cat = df.groupby('categoria')['quantidade_atual'].sum()
-        fig = px.bar(x=estoque_cat.index, y=estoque_cat.values,
-                    title="Quantidade por Categoria")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_quantidade_categoria():
+            estoque_cat = resumo['quantidade_categoria']
+            return px.bar(x=estoque_cat.index, y=estoque_cat.values,
+                          title="Quantidade por Categoria")
+        mostrar_grafico('estoque_quantidade_categoria', ['estoque'], grafico_quantidade_categoria)
     
     with col2:
-        valor_cat = df.groupby('categoria').apply(lambda x: (x['quantidade_atual'] * x['preco_custo']).sum())
-        fig = px.pie(values=valor_cat.values, names=valor_cat.index,
-                    title="Valor por Categoria")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_valor_categoria():
+            valor_cat = resumo['valor_categoria']
+            return px.pie(values=valor_cat.values, names=valor_cat.index,
+                          title="Valor por Categoria")
+        mostrar_grafico('estoque_valor_categoria', ['estoque'], grafico_valor_categoria)
 
+@usa_datasets('rh')
 def mostrar_rh(dados):
     st.header("👥 Módulo de Recursos Humanos")
     
@@ -520,14 +668,15 @@ def mostrar_rh(dados):
         return
     
     df = dados['rh']
+    resumo = cache_datasets.derivado('rh', 'resumo', resumo_rh)
     
     # Calcular métricas de turnover e absenteísmo
-    total_funcionarios = len(df)
-    funcionarios_ativos = len(df[df['status'] == 'Ativo'])
-    funcionarios_inativos = len(df[df['status'] == 'Inativo'])
+    total_funcionarios = resumo['total']
+    funcionarios_ativos = resumo['ativos']
+    funcionarios_inativos = resumo['inativos']
     
-    # Simular dados de turnover (baseado em funcionários inativos)
-    turnover_rate = (funcionarios_inativos / total_funcionarios * 100) if total_funcionarios > 0 else 0
+    # Turnover geral: desligados sobre o total do quadro
+    turnover_rate = resumo['turnover']
     
     # Simular absenteísmo (dados fictícios baseados em departamentos)
     np.random.seed(42)  # Para dados consistentes
@@ -541,8 +690,8 @@ def mostrar_rh(dados):
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Total Funcionários", total_funcionarios)
     col2.metric("Funcionários Ativos", funcionarios_ativos)
-    col3.metric("Folha de Pagamento", f"R$ {df['salario'].sum():,.2f}")
-    col4.metric("Salário Médio", f"R$ {df['salario'].mean():,.2f}")
+    col3.metric("Folha de Pagamento", f"R$ {resumo['folha']:,.2f}")
+    col4.metric("Salário Médio", f"R$ {resumo['salario_medio']:,.2f}")
     
     # Métricas de Turnover e Absenteísmo
     st.markdown("---")
@@ -568,24 +717,26 @@ def mostrar_rh(dados):
     col2.metric("🏠 Absenteísmo Médio", f"{absenteismo_medio:.1f}%", 
                 delta=f"Meta: <5%", delta_color=absenteismo_color)
     col3.metric("➡️ Demissões", funcionarios_inativos)
-    col4.metric("⏱️ Tempo Médio na Empresa", "2.3 anos")  # Simulado
+    col4.metric("⏱️ Tempo Médio na Empresa", f"{resumo['tempo_medio_anos']:.1f} anos")
     
     # Gráficos principais
     col1, col2 = st.columns(2)
     
     with col1:
-        func_depto = df.groupby('departamento').size()
-        fig = px.bar(x=func_depto.index, y=func_depto.values,
-                    title="👥 Funcionários por Departamento",
-                    color=func_depto.values, color_continuous_scale='Blues')
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_funcionarios_departamento():
+            func_depto = resumo['departamentos']['funcionarios']
+            return px.bar(x=func_depto.index, y=func_depto.values,
+                          title="👥 Funcionários por Departamento",
+                          color=func_depto.values, color_continuous_scale='Blues')
+        mostrar_grafico('rh_funcionarios_departamento', ['rh'], grafico_funcionarios_departamento)
     
     with col2:
-        salario_depto = df.groupby('departamento')['salario'].mean()
-        fig = px.bar(x=salario_depto.index, y=salario_depto.values,
-                    title="💰 Salário Médio por Departamento",
-                    color=salario_depto.values, color_continuous_scale='Greens')
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_salario_departamento():
+            salario_depto = resumo['departamentos']['salario_medio']
+            return px.bar(x=salario_depto.index, y=salario_depto.values,
+                          title="💰 Salário Médio por Departamento",
+                          color=salario_depto.values, color_continuous_scale='Greens')
+        mostrar_grafico('rh_salario_departamento', ['rh'], grafico_salario_departamento)
     
     # Análises de Turnover e Absenteísmo
     col1, col2 = st.columns(2)
@@ -593,70 +744,78 @@ def mostrar_rh(dados):
     with col1:
         st.subheader("📈 Análise de Turnover")
         
-        # Turnover por departamento (simulado)
-        departamentos = df['departamento'].unique()
-        turnover_depto = {}
-        for dept in departamentos:
-            func_dept = len(df[df['departamento'] == dept])
-            inativos_dept = len(df[(df['departamento'] == dept) & (df['status'] == 'Inativo')])
-            turnover_depto[dept] = (inativos_dept / func_dept * 100) if func_dept > 0 else 0
-        
-        turnover_df = pd.DataFrame(list(turnover_depto.items()), columns=['Departamento', 'Turnover_%'])
-        fig = px.bar(turnover_df, x='Departamento', y='Turnover_%',
-                    title="Taxa de Turnover por Departamento",
-                    color='Turnover_%', color_continuous_scale='Reds')
-        fig.add_hline(y=10, line_dash="dash", line_color="orange", 
-                     annotation_text="Meta: 10%")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_turnover_departamento():
+            turnover_df = resumo['departamentos']['turnover'].rename('Turnover_%').rename_axis('Departamento').reset_index()
+            fig = px.bar(turnover_df, x='Departamento', y='Turnover_%',
+                        title="Taxa de Turnover por Departamento",
+                        color='Turnover_%', color_continuous_scale='Reds')
+            fig.add_hline(y=10, line_dash="dash", line_color="orange", 
+                         annotation_text="Meta: 10%")
+            return fig
+        mostrar_grafico('rh_turnover_departamento', ['rh'], grafico_turnover_departamento)
     
     with col2:
         st.subheader("🏠 Análise de Absenteísmo")
         
-        # Absenteísmo por departamento
-        absenteismo_depto = df_temp.groupby('departamento')['absenteismo_pct'].mean().reset_index()
-        fig = px.bar(absenteismo_depto, x='departamento', y='absenteismo_pct',
-                    title="Taxa de Absenteísmo por Departamento",
-                    color='absenteismo_pct', color_continuous_scale='Oranges')
-        fig.add_hline(y=5, line_dash="dash", line_color="red", 
-                     annotation_text="Meta: 5%")
-        st.plotly_chart(fig, use_container_width=True)
-    
-    # Evolução temporal (simulada)
+        def grafico_absenteismo_departamento():
+            # Absenteísmo por departamento
+            absenteismo_depto = df_temp.groupby('departamento', observed=True)['absenteismo_pct'].mean().reset_index()
+            fig = px.bar(absenteismo_depto, x='departamento', y='absenteismo_pct',
+                        title="Taxa de Absenteísmo por Departamento",
+                        color='absenteismo_pct', color_continuous_scale='Oranges')
+            fig.add_hline(y=5, line_dash="dash", line_color="red", 
+                         annotation_text="Meta: 5%")
+            return fig
+        mostrar_grafico('rh_absenteismo_departamento', ['rh'], grafico_absenteismo_departamento)
+    
+    if resumo['cargo_nivel'] is not None:
+        def grafico_turnover_cargo_nivel():
+            fig = px.bar(resumo['cargo_nivel'], x='cargo', y='turnover', color='nivel', barmode='group',
+                         title="Taxa de Turnover por Cargo e Nível",
+                         labels={'cargo': 'Cargo', 'turnover': 'Turnover_%', 'nivel': 'Nível'})
+            fig.add_hline(y=10, line_dash="dash", line_color="orange")
+            return fig
+        mostrar_grafico('rh_turnover_cargo_nivel', ['rh'], grafico_turnover_cargo_nivel)
+    
+    # Evolução temporal
     st.subheader("📅 Evolução Temporal")
     col1, col2 = st.columns(2)
     
-    with col1:
-        # Simular evolução do turnover nos últimos 12 meses
-        meses = pd.date_range(start='2024-01-01', end='2024-12-31', freq='M')
-        turnover_mensal = np.random.normal(turnover_rate, 2, len(meses))
-        turnover_mensal = np.clip(turnover_mensal, 0, 25)
-        
+    # Turnover real pelas datas de admissão e desligamento; arquivos sem data_desligamento
+    # mantêm a evolução simulada a partir da taxa geral
+    evolucao_turnover = resumo['turnover_mensal']
+    # Sorteios fora dos gráficos: a sequência do gerador não depende de quais figuras estavam em cache
+    meses = pd.date_range(start='2024-01-01', end='2024-12-31', freq='M')
+    if evolucao_turnover is None:
         evolucao_turnover = pd.DataFrame({
-            'Mês': meses.strftime('%Y-%m'),
-            'Turnover_%': turnover_mensal
+            'mes': meses.strftime('%Y-%m'),
+            'turnover': np.clip(np.random.normal(turnover_rate, 2, len(meses)), 0, 25),
         })
-        
-        fig = px.line(evolucao_turnover, x='Mês', y='Turnover_%',
-                     title="Evolução do Turnover (12 meses)",
-                     markers=True)
-        fig.add_hline(y=10, line_dash="dash", line_color="orange")
-        st.plotly_chart(fig, use_container_width=True)
+    absenteismo_mensal = np.clip(np.random.normal(absenteismo_medio, 1, len(meses)), 0, 15)
+    
+    with col1:
+        def grafico_evolucao_turnover():
+            fig = px.line(evolucao_turnover, x='mes', y='turnover',
+                         title="Evolução do Turnover (12 meses)",
+                         markers=True, labels={'mes': 'Mês', 'turnover': 'Turnover_%'})
+            fig.add_hline(y=10, line_dash="dash", line_color="orange")
+            return fig
+        mostrar_grafico('rh_evolucao_turnover', ['rh'], grafico_evolucao_turnover)
     
     with col2:
-        # Simular evolução do absenteísmo
-        absenteismo_mensal = np.random.normal(absenteismo_medio, 1, len(meses))
-        absenteismo_mensal = np.clip(absenteismo_mensal, 0, 15)
-        
-        evolucao_absenteismo = pd.DataFrame({
-            'Mês': meses.strftime('%Y-%m'),
-            'Absenteísmo_%': absenteismo_mensal
-        })
-        
-        fig = px.line(evolucao_absenteismo, x='Mês', y='Absenteísmo_%',
-                     title="Evolução do Absenteísmo (12 meses)",
-                     markers=True, color_discrete_sequence=['orange'])
-        fig.add_hline(y=5, line_dash="dash", line_color="red")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_evolucao_absenteismo():
+            # Simular evolução do absenteísmo
+            evolucao_absenteismo = pd.DataFrame({
+                'Mês': meses.strftime('%Y-%m'),
+                'Absenteísmo_%': absenteismo_mensal
+            })
+            
+            fig = px.line(evolucao_absenteismo, x='Mês', y='Absenteísmo_%',
+                         title="Evolução do Absenteísmo (12 meses)",
+                         markers=True, color_discrete_sequence=['orange'])
+            fig.add_hline(y=5, line_dash="dash", line_color="red")
+            return fig
+        mostrar_grafico('rh_evolucao_absenteismo', ['rh'], grafico_evolucao_absenteismo)
     
     # Tabela detalhada com indicadores por funcionário
     st.subheader("📋 Detalhamento por Funcionário")
@@ -697,11 +856,12 @@ def mostrar_rh(dados):
             return 'background-color: #fff4cc'  # Amarelo claro
         return ''
     
-    st.dataframe(
-        df_filtrado.style.applymap(destacar_absenteismo, subset=['Absenteísmo (%)']),
-        use_container_width=True
+    mostrar_tabela_paginada(
+        df_filtrado, 'tabela_rh', ['rh'], dict(departamento=dept_filtro, status=status_filtro), ordenar_por='Nome',
+        estilo=lambda styler: styler.applymap(destacar_absenteismo, subset=['Absenteísmo (%)'])
     )
 
+@usa_datasets('producao')
 def mostrar_producao(dados):
     st.header("🏭 Módulo de Produção")
     
@@ -709,31 +869,31 @@ def mostrar_producao(dados):
         st.error("Dados de produção não disponíveis")
         return
     
-    df = dados['producao']
+    resumo = cache_datasets.derivado('producao', 'resumo', resumo_producao)
     
     # Métricas
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Total Produzido", f"{df['quantidade_produzida'].sum():,}")
-    col2.metric("Eficiência Média", f"{(df['quantidade_produzida'] / df['quantidade_planejada'] * 100).mean():.1f}%")
-    col3.metric("Custo Total", f"R$ {df['custo_producao'].sum():,.2f}")
-    col4.metric("Qualidade Média", f"{df['qualidade_nota'].mean():.1f}/5")
+    col1.metric("Total Produzido", f"{resumo['total_produzido']:,}")
+    col2.metric("Eficiência Média", f"{resumo['eficiencia_media']:.1f}%")
+    col3.metric("Custo Total", f"R$ {resumo['custo_total']:,.2f}")
+    col4.metric("Qualidade Média", f"{resumo['qualidade_media']:.1f}/5")
     
     # Gráficos
     col1, col2 = st.columns(2)
     
     with col1:
-        prod_linha = df.groupby('linha_producao')['quantidade_produzida'].sum()
-        fig = px.bar(x=prod_linha.index, y=prod_linha.values,
-                    title="Produção por Linha")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_producao_linha():
+            prod_linha = resumo['producao_linha']
+            return px.bar(x=prod_linha.index, y=prod_linha.values,
+                          title="Produção por Linha")
+        mostrar_grafico('producao_linha', ['producao'], grafico_producao_linha)
     
     with col2:
-        eficiencia_turno = df.groupby('turno').apply(
-            lambda x: (x['quantidade_produzida'] / x['quantidade_planejada'] * 100).mean()
-        )
-        fig = px.bar(x=eficiencia_turno.index, y=eficiencia_turno.values,
-                    title="Eficiência por Turno (%)")
-        st.plotly_chart(fig, use_container_width=True)
+        def grafico_eficiencia_turno():
+            eficiencia_turno = resumo['eficiencia_turno']
+            return px.bar(x=eficiencia_turno.index, y=eficiencia_turno.values,
+                          title="Eficiência por Turno (%)")
+        mostrar_grafico('producao_eficiencia_turno', ['producao'], grafico_eficiencia_turno)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
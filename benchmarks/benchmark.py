@@ -0,0 +1,297 @@
+"""Benchmarks de carga, agregação e renderização dos módulos do AirCatering BI
+
+Gera datasets sintéticos em várias escalas com utils/gerar_dados.py, mede
+a carga dos datasets e cada função mostrar_* sem navegador (Streamlit em modo
+"bare": widgets devolvem o valor padrão e os gráficos são serializados como
+seriam para o navegador) e grava os resultados em JSON para comparar commits.
+
+Uso:
+    python benchmarks/benchmark.py --tamanhos 10000 1000000 --saida resultado.json
+    python benchmarks/benchmark.py --comparar base.json resultado.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np
+import pandas as pd
+
+from utils import camada_dados
+from utils.camada_dados import cache_datasets
+from utils.gerar_dados import TAMANHOS_PADRAO, gerar_lotes, salvar_dataset_em_lotes
+
+TAMANHOS = [10_000, 1_000_000, 10_000_000]
+
+# Página -> nome da função em app.py
+PAGINAS = {
+    'dashboard': 'mostrar_dashboard_principal',
+    'vendas': 'mostrar_vendas',
+    'financeiro': 'mostrar_financeiro',
+    'estoque': 'mostrar_estoque',
+    'rh': 'mostrar_rh',
+    'producao': 'mostrar_producao',
+}
+
+
+def tamanhos_datasets(linhas_vendas):
+    """Registros de cada dataset para uma escala, na proporção dos tamanhos padrão"""
+    fator = linhas_vendas / TAMANHOS_PADRAO['vendas']
+    return {
+        nome: (padrao if nome == 'empresas_grupo' else max(1, int(padrao * fator)))
+        for nome, padrao in TAMANHOS_PADRAO.items()
+    }
+
+
+def preparar_dados(diretorio, linhas_vendas, seed):
+    """Gera (uma vez, reaproveitando entre execuções) os CSVs de uma escala"""
+    marcador = os.path.join(diretorio, 'benchmark.json')
+    parametros = {'linhas_vendas': linhas_vendas, 'seed': seed}
+    if os.path.exists(marcador):
+        with open(marcador, encoding='utf-8') as arquivo:
+            if json.load(arquivo) == parametros:
+                return
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.makedirs(diretorio)
+    camada_dados.DIRETORIO_DADOS = diretorio
+    for nome, registros in tamanhos_datasets(linhas_vendas).items():
+        print(f"  gerando {nome} ({registros:,} registros)...")
+        salvar_dataset_em_lotes(nome, gerar_lotes(nome, registros, vetorizado=True, seed=seed))
+    with open(marcador, 'w', encoding='utf-8') as arquivo:
+        json.dump(parametros, arquivo)
+
+
+def importar_app():
+    """Importa app.py com o Streamlit em modo bare e silencioso"""
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    logging.disable(logging.WARNING)
+    warnings.simplefilter('ignore')
+    import app
+    return app
+
+
+class Cronometro:
+    """Acumula o tempo gasto em st.plotly_chart e st.dataframe durante uma página"""
+
+    def __init__(self, st):
+        self.st = st
+        self.tempos = {'graficos': 0.0, 'tabelas': 0.0}
+        self._originais = {}
+
+    def _envolver(self, nome, categoria):
+        original = getattr(self.st, nome)
+
+        def cronometrado(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.tempos[categoria] += time.perf_counter() - inicio
+
+        self._originais[nome] = original
+        setattr(self.st, nome, cronometrado)
+
+    def __enter__(self):
+        self._envolver('plotly_chart', 'graficos')
+        self._envolver('dataframe', 'tabelas')
+        return self
+
+    def __exit__(self, *exc):
+        for nome, original in self._originais.items():
+            setattr(self.st, nome, original)
+
+
+def limpar_caches():
+    """Esvazia os caches do processo (datasets, derivados, figuras, ordenações e agregados em blocos)"""
+    from utils.cache_figuras import cache_figuras
+    from utils.fora_da_memoria import agregados_em_blocos
+    from utils.tabela_paginada import limpar_ordenacoes
+    cache_datasets.limpar()
+    cache_figuras.limpar()
+    limpar_ordenacoes()
+    agregados_em_blocos.limpar()
+
+
+def resumo(tempos):
+    return {
+        'tempos_s': [round(t, 6) for t in tempos],
+        'mediana_s': round(statistics.median(tempos), 6),
+        'min_s': round(min(tempos), 6),
+    }
+
+
+def medir_carga(diretorio, repeticoes):
+    """Tempos de carregar todos os datasets: CSV frio, snapshot frio e cache do processo"""
+    import app
+    resultados = {}
+    variantes = {
+        # Sem snapshot: parse do CSV + conversão para Parquet
+        'csv_frio': lambda: shutil.rmtree(os.path.join(diretorio, 'snapshots'), ignore_errors=True),
+        # Snapshot pronto, cache do processo vazio
+        'snapshot_frio': lambda: None,
+    }
+    for variante, preparar in variantes.items():
+        tempos = []
+        for _ in range(repeticoes):
+            preparar()
+            cache_datasets.limpar()
+            inicio = time.perf_counter()
+            dict(app.carregar_dados())
+            tempos.append(time.perf_counter() - inicio)
+        resultados[variante] = resumo(tempos)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        dict(app.carregar_dados())
+        tempos.append(time.perf_counter() - inicio)
+    resultados['cache_quente'] = resumo(tempos)
+    return resultados
+
+
+def medir_paginas(app, repeticoes):
+    """Tempos de cada mostrar_*
+
+    abertura: cache vazio, a página lê sob demanda (do snapshot) só os datasets que declara;
+    primeira: datasets já carregados, derivados (rollups, índices) e figuras ainda por calcular;
+    seguintes: renderizações repetidas com tudo em cache.
+    """
+    import streamlit as st
+    resultados = {}
+    for pagina, funcao in PAGINAS.items():
+        mostrar = getattr(app, funcao)
+        medicoes = {'abertura': [], 'primeira': [], 'seguintes': []}
+        partes = {'graficos': [], 'tabelas': []}
+        for _ in range(repeticoes):
+            limpar_caches()
+            inicio = time.perf_counter()
+            mostrar(app.carregar_dados(mostrar.datasets))
+            medicoes['abertura'].append(time.perf_counter() - inicio)
+        for repeticao in range(repeticoes + 1):
+            if repeticao == 0:
+                limpar_caches()
+                dados = dict(app.carregar_dados(mostrar.datasets))
+            with Cronometro(st) as cronometro:
+                inicio = time.perf_counter()
+                mostrar(dados)
+                total = time.perf_counter() - inicio
+            medicoes['primeira' if repeticao == 0 else 'seguintes'].append(total)
+            if repeticao > 0:
+                for parte, tempo in cronometro.tempos.items():
+                    partes[parte].append(tempo)
+        resultados[pagina] = {
+            **{variante: resumo(tempos) for variante, tempos in medicoes.items()},
+            # Renderizações seguintes divididas entre gráficos, tabelas e o restante (agregações)
+            'graficos_s': round(statistics.median(partes['graficos']), 6),
+            'tabelas_s': round(statistics.median(partes['tabelas']), 6),
+        }
+    return resultados
+
+
+def metadados():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import plotly
+    import streamlit
+    return {
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+        'streamlit': streamlit.__version__,
+    }
+
+
+def executar(tamanhos, repeticoes, diretorio_base, seed):
+    app = importar_app()
+    resultado = {'metadados': metadados(), 'escalas': []}
+    for linhas in tamanhos:
+        print(f"Escala: {linhas:,} vendas")
+        diretorio = os.path.join(diretorio_base, str(linhas))
+        preparar_dados(diretorio, linhas, seed)
+        camada_dados.DIRETORIO_DADOS = diretorio
+        print("  medindo carregar_dados()...")
+        carga = medir_carga(diretorio, repeticoes)
+        print("  medindo páginas...")
+        paginas = medir_paginas(app, repeticoes)
+        resultado['escalas'].append({
+            'linhas_vendas': linhas,
+            'registros': tamanhos_datasets(linhas),
+            'carregar_dados': carga,
+            'paginas': paginas,
+        })
+    return resultado
+
+
+def _medianas(resultado):
+    """Achata um resultado em {(escala, medição): mediana} para comparação"""
+    medianas = {}
+    for escala in resultado['escalas']:
+        linhas = escala['linhas_vendas']
+        for variante, valores in escala['carregar_dados'].items():
+            medianas[(linhas, f'carregar_dados/{variante}')] = valores['mediana_s']
+        for pagina, valores in escala['paginas'].items():
+            for variante, valor in valores.items():
+                if isinstance(valor, dict):
+                    medianas[(linhas, f'{pagina}/{variante}')] = valor['mediana_s']
+    return medianas
+
+
+def comparar(caminho_base, caminho_novo):
+    """Tabela com as medianas de dois resultados e a razão novo/base"""
+    with open(caminho_base, encoding='utf-8') as arquivo:
+        base = _medianas(json.load(arquivo))
+    with open(caminho_novo, encoding='utf-8') as arquivo:
+        novo = _medianas(json.load(arquivo))
+    linhas = [
+        {'linhas_vendas': escala, 'medicao': medicao, 'base_s': base[chave], 'novo_s': novo[chave],
+         'razao': round(novo[chave] / base[chave], 2) if base[chave] else None}
+        for chave in sorted(base.keys() & novo.keys())
+        for escala, medicao in [chave]
+    ]
+    return pd.DataFrame(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do AirCatering BI")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS,
+                        help="linhas de vendas de cada escala (demais datasets proporcionais)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dados', default=os.path.join(tempfile.gettempdir(), 'aircatering_benchmark'),
+                        help="diretório onde os datasets gerados são guardados entre execuções")
+    parser.add_argument('--saida', default='benchmark.json', help="arquivo JSON de resultados")
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'NOVO'),
+                        help="compara dois arquivos de resultados em vez de medir")
+    args = parser.parse_args()
+
+    if args.comparar:
+        print(comparar(*args.comparar).to_string(index=False))
+        return
+
+    resultado = executar(args.tamanhos, args.repeticoes, args.dados, args.seed)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
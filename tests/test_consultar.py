@@ -0,0 +1,52 @@
+"""consultar() responde igual em memória e pelo snapshot, inclusive com datas do st.date_input"""
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import camada_dados
+from utils.camada_dados import CacheDatasets
+from utils.snapshot import PARQUET_DISPONIVEL, snapshot_atualizado
+
+DIRETORIO_ORIGINAL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+class TestConsultar(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.diretorio_anterior = camada_dados.DIRETORIO_DADOS
+        camada_dados.DIRETORIO_DADOS = self.diretorio
+        for nome in ('vendas', 'rh'):
+            shutil.copy(os.path.join(DIRETORIO_ORIGINAL, camada_dados.DATASETS[nome]['arquivo']), self.diretorio)
+
+    def tearDown(self):
+        camada_dados.DIRETORIO_DADOS = self.diretorio_anterior
+        shutil.rmtree(self.diretorio)
+
+    def _consultas(self, nome, colunas, filtros):
+        """Resultado pelo snapshot (cache novo) e em memória (dataset já carregado)"""
+        CacheDatasets().obter(nome)
+        if not PARQUET_DISPONIVEL or not snapshot_atualizado(camada_dados.caminho_dataset(nome)):
+            self.skipTest("snapshot Parquet indisponível")
+        snapshot = CacheDatasets().consultar(nome, colunas, filtros)
+        cache = CacheDatasets()
+        cache.obter(nome)
+        return snapshot, cache.consultar(nome, colunas, filtros)
+
+    def test_intervalo_de_datas(self):
+        inicio, fim = datetime.date(2024, 3, 1), datetime.date(2024, 6, 30)
+        filtros = [('data_venda', '>=', inicio), ('data_venda', '<=', fim)]
+        snapshot, memoria = self._consultas('vendas', ['id', 'data_venda'], filtros)
+        self.assertEqual(len(snapshot), len(memoria))
+        self.assertTrue(memoria['data_venda'].between(inicio.isoformat(), fim.isoformat()).all())
+
+    def test_igualdade(self):
+        snapshot, memoria = self._consultas('rh', ['status'], [('status', '==', 'Ativo')])
+        self.assertEqual(len(snapshot), len(memoria))
+        self.assertTrue(len(memoria) > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
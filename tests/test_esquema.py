@@ -0,0 +1,25 @@
+"""UUIDs só viram 16 bytes quando todos os valores são UUIDs de 36 caracteres"""
+import unittest
+import uuid
+
+import pandas as pd
+
+from utils.esquema import PYARROW_DISPONIVEL, uuid_para_bytes, uuid_para_texto
+
+
+@unittest.skipUnless(PYARROW_DISPONIVEL, "pyarrow não instalado")
+class TestUuidParaBytes(unittest.TestCase):
+
+    def test_ida_e_volta(self):
+        valores = [str(uuid.uuid4()) for _ in range(5)]
+        binario = uuid_para_bytes(pd.Series(valores))
+        self.assertEqual(list(uuid_para_texto(binario)), valores)
+
+    def test_valor_mais_longo_fica_texto(self):
+        # Com o cast direto para S36 o sufixo seria descartado sem erro
+        valores = [str(uuid.uuid4()), str(uuid.uuid4()) + '-1']
+        self.assertEqual(list(uuid_para_bytes(pd.Series(valores))), valores)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Ingestão incremental: uma linha ainda sendo escrita não pode entrar duas vezes"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import camada_dados
+from utils.camada_dados import CacheDatasets
+from utils.fora_da_memoria import CacheAgregadosEmBlocos
+
+DIRETORIO_ORIGINAL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+class TestLinhaIncompleta(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.diretorio_anterior = camada_dados.DIRETORIO_DADOS
+        camada_dados.DIRETORIO_DADOS = self.diretorio
+        self.divisao_anterior = camada_dados.TAMANHO_MINIMO_DIVISAO, camada_dados.THREADS_CARGA
+        self._preparar('financeiro')
+
+    def _preparar(self, nome):
+        shutil.copy(os.path.join(DIRETORIO_ORIGINAL, camada_dados.DATASETS[nome]['arquivo']), self.diretorio)
+        self.caminho = camada_dados.caminho_dataset(nome)
+        with open(self.caminho, encoding='utf-8') as arquivo:
+            linhas = arquivo.read().splitlines()
+        self.linhas_completas = len(linhas) - 1
+        # Uma linha nova escrita pela metade (sem a quebra final) e o restante dela
+        linha = linhas[1]
+        self.inicio_linha, self.fim_linha = linha[:len(linha) // 2], linha[len(linha) // 2:] + '\n'
+
+    def tearDown(self):
+        camada_dados.DIRETORIO_DADOS = self.diretorio_anterior
+        camada_dados.TAMANHO_MINIMO_DIVISAO, camada_dados.THREADS_CARGA = self.divisao_anterior
+        shutil.rmtree(self.diretorio)
+
+    def _escrever(self, texto):
+        with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+        # Garante uma assinatura nova mesmo com mtime de baixa resolução
+        info = os.stat(self.caminho)
+        os.utime(self.caminho, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000_000))
+
+    def test_carga_completa_e_cauda(self):
+        cache = CacheDatasets()
+        self._escrever(self.inicio_linha)
+        df = cache.obter('financeiro')
+        self.assertEqual(len(df), self.linhas_completas)
+
+        self._escrever(self.fim_linha)
+        df = cache.obter('financeiro')
+        self.assertEqual(len(df), self.linhas_completas + 1)
+        self.assertFalse(df['status'].isna().any())
+        self.assertEqual(cache.estatisticas()['incrementos'], 1)
+
+    def test_vendas_em_trechos(self):
+        # Colunas inteiras não aceitam nulos: a linha pela metade nem pode chegar ao parser
+        self._preparar('vendas')
+        camada_dados.TAMANHO_MINIMO_DIVISAO, camada_dados.THREADS_CARGA = 1, 4
+        cache = CacheDatasets()
+        self._escrever(self.inicio_linha)
+        self.assertEqual(len(cache.obter('vendas')), self.linhas_completas)
+
+        self._escrever(self.fim_linha)
+        self.assertEqual(len(cache.obter('vendas')), self.linhas_completas + 1)
+        self.assertEqual(cache.estatisticas()['incrementos'], 1)
+
+    def test_agregado_em_blocos(self):
+        cache = CacheAgregadosEmBlocos(tamanho_bloco=100)
+        self._escrever(self.inicio_linha)
+        cache.obter('financeiro')
+        self.assertEqual(cache.estatisticas()['datasets']['financeiro']['linhas'], self.linhas_completas)
+
+        self._escrever(self.fim_linha)
+        cache.obter('financeiro')
+        self.assertEqual(cache.estatisticas()['datasets']['financeiro']['linhas'], self.linhas_completas + 1)
+        self.assertEqual(cache.estatisticas()['incrementos'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
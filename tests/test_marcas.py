@@ -0,0 +1,69 @@
+"""Figuras e ordenações ficam sob a versão dos dados entregue ao rerun, não a atual do cache"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import plotly.graph_objects as go
+
+from utils import camada_dados, tabela_paginada
+from utils.cache_figuras import CacheFiguras
+from utils.camada_dados import CacheDatasets, DadosSobDemanda
+
+DIRETORIO_ORIGINAL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+class TestVersaoPublicadaDuranteRerun(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.diretorio_anterior = camada_dados.DIRETORIO_DADOS
+        camada_dados.DIRETORIO_DADOS = self.diretorio
+        shutil.copy(os.path.join(DIRETORIO_ORIGINAL, camada_dados.DATASETS['financeiro']['arquivo']), self.diretorio)
+        self.caminho = camada_dados.caminho_dataset('financeiro')
+        self.cache = CacheDatasets()
+
+    def tearDown(self):
+        camada_dados.DIRETORIO_DADOS = self.diretorio_anterior
+        shutil.rmtree(self.diretorio)
+
+    def _publicar_linha(self):
+        """O agendador publica uma versão com uma linha a mais"""
+        with open(self.caminho, encoding='utf-8') as arquivo:
+            linha = arquivo.read().splitlines()[1]
+        with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(linha + '\n')
+        info = os.stat(self.caminho)
+        os.utime(self.caminho, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000_000))
+        self.assertTrue(self.cache.atualizar('financeiro'))
+
+    def test_figura(self):
+        figuras = CacheFiguras(cache=self.cache)
+        df = DadosSobDemanda(['financeiro'], cache=self.cache)['financeiro']
+        marca = self.cache.marca('financeiro')
+        self._publicar_linha()
+        figuras.figura('linhas', ['financeiro'], lambda: go.Figure(layout={'title': str(len(df))}))
+
+        # O rerun seguinte lê a versão nova e não pode receber a figura da anterior
+        novo = DadosSobDemanda(['financeiro'], cache=self.cache)['financeiro']
+        self.assertNotEqual(self.cache.marca('financeiro'), marca)
+        figura = figuras.figura('linhas', ['financeiro'], lambda: go.Figure(layout={'title': str(len(novo))}))
+        self.assertEqual(figura.to_dict()['layout']['title']['text'], str(len(novo)))
+
+    def test_ordenacao(self):
+        df = DadosSobDemanda(['financeiro'], cache=self.cache)['financeiro']
+        memo = ('tabela', self.cache.marcas_lidas(['financeiro']), ())
+        self._publicar_linha()
+        tabela_paginada.ordenar_posicoes(df, 'valor', True, memo)
+
+        novo = DadosSobDemanda(['financeiro'], cache=self.cache)['financeiro']
+        memo_novo = ('tabela', self.cache.marcas_lidas(['financeiro']), ())
+        self.assertNotEqual(memo_novo, memo)
+        posicoes = tabela_paginada.ordenar_posicoes(novo, 'valor', True, memo_novo)
+        self.assertEqual(len(posicoes), len(novo))
+        # Mesma chave com outro número de linhas: as posições não são reaproveitadas
+        self.assertEqual(len(tabela_paginada.ordenar_posicoes(df, 'valor', True, memo_novo)), len(df))
+
+
+if __name__ == '__main__':
+    unittest.main()
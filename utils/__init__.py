@@ -0,0 +1 @@
+"""Utilitários do AirCatering BI: geração e camada de dados"""
@@ -0,0 +1,86 @@
+"""Agendador em segundo plano que prepara as novas versões dos datasets antes dos usuários"""
+import os
+import threading
+import time
+
+from utils.camada_dados import cache_datasets
+
+# Segundos entre as verificações dos arquivos; 0 desativa o agendador
+INTERVALO_PRECOMPUTO = float(os.environ.get('AIRCATERING_PRECOMPUTO', '5'))
+
+
+class AgendadorPrecomputo:
+    """Thread que detecta arquivos de dados alterados e recalcula os agregados fora das sessões
+
+    A cada intervalo, os datasets já carregados cujo arquivo mudou são relidos
+    (pela cauda quando possível) e todos os derivados registrados nas páginas
+    (rollups, índices, KPIs, resumos) são recalculados na versão nova antes de
+    ela ser publicada; até lá as sessões continuam usando a versão anterior.
+    """
+
+    def __init__(self, cache=None, intervalo=INTERVALO_PRECOMPUTO):
+        self._cache = cache if cache is not None else cache_datasets
+        self.intervalo = intervalo
+        self._thread = None
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self.execucoes = 0
+        self.atualizacoes = 0
+        self.erros = 0
+        self.ultimo_erro = None
+        self.ultima_execucao = None
+
+    def verificar(self):
+        """Uma passada: publica a nova versão de cada dataset alterado; retorna os nomes atualizados"""
+        atualizados = []
+        for nome in self._cache.carregados():
+            try:
+                if self._cache.atualizar(nome):
+                    atualizados.append(nome)
+            except Exception as erro:
+                # A versão anterior continua publicada; a próxima carga pelas sessões tenta de novo
+                self.erros += 1
+                self.ultimo_erro = f"{nome}: {erro}"
+        self.execucoes += 1
+        self.atualizacoes += len(atualizados)
+        self.ultima_execucao = time.time()
+        return atualizados
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self.verificar()
+
+    def iniciar(self):
+        """Inicia a thread (uma por processo; chamadas seguintes não fazem nada)"""
+        with self._lock:
+            if self.intervalo <= 0 or (self._thread is not None and self._thread.is_alive()):
+                return False
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name='aircatering-precomputo', daemon=True)
+            self._thread.start()
+            return True
+
+    def parar(self):
+        """Interrompe a thread e espera a passada em andamento terminar"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._parar.set()
+            thread.join()
+
+    def estatisticas(self):
+        """Passadas executadas, versões publicadas, erros e horário da última passada"""
+        return {
+            'ativo': self._thread is not None and self._thread.is_alive(),
+            'intervalo': self.intervalo,
+            'execucoes': self.execucoes,
+            'atualizacoes': self.atualizacoes,
+            'erros': self.erros,
+            'ultimo_erro': self.ultimo_erro,
+            'ultima_execucao': self.ultima_execucao,
+        }
+
+
+# Instância única por processo: o Streamlit reexecuta app.py a cada interação,
+# mas a thread iniciada na primeira execução continua rodando
+agendador_precomputo = AgendadorPrecomputo()
@@ -0,0 +1,67 @@
+"""Agregações das páginas, calculadas uma vez por versão do dataset (cache_datasets.derivado)"""
+from utils.rollups import agregar_cubo
+from utils.turnover import desligados, quadro, tempo_medio_empresa, turnover_mensal
+
+
+def resumo_estoque(df):
+    """Valor do estoque e totais por categoria (usa a coluna derivada valor_estoque)"""
+    return {
+        'valor_total': df['valor_estoque'].sum(),
+        'num_categorias': df['categoria'].nunique(),
+        'quantidade_categoria': df.groupby('categoria', observed=True)['quantidade_atual'].sum(),
+        'valor_categoria': df.groupby('categoria', observed=True)['valor_estoque'].sum(),
+    }
+
+
+def resumo_rh(df):
+    """Totais de funcionários e folha, turnover geral, quebras do quadro e turnover mensal"""
+    total = len(df)
+    inativos = int(desligados(df).sum())
+    por_departamento, por_cargo_nivel = quadro(df)
+    return {
+        'total': total,
+        'ativos': int((df['status'] == 'Ativo').sum()),
+        'inativos': inativos,
+        'turnover': (inativos / total * 100) if total > 0 else 0,
+        'folha': df['salario'].sum(),
+        'salario_medio': df['salario'].mean(),
+        'tempo_medio_anos': tempo_medio_empresa(df),
+        'departamentos': por_departamento,
+        'cargo_nivel': por_cargo_nivel,
+        'turnover_mensal': turnover_mensal(df),
+    }
+
+
+def resumo_producao(df):
+    """KPIs de produção, produção por linha e eficiência por turno (usa a coluna derivada eficiencia)"""
+    return {
+        'total_produzido': df['quantidade_produzida'].sum(),
+        'eficiencia_media': df['eficiencia'].mean(),
+        'custo_total': df['custo_producao'].sum(),
+        'qualidade_media': df['qualidade_nota'].mean(),
+        'producao_linha': df.groupby('linha_producao', observed=True)['quantidade_produzida'].sum(),
+        'eficiencia_turno': df.groupby('turno', observed=True)['eficiencia'].mean(),
+    }
+
+
+def kpis_financeiro(cubo):
+    """Receitas, despesas, lucro, fluxo mensal e valores por categoria a partir do cubo financeiro
+
+    O cubo (mês × tipo × categoria × conta) já é a passada única sobre os
+    lançamentos; aqui ele é somado por tipo e categoria uma vez e os totais
+    saem dessa tabela pequena, sem filtrar as linhas originais.
+    """
+    por_categoria = agregar_cubo(cubo, ['tipo', 'categoria'], 'valor')
+    totais = por_categoria.groupby('tipo', observed=True)['valor'].sum()
+    receitas = totais.get('Receita', 0.0)
+    despesas = abs(totais.get('Despesa', 0.0))
+    lucro = receitas - despesas
+    return {
+        'receitas': receitas,
+        'despesas': despesas,
+        'lucro': lucro,
+        'margem': (lucro / receitas * 100) if receitas else 0.0,
+        'fluxo_mensal': agregar_cubo(cubo, ['mes', 'tipo'], 'valor'),
+        'receitas_categoria': por_categoria[por_categoria['tipo'] == 'Receita'][['categoria', 'valor']],
+        'despesas_categoria': por_categoria[por_categoria['tipo'] == 'Despesa'][['categoria', 'valor']],
+    }
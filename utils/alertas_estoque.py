@@ -0,0 +1,209 @@
+"""Índice de alertas do estoque: produtos abaixo do mínimo e produtos perto do vencimento"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.camada_dados import cache_datasets
+from utils.esquema import aplicar_esquema, concatenar
+
+# Colunas devolvidas nas consultas de alertas
+COLUNAS_ALERTA = ['nome_produto', 'categoria', 'quantidade_atual', 'quantidade_minima', 'validade']
+# Linhas exibidas nas tabelas de alertas (as contagens são sempre completas)
+LIMITE_ALERTAS = 500
+# Produtos na tabela dos mais críticos
+TOP_CRITICOS = 10
+# Acima desta fração do estoque em linhas alteradas, reconstruir sai mais barato
+# que manter a sobreposição (e libera as colunas da versão em que o índice foi montado)
+FRACAO_RECONSTRUCAO = 0.25
+
+
+class IndiceAlertasEstoque:
+    """Margens (quantidade atual - mínima) e validades mantidas em arrays ordenados
+
+    As consultas são buscas binárias e fatias sobre esses arrays: "estoque
+    baixo" é o prefixo com margem <= 0, "vence em N dias" é o intervalo de
+    validades [hoje, hoje + N] e os K mais críticos são as K menores margens.
+
+    Linhas alteradas são aplicadas com atualizar(), chamado por mesclar_alertas()
+    a cada recarga do estoque: só as posições delas saem e voltam aos arrays
+    ordenados, sem reordenar o estoque inteiro. O DataFrame de origem não é
+    copiado nem alterado; as linhas alteradas ou novas ficam numa sobreposição
+    pequena consultada ao montar os resultados.
+    """
+
+    def __init__(self, df):
+        self._colunas = [coluna for coluna in COLUNAS_ALERTA if coluna in df.columns]
+        # Só os arrays das colunas de alerta: o índice sobrevive a recargas do estoque
+        # e não deve prender as demais colunas da versão em que foi montado
+        self._base = {coluna: df[coluna].array for coluna in self._colunas}
+        self.ids = pd.Index(df['id'].to_numpy() if 'id' in df.columns else np.arange(len(df)))
+        # Monta já a tabela hash dos ids (senão o custo cai no primeiro atualizar());
+        # ids acrescentados depois ficam num dicionário, sem reconstruir a tabela
+        self.ids.get_indexer(self.ids[:1])
+        self._ids_novos = {}
+        # Cópias próprias: atualizar() escreve nelas, e o df pode estar mapeado somente leitura
+        self._atual = np.array(df['quantidade_atual'], dtype=np.int64)
+        self._minima = np.array(df['quantidade_minima'], dtype=np.int64)
+        if 'validade' in df.columns:
+            self._validade = np.array(df['validade'], dtype='datetime64[ns]')
+        else:
+            self._validade = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+        # Posições da base substituídas por linhas da sobreposição (indexada pela posição)
+        self._substituida = np.zeros(len(df), dtype=bool)
+        self._sobreposicao = None
+        self._lock = threading.Lock()
+
+        posicoes = np.arange(len(df))
+        self._margens, self._ordem_margem = self._ordenar(self._atual - self._minima, posicoes)
+        self._validades, self._ordem_validade = self._ordenar(*self._com_validade(posicoes))
+
+    @staticmethod
+    def _ordenar(chaves, posicoes):
+        ordem = np.argsort(chaves, kind='stable')
+        return chaves[ordem], posicoes[ordem]
+
+    def _com_validade(self, posicoes):
+        """Validades e posições dos itens que têm validade"""
+        validades = self._validade[posicoes]
+        preenchidas = ~np.isnat(validades)
+        return validades[preenchidas], posicoes[preenchidas]
+
+    @staticmethod
+    def _substituir(chaves, ordem, posicoes, novas_chaves, novas_posicoes):
+        """Tira `posicoes` dos arrays ordenados e insere as novas chaves no lugar certo"""
+        manter = ~np.isin(ordem, posicoes)
+        chaves, ordem = chaves[manter], ordem[manter]
+        ordem_novas = np.argsort(novas_chaves, kind='stable')
+        novas_chaves, novas_posicoes = novas_chaves[ordem_novas], novas_posicoes[ordem_novas]
+        pontos = np.searchsorted(chaves, novas_chaves, side='right')
+        return np.insert(chaves, pontos, novas_chaves), np.insert(ordem, pontos, novas_posicoes)
+
+    def atualizar(self, linhas):
+        """Aplica linhas novas ou alteradas do estoque (identificadas pela coluna 'id')
+
+        O custo é proporcional ao número de linhas alteradas, mais uma cópia dos
+        arrays ordenados; o estoque não é reordenado.
+        """
+        if len(linhas) == 0:
+            return
+        linhas = aplicar_esquema('estoque', linhas.drop_duplicates('id', keep='last'))
+        with self._lock:
+            ids = linhas['id'].to_numpy()
+            posicoes = self.ids.get_indexer(ids)
+            for i in np.flatnonzero(posicoes < 0):
+                posicoes[i] = self._ids_novos.get(ids[i], -1)
+            novos = posicoes < 0
+            if novos.any():
+                inicio = len(self._atual)
+                posicoes[novos] = np.arange(inicio, inicio + int(novos.sum()))
+                self._ids_novos.update(zip(ids[novos], posicoes[novos]))
+                vazios = int(novos.sum())
+                self._atual = np.concatenate([self._atual, np.zeros(vazios, dtype=np.int64)])
+                self._minima = np.concatenate([self._minima, np.zeros(vazios, dtype=np.int64)])
+                self._validade = np.concatenate(
+                    [self._validade, np.full(vazios, np.datetime64('NaT'), dtype='datetime64[ns]')])
+            self._atual[posicoes] = linhas['quantidade_atual'].to_numpy(dtype=np.int64)
+            self._minima[posicoes] = linhas['quantidade_minima'].to_numpy(dtype=np.int64)
+            if 'validade' in linhas.columns:
+                self._validade[posicoes] = linhas['validade'].to_numpy(dtype='datetime64[ns]')
+            self._substituida[posicoes[posicoes < len(self._substituida)]] = True
+
+            alteradas = linhas.reindex(columns=self._colunas).set_axis(posicoes)
+            if self._sobreposicao is None:
+                self._sobreposicao = alteradas
+            else:
+                anteriores = self._sobreposicao[~self._sobreposicao.index.isin(posicoes)]
+                self._sobreposicao = concatenar(anteriores, alteradas).set_axis(
+                    np.concatenate([anteriores.index.to_numpy(), posicoes]))
+
+            self._margens, self._ordem_margem = self._substituir(
+                self._margens, self._ordem_margem, posicoes, self._atual[posicoes] - self._minima[posicoes], posicoes)
+            self._validades, self._ordem_validade = self._substituir(
+                self._validades, self._ordem_validade, posicoes, *self._com_validade(posicoes))
+
+    def _linhas(self, posicoes):
+        """Linhas nas posições pedidas (na ordem pedida), vindas da base ou da sobreposição"""
+        if self._sobreposicao is None:
+            return self._da_base(posicoes)
+        limite = len(self._substituida)
+        na_base = posicoes < limite
+        na_base[na_base] = ~self._substituida[posicoes[na_base]]
+        partes = concatenar(
+            self._da_base(posicoes[na_base]),
+            self._sobreposicao.loc[posicoes[~na_base]].reset_index(drop=True),
+        )
+        ordem = np.concatenate([np.flatnonzero(na_base), np.flatnonzero(~na_base)])
+        return partes.iloc[np.argsort(ordem, kind='stable')].reset_index(drop=True)
+
+    def _da_base(self, posicoes):
+        # take coluna a coluna: não passa pelas demais colunas do estoque
+        return pd.DataFrame({coluna: self._base[coluna].take(posicoes) for coluna in self._colunas})
+
+    @property
+    def num_linhas(self):
+        """Produtos no índice, incluindo os acrescentados por atualizar()"""
+        return len(self._atual)
+
+    @property
+    def num_alteradas(self):
+        """Linhas aplicadas com atualizar() desde a construção do índice"""
+        return 0 if self._sobreposicao is None else len(self._sobreposicao)
+
+    @property
+    def num_estoque_baixo(self):
+        """Quantidade de produtos com estoque atual <= mínimo"""
+        return int(np.searchsorted(self._margens, 0, side='right'))
+
+    def estoque_baixo(self, limite=None):
+        """Produtos com estoque atual <= mínimo, do mais crítico para o menos crítico"""
+        with self._lock:
+            return self._com_margem(self._ordem_margem[:self.num_estoque_baixo][:limite])
+
+    def mais_criticos(self, k=10):
+        """Os k produtos com a menor margem entre estoque atual e mínimo"""
+        with self._lock:
+            return self._com_margem(self._ordem_margem[:k])
+
+    def _intervalo_validade(self, dias, hoje, incluir_vencidos):
+        hoje = pd.Timestamp(hoje) if hoje is not None else pd.Timestamp.today().normalize()
+        limite = np.datetime64(hoje + pd.Timedelta(days=dias), 'ns')
+        inicio = 0 if incluir_vencidos else np.searchsorted(self._validades, np.datetime64(hoje, 'ns'), side='left')
+        fim = np.searchsorted(self._validades, limite, side='right')
+        return int(inicio), int(max(fim, inicio))
+
+    def num_vencendo(self, dias, hoje=None, incluir_vencidos=False):
+        """Quantidade de produtos com validade até hoje + dias"""
+        inicio, fim = self._intervalo_validade(dias, hoje, incluir_vencidos)
+        return fim - inicio
+
+    def vencendo(self, dias, hoje=None, incluir_vencidos=False, limite=None):
+        """Produtos com validade até hoje + dias (e a partir de hoje, salvo incluir_vencidos), por validade"""
+        with self._lock:
+            inicio, fim = self._intervalo_validade(dias, hoje, incluir_vencidos)
+            return self._linhas(self._ordem_validade[inicio:fim][:limite])
+
+    def _com_margem(self, posicoes):
+        linhas = self._linhas(posicoes)
+        linhas['margem'] = self._atual[posicoes] - self._minima[posicoes]
+        return linhas
+
+
+def mesclar_alertas(indice, alteradas):
+    """Função de mesclagem do índice: aplica as linhas alteradas de uma recarga do estoque
+
+    Devolve None (o índice é reconstruído) quando as alterações acumuladas
+    passariam de FRACAO_RECONSTRUCAO do estoque. O índice é alterado no lugar:
+    a versão anterior, servida enquanto a nova é preparada, já responde com as
+    linhas alteradas.
+    """
+    if indice.num_alteradas + len(alteradas) > FRACAO_RECONSTRUCAO * indice.num_linhas:
+        return None
+    indice.atualizar(alteradas)
+    return indice
+
+
+def indice_alertas():
+    """Índice de alertas da versão atual do estoque, atualizado só com as linhas alteradas a cada recarga"""
+    return cache_datasets.derivado('estoque', 'alertas', IndiceAlertasEstoque, mesclar_alertas,
+                                   ['id'] + COLUNAS_ALERTA)
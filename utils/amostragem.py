@@ -0,0 +1,127 @@
+"""Redução de séries temporais longas a um orçamento de pontos para os gráficos
+
+A série é somada na resolução mais fina (hora, dia, semana, mês) que gera no
+máximo FATOR_PRESELECAO × orçamento pontos; o excesso é reduzido pelo MinMaxLTTB:
+uma pré-seleção dos mínimos e máximos de cada balde, que preserva picos e vales,
+seguida do LTTB (largest-triangle-three-buckets), que mantém a forma visual da
+série com o número de pontos do orçamento. Um intervalo menor (zoom) cabe numa
+resolução mais fina, então o gráfico ganha detalhe sem aumentar o payload.
+"""
+import numpy as np
+import pandas as pd
+
+# Pontos enviados ao navegador por série: cerca de um por pixel de um gráfico na largura da página
+ORCAMENTO_PONTOS = 1000
+# Pontos mantidos pela pré-seleção de mínimos e máximos, em múltiplos do orçamento
+FATOR_PRESELECAO = 4
+# Resoluções de agregação, da mais fina para a mais grossa: regra, duração e descrição.
+# Períodos de duração fixa começam em múltiplos da duração contados da segunda-feira 1970-01-05
+RESOLUCOES = [
+    ('h', pd.Timedelta(hours=1), 'horária'),
+    ('D', pd.Timedelta(days=1), 'diária'),
+    ('W', pd.Timedelta(weeks=1), 'semanal'),
+    ('MS', pd.Timedelta(days=30.44), 'mensal'),
+]
+NS_POR_DIA = pd.Timedelta(days=1).value
+_ORIGEM = pd.Timestamp('1970-01-05').value
+
+
+def lttb(x, y, n_pontos):
+    """Índices dos n_pontos escolhidos pelo LTTB (sempre inclui o primeiro e o último)"""
+    tamanho = len(x)
+    if n_pontos >= tamanho or n_pontos < 3:
+        return np.arange(tamanho)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Os pontos internos são divididos em n_pontos - 2 baldes; cada balde contribui um ponto
+    limites = np.linspace(1, tamanho - 1, n_pontos - 1).astype(np.int64)
+    selecionados = np.empty(n_pontos, dtype=np.int64)
+    selecionados[0], selecionados[-1] = 0, tamanho - 1
+    anterior = 0
+    for i in range(n_pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        # Terceiro vértice do triângulo: média do próximo balde (ou o último ponto)
+        if i + 2 < len(limites):
+            media_x = x[fim:limites[i + 2]].mean()
+            media_y = y[fim:limites[i + 2]].mean()
+        else:
+            media_x, media_y = x[-1], y[-1]
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        selecionados[i + 1] = anterior
+    return selecionados
+
+
+def min_max(y, n_baldes):
+    """Índices (ordenados) do mínimo e do máximo de cada um dos n_baldes baldes de y"""
+    limites = np.linspace(0, len(y), n_baldes + 1).astype(np.int64)
+    indices = []
+    for inicio, fim in zip(limites[:-1], limites[1:]):
+        if fim > inicio:
+            trecho = y[inicio:fim]
+            indices.extend((inicio + int(np.argmin(trecho)), inicio + int(np.argmax(trecho))))
+    return np.unique(indices)
+
+
+def reduzir(x, y, orcamento=ORCAMENTO_PONTOS):
+    """Índices de no máximo `orcamento` pontos da série pelo MinMaxLTTB"""
+    tamanho = len(x)
+    if tamanho <= orcamento:
+        return np.arange(tamanho)
+    y = np.asarray(y, dtype=np.float64)
+    candidatos = np.arange(tamanho)
+    if tamanho > FATOR_PRESELECAO * orcamento:
+        candidatos = min_max(y, FATOR_PRESELECAO * orcamento // 2)
+        # O primeiro e o último ponto fixam as extremidades do eixo
+        candidatos = np.union1d(candidatos, [0, tamanho - 1])
+    escolhidos = lttb(np.asarray(x)[candidatos], y[candidatos], orcamento)
+    return candidatos[escolhidos]
+
+
+def escolher_resolucao(inicio, fim, orcamento=ORCAMENTO_PONTOS, somente_datas=False):
+    """Resolução (regra, descrição) mais fina que cobre [inicio, fim] sem exceder a pré-seleção"""
+    extensao = pd.Timestamp(fim) - pd.Timestamp(inicio)
+    for regra, duracao, descricao in RESOLUCOES:
+        if somente_datas and duracao < pd.Timedelta(days=1):
+            continue
+        if extensao / duracao <= FATOR_PRESELECAO * orcamento:
+            return regra, descricao
+    regra, _, descricao = RESOLUCOES[-1]
+    return regra, descricao
+
+
+def somar_por_periodo(datas, valores, regra):
+    """Série com a soma de `valores` em cada período da regra, incluindo períodos vazios
+
+    Para durações fixas o período de cada linha é uma divisão inteira e a soma
+    um bincount, em uma passada e sem ordenar; meses usam o resample do pandas.
+    """
+    if regra == 'MS':
+        return pd.Series(valores, index=datas).resample('MS').sum()
+    passo = next(duracao for nome, duracao, _ in RESOLUCOES if nome == regra).value
+    periodos = (datas.asi8 - _ORIGEM) // passo
+    primeiro = periodos.min()
+    somas = np.bincount(periodos - primeiro, weights=valores)
+    inicio = pd.Timestamp(_ORIGEM + primeiro * passo)
+    return pd.Series(somas, index=pd.date_range(inicio, periods=len(somas), freq=pd.Timedelta(passo)))
+
+
+def serie_temporal(datas, valores, orcamento=ORCAMENTO_PONTOS):
+    """Soma de `valores` por período na resolução automática, reduzida ao orçamento de pontos
+
+    Retorna (DataFrame com 'periodo' e 'valor', descrição da resolução, pontos antes da redução).
+    """
+    datas = pd.DatetimeIndex(datas)
+    if len(datas) == 0:
+        return pd.DataFrame({'periodo': pd.DatetimeIndex([]), 'valor': []}), None, 0
+    valores = np.asarray(valores, dtype=np.float64)
+    # Datas sem horário não têm detalhe abaixo do dia
+    somente_datas = not (datas.asi8 % NS_POR_DIA).any()
+    regra, descricao = escolher_resolucao(datas.min(), datas.max(), orcamento, somente_datas)
+    agregada = somar_por_periodo(datas, valores, regra)
+    indices = reduzir(agregada.index.asi8, agregada.to_numpy(), orcamento)
+    resultado = pd.DataFrame({'periodo': agregada.index[indices], 'valor': agregada.to_numpy()[indices]})
+    return resultado, descricao, len(agregada)
@@ -0,0 +1,123 @@
+"""Cache das figuras Plotly por versão dos dados, gráfico e parâmetros de filtro"""
+import datetime
+import json
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from utils.camada_dados import cache_datasets
+from utils.instrumentacao import trecho
+
+
+def normalizar_parametros(valor):
+    """Versão hashable e independente de ordem dos parâmetros de filtro"""
+    if isinstance(valor, dict):
+        return tuple(sorted((chave, normalizar_parametros(item)) for chave, item in valor.items()))
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return frozenset(normalizar_parametros(item) for item in valor)
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    return valor
+
+
+class FiguraSerializada(go.Figure):
+    """Figura guardada como o JSON enviado ao navegador
+
+    st.plotly_chart converte a figura com to_dict() antes de serializá-la: aqui
+    o dicionário sai do JSON guardado, sem copiar nem validar a figura original.
+    """
+
+    def __init__(self, texto):
+        super().__init__()
+        self._texto = texto
+
+    def to_dict(self):
+        return json.loads(self._texto)
+
+    def to_plotly_json(self):
+        return self.to_dict()
+
+
+class CacheFiguras:
+    """LRU de figuras serializadas, limitado pelo tamanho do JSON, compartilhado entre reruns e sessões
+
+    A chave é (gráfico, marcas das versões usadas, parâmetros): uma nova versão
+    de qualquer dataset gera outra chave, e as figuras antigas saem pelo LRU.
+    Cada figura é serializada uma vez, e o tamanho contado é o desse JSON.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 ** 2, cache=None):
+        self.max_bytes = max_bytes
+        self._cache = cache if cache is not None else cache_datasets
+        self._figuras = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def figura(self, grafico, datasets, construir, parametros=None):
+        """Figura do gráfico em cache, ou construir() (agregação + figura) se ainda não existe
+
+        As marcas vêm das versões já entregues a esta thread (marcas_lidas()), e
+        não da versão atual do cache, que o agendador pode trocar depois da carga.
+        """
+        marcas = self._cache.marcas_lidas(datasets)
+        chave = (grafico, marcas, normalizar_parametros(parametros or {}))
+        with self._lock:
+            if chave in self._figuras:
+                self._figuras.move_to_end(chave)
+                self.acertos += 1
+                return self._figuras[chave][0]
+            self.falhas += 1
+
+        with trecho('figura', grafico):
+            fig = FiguraSerializada(pio.to_json(construir(), validate=False))
+        # Dataset não lido, ou lido em outra versão durante construir(): não há versão que valide a figura
+        if None in marcas or self._cache.marcas_lidas(datasets) != marcas:
+            return fig
+        tamanho = len(fig._texto)
+        with self._lock:
+            if chave not in self._figuras and tamanho <= self.max_bytes:
+                self._figuras[chave] = (fig, tamanho)
+                self._bytes += tamanho
+                while self._bytes > self.max_bytes:
+                    _, (_, removido) = self._figuras.popitem(last=False)
+                    self._bytes -= removido
+                    self.remocoes += 1
+        return fig
+
+    def estatisticas(self):
+        """Acertos, falhas, taxa de acerto, remoções e ocupação do cache"""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+                'remocoes': self.remocoes,
+                'figuras': len(self._figuras),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def limpar(self):
+        """Descarta as figuras e zera os contadores"""
+        with self._lock:
+            self._figuras.clear()
+            self._bytes = 0
+            self.acertos = self.falhas = self.remocoes = 0
+
+
+# Instância única por processo, como o cache de datasets
+cache_figuras = CacheFiguras()
+
+
+def mostrar_grafico(grafico, datasets, construir, **parametros):
+    """st.plotly_chart da figura em cache; `parametros` são os filtros de que ela depende"""
+    fig = cache_figuras.figura(grafico, datasets, construir, parametros)
+    with trecho('render', grafico):
+        st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,861 @@
+"""Camada de dados com cache compartilhado entre as sessões do Streamlit"""
+import datetime
+import io
+import operator
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from utils.colunas_derivadas import adicionar_colunas_derivadas, colunas_origem
+from utils.esquema import aplicar_esquema, colunas_data, concatenar, concatenar_blocos, tipos_leitura_csv
+from utils.ingestao import fim_linhas_completas, ler_cauda, posicao_apos_carga
+from utils.instrumentacao import trecho
+from utils.memoria_compartilhada import compartilhamento_ativo, obter_compartilhado
+from utils.snapshot import (
+    PARQUET_DISPONIVEL, assinatura_csv, colunas_snapshot, ler_snapshot, salvar_snapshot, snapshot_atualizado
+)
+
+# Diretório dos arquivos de dados (pode ser trocado por variável de ambiente)
+DIRETORIO_DADOS = os.environ.get('AIRCATERING_DADOS', 'data')
+# Threads da carga: datasets lidos ao mesmo tempo e trechos de um CSV grande em parse simultâneo
+THREADS_CARGA = int(os.environ.get('AIRCATERING_THREADS_CARGA', min(8, os.cpu_count() or 1)))
+# CSVs a partir deste tamanho são divididos em trechos de bytes com parse em paralelo
+TAMANHO_MINIMO_DIVISAO = int(os.environ.get('AIRCATERING_DIVISAO_MB', 64)) * 1024 ** 2
+
+# Arquivo de origem de cada dataset (os tipos das colunas estão em utils/esquema.py).
+# Opcionais: 'ordenar_por' mantém o dataset ordenado em memória, 'incremental'
+# indica arquivos que só recebem linhas novas no final e podem ser lidos pela cauda
+# e 'chave' é a coluna que identifica as linhas: numa recarga, os derivados com
+# função de mesclagem recebem só as linhas novas ou alteradas.
+DATASETS = {
+    'vendas': {'arquivo': 'vendas.csv', 'ordenar_por': 'data_venda', 'incremental': True},
+    'financeiro': {'arquivo': 'financeiro.csv', 'incremental': True},
+    'estoque': {'arquivo': 'estoque.csv', 'chave': 'id'},
+    'rh': {'arquivo': 'rh.csv'},
+    'producao': {'arquivo': 'producao.csv'},
+    'empresas_grupo': {'arquivo': 'empresas_grupo.csv'},
+}
+
+
+def caminho_dataset(nome):
+    """Retorna o caminho do arquivo de origem de um dataset"""
+    return os.path.join(DIRETORIO_DADOS, DATASETS[nome]['arquivo'])
+
+
+def assinatura_arquivo(caminho):
+    """Retorna (caminho, mtime, tamanho) do arquivo ou None se ele não existir"""
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (os.path.abspath(caminho), info.st_mtime_ns, info.st_size)
+
+
+def colunas_csv(caminho):
+    """Nomes das colunas no cabeçalho de um CSV"""
+    return list(pd.read_csv(caminho, nrows=0).columns)
+
+
+class _ArquivoAte(io.RawIOBase):
+    """Arquivo binário que termina no byte `fim` (o que vem depois não é lido)"""
+
+    def __init__(self, caminho, fim):
+        self._arquivo = open(caminho, 'rb')
+        self._restante = fim
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        lidos = self._arquivo.readinto(memoryview(destino)[:self._restante]) if self._restante else 0
+        self._restante -= lidos
+        return lidos
+
+    def close(self):
+        self._arquivo.close()
+        super().close()
+
+
+def _abrir_ate(caminho, fim):
+    """CSV aberto até o byte `fim` e já depois do cabeçalho: lê-se com colunas=colunas_csv(caminho)"""
+    arquivo = io.BufferedReader(_ArquivoAte(caminho, fim))
+    arquivo.readline()
+    return arquivo
+
+
+def ler_csv(nome, origem, colunas=None, usar_colunas=None, fim=None):
+    """Faz o parse de um CSV do dataset já nos tipos compactos do esquema
+
+    Com `colunas`, a origem é um trecho sem cabeçalho (por exemplo a cauda do arquivo).
+    Com `usar_colunas`, o parser descarta as demais colunas sem convertê-las.
+    Com `fim`, só os bytes antes dele são lidos (ex.: até a última linha completa).
+    Arquivos a partir de TAMANHO_MINIMO_DIVISAO são lidos em trechos paralelos.
+    """
+    if colunas is None and isinstance(origem, str):
+        if THREADS_CARGA > 1 and (os.path.getsize(origem) if fim is None else fim) >= TAMANHO_MINIMO_DIVISAO:
+            return ler_csv_em_trechos(nome, origem, THREADS_CARGA, usar_colunas, fim)
+        if fim is not None:
+            with _abrir_ate(origem, fim) as arquivo:
+                return ler_csv(nome, arquivo, colunas_csv(origem), usar_colunas)
+    df = pd.read_csv(origem, **_opcoes_csv(nome, origem, colunas, usar_colunas))
+    return aplicar_esquema(nome, df)
+
+
+def ler_csv_em_blocos(nome, origem, tamanho_bloco, colunas=None, usar_colunas=None, fim=None):
+    """Como ler_csv(), mas devolve o CSV em blocos de até `tamanho_bloco` linhas, um de cada vez"""
+    if fim is not None:
+        with _abrir_ate(origem, fim) as arquivo:
+            yield from ler_csv_em_blocos(nome, arquivo, tamanho_bloco, colunas_csv(origem), usar_colunas)
+        return
+    with pd.read_csv(origem, chunksize=tamanho_bloco, **_opcoes_csv(nome, origem, colunas, usar_colunas)) as leitor:
+        for bloco in leitor:
+            yield aplicar_esquema(nome, bloco)
+
+
+def intervalos_csv(caminho, partes, tamanho=None):
+    """Intervalos de bytes [início, fim) que dividem as linhas do CSV (sem o cabeçalho) em até `partes`
+
+    Cada corte avança até o fim da linha em que caiu, então todo intervalo
+    contém só linhas completas. Com `tamanho`, só os bytes antes dele são divididos.
+    """
+    tamanho = os.path.getsize(caminho) if tamanho is None else tamanho
+    with open(caminho, 'rb') as arquivo:
+        arquivo.readline()
+        cortes = [arquivo.tell()]
+        passo = max((tamanho - cortes[0]) // partes, 1)
+        for i in range(1, partes):
+            arquivo.seek(max(cortes[0] + i * passo, cortes[-1]))
+            arquivo.readline()
+            cortes.append(min(arquivo.tell(), tamanho))
+    cortes.append(tamanho)
+    return [(inicio, fim) for inicio, fim in zip(cortes, cortes[1:]) if fim > inicio]
+
+
+_executor_trechos = None
+_lock_executor = threading.Lock()
+
+
+def _executor():
+    """Pool único (limitado a THREADS_CARGA) para o parse dos trechos de todos os CSVs"""
+    global _executor_trechos
+    with _lock_executor:
+        if _executor_trechos is None:
+            _executor_trechos = ThreadPoolExecutor(max_workers=THREADS_CARGA, thread_name_prefix='csv')
+        return _executor_trechos
+
+
+def _ler_trecho(nome, caminho, inicio, fim, colunas, usar_colunas):
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        bloco = arquivo.read(fim - inicio)
+    return ler_csv(nome, io.BytesIO(bloco), colunas, usar_colunas)
+
+
+def ler_csv_em_trechos(nome, caminho, partes, usar_colunas=None, fim=None):
+    """ler_csv() de um arquivo grande dividido em trechos de bytes, com o parse em paralelo
+
+    O parser do pandas libera o GIL durante a tokenização, então as threads
+    usam núcleos diferentes. Os trechos são cortados em quebras de linha: um
+    campo entre aspas com quebra de linha faz algum trecho falhar no parse, e
+    aí o arquivo é lido inteiro, sem divisão.
+    """
+    colunas = colunas_csv(caminho)
+    tarefas = [
+        _executor().submit(_ler_trecho, nome, caminho, inicio, fim_trecho, colunas, usar_colunas)
+        for inicio, fim_trecho in intervalos_csv(caminho, partes, fim)
+    ]
+    try:
+        blocos = [tarefa.result() for tarefa in tarefas]
+    except (pd.errors.ParserError, ValueError):
+        blocos = None
+    if not blocos:
+        # Arquivo sem linhas, ou um corte caiu dentro de um campo entre aspas: leitura única
+        if fim is not None:
+            with _abrir_ate(caminho, fim) as arquivo:
+                return ler_csv(nome, arquivo, colunas, usar_colunas)
+        df = pd.read_csv(caminho, **_opcoes_csv(nome, caminho, None, usar_colunas))
+        return aplicar_esquema(nome, df)
+    return concatenar_blocos(blocos)
+
+
+def _opcoes_csv(nome, origem, colunas, usar_colunas):
+    """Argumentos do read_csv com os tipos do esquema e as datas do dataset"""
+    if colunas is None:
+        colunas = colunas_csv(origem)
+        opcoes = {}
+    else:
+        opcoes = {'header': None, 'names': colunas}
+    if usar_colunas is not None:
+        colunas = [coluna for coluna in colunas if coluna in usar_colunas]
+        opcoes['usecols'] = colunas
+    opcoes['parse_dates'] = [coluna for coluna in colunas_data(nome) if coluna in colunas]
+    opcoes['dtype'] = {coluna: tipo for coluna, tipo in tipos_leitura_csv(nome).items() if coluna in colunas}
+    return opcoes
+
+
+def fim_carga(nome, caminho, tamanho=None):
+    """Até onde a carga completa lê o CSV: nos datasets incrementais, só as linhas completas
+
+    Uma última linha ainda sendo escrita é lida depois pela cauda, a partir da
+    mesma posição (posicao_apos_carga); None nos demais datasets (arquivo inteiro).
+    """
+    if not DATASETS[nome].get('incremental'):
+        return None
+    return fim_linhas_completas(caminho, os.path.getsize(caminho) if tamanho is None else tamanho)
+
+
+def ordenar_dataset(nome, df):
+    """Ordena o dataset pela coluna declarada em DATASETS (sem custo se já estiver ordenado)"""
+    coluna = DATASETS[nome].get('ordenar_por')
+    if coluna is None or coluna not in df.columns or df[coluna].is_monotonic_increasing:
+        return df
+    return df.sort_values(coluna, kind='stable', ignore_index=True)
+
+
+def _iguais(anterior, atual):
+    """Máscara das posições com o mesmo valor nas duas séries (dois nulos contam como iguais)"""
+    anterior, atual = anterior.array, atual.array
+    if isinstance(anterior.dtype, pd.CategoricalDtype) and isinstance(atual.dtype, pd.CategoricalDtype):
+        # Dicionários diferentes não se comparam: os códigos são trazidos para a união deles
+        categorias = anterior.categories.union(atual.categories)
+        return (anterior.set_categories(categorias).codes == atual.set_categories(categorias).codes)
+    iguais = np.asarray(pd.array(anterior == atual).fillna(False), dtype=bool)
+    return iguais | (pd.isna(anterior) & pd.isna(atual))
+
+
+def linhas_alteradas(nome, anterior, atual, colunas):
+    """Linhas de `atual` novas ou com algum valor de `colunas` diferente em `anterior`
+
+    As linhas são identificadas pela 'chave' do dataset. Só compara quando as
+    chaves de `anterior` continuam no começo de `atual` e na mesma ordem (linhas
+    alteradas no lugar ou acrescentadas no final), o que dispensa alinhar as
+    versões por uma tabela hash; senão, e se faltar alguma coluna, retorna None.
+    """
+    chave = DATASETS[nome]['chave']
+    colunas = [chave] + [coluna for coluna in colunas if coluna != chave]
+    if any(coluna not in anterior.columns or coluna not in atual.columns for coluna in colunas):
+        return None
+    comum = len(anterior)
+    if len(atual) < comum or not _iguais(anterior[chave], atual[chave].iloc[:comum]).all():
+        return None
+    alterada = np.ones(len(atual), dtype=bool)
+    alterada[:comum] = False
+    for coluna in colunas[1:]:
+        alterada[:comum] |= ~_iguais(anterior[coluna], atual[coluna].iloc[:comum])
+    return atual[alterada]
+
+
+def colunas_leitura(nome, colunas):
+    """Colunas a ler para uma projeção (None = todas), com a coluna de ordenação e as de origem das derivadas"""
+    if colunas is None:
+        return None
+    colunas = colunas_origem(nome, colunas)
+    ordenar_por = DATASETS[nome].get('ordenar_por')
+    extras = [ordenar_por] if ordenar_por and ordenar_por not in colunas else []
+    return extras + colunas
+
+
+def ler_dataset(nome, caminho, colunas=None):
+    """Lê um dataset do snapshot Parquet ou, se ele estiver desatualizado, do CSV
+
+    Na leitura pelo CSV o snapshot é regravado, então só a primeira carga após
+    uma mudança no arquivo paga o custo do parse de texto. Com `colunas`, só
+    essas colunas são lidas do snapshot (ou do CSV, quando não há pyarrow).
+    No modo de memória compartilhada (AIRCATERING_COMPARTILHADO) o dataset é
+    publicado uma vez e todos os processos mapeiam os mesmos buffers.
+    As colunas derivadas (utils/colunas_derivadas.py) são calculadas aqui, uma
+    vez por versão; no modo compartilhado elas vão junto no arquivo publicado.
+    """
+    if compartilhamento_ativo():
+        assinatura = assinatura_arquivo(caminho)
+        df = obter_compartilhado(
+            assinatura, lambda: ler_dataset_local(nome, caminho), colunas_leitura(nome, colunas)
+        )
+        # Projeções mapeiam só as colunas de origem: as derivadas são recalculadas no processo
+        return adicionar_colunas_derivadas(nome, df)
+    return ler_dataset_local(nome, caminho, colunas)
+
+
+def ler_dataset_local(nome, caminho, colunas=None):
+    """Leitura de ler_dataset() para a memória do próprio processo"""
+    return adicionar_colunas_derivadas(nome, _ler_colunas_origem(nome, caminho, colunas))
+
+
+def _ler_colunas_origem(nome, caminho, colunas=None):
+    colunas = colunas_leitura(nome, colunas)
+    # Tomada antes da leitura: o snapshot regravado fica vinculado à versão que foi lida
+    assinatura = assinatura_csv(caminho) if PARQUET_DISPONIVEL else None
+    if snapshot_atualizado(caminho):
+        if colunas is not None:
+            existentes = set(colunas_snapshot(caminho))
+            colunas = [coluna for coluna in colunas if coluna in existentes]
+        df = aplicar_esquema(nome, ler_snapshot(caminho, colunas))
+        ordenado = ordenar_dataset(nome, df)
+        if ordenado is not df and colunas is None:
+            # Snapshot gravado fora de ordem (ex.: pelo gerador): regrava já ordenado
+            salvar_snapshot(ordenado, caminho, assinatura)
+        return ordenado
+    if not PARQUET_DISPONIVEL:
+        return ordenar_dataset(nome, ler_csv(nome, caminho, usar_colunas=colunas, fim=fim_carga(nome, caminho)))
+    # O snapshot guarda sempre o dataset completo; a projeção é aplicada depois
+    df = ordenar_dataset(nome, ler_csv(nome, caminho, fim=fim_carga(nome, caminho, assinatura['tamanho'])))
+    salvar_snapshot(df, caminho, assinatura)
+    if colunas is not None:
+        df = df[[coluna for coluna in colunas if coluna in df.columns]]
+    return df
+
+
+# Operadores aceitos nos filtros de consulta (mesma notação dos filtros do pyarrow)
+OPERADORES = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda serie, valores: serie.isin(valores),
+    'not in': lambda serie, valores: ~serie.isin(valores),
+}
+
+
+def _valor_filtro(valor):
+    """Datas (ex.: de st.date_input) viram Timestamp, comparável às colunas datetime64"""
+    if isinstance(valor, datetime.date):
+        return pd.Timestamp(valor)
+    if isinstance(valor, (list, set, frozenset, tuple)):
+        return [_valor_filtro(item) for item in valor]
+    return valor
+
+
+def aplicar_filtros(df, filtros):
+    """Linhas de df que satisfazem todos os filtros (coluna, operador, valor)"""
+    if not filtros:
+        return df
+    mascara = None
+    for coluna, operador, valor in filtros:
+        parcial = OPERADORES[operador](df[coluna], _valor_filtro(valor))
+        mascara = parcial if mascara is None else mascara & parcial
+    return df[mascara.to_numpy(dtype=bool, na_value=False)]
+
+
+def _chave_filtros(filtros):
+    return tuple(
+        (coluna, operador, tuple(valor) if isinstance(valor, (list, set, frozenset, tuple)) else valor)
+        for coluna, operador, valor in filtros or ()
+    )
+
+
+class EntradaCache:
+    """Dataset carregado junto com a assinatura do arquivo que o originou"""
+
+    def __init__(self, assinatura, df, versao, posicao=None, colunas=None):
+        self.assinatura = assinatura
+        self.df = df
+        self.versao = versao
+        # Colunas pedidas quando o dataset foi carregado com projeção (None = todas)
+        self.colunas = colunas
+        # Até onde o CSV foi lido, para datasets com ingestão incremental
+        self.posicao = posicao
+        # Resultados calculados a partir deste df (rollups, índices...), válidos só nesta versão
+        self.derivados = {}
+        # chave do derivado -> (construtor, mesclar, colunas): como recalculá-lo numa nova versão
+        # (mesclar, quando existe, atualiza o derivado só com as linhas acrescentadas)
+        self.construtores = {}
+
+    @property
+    def marca(self):
+        """(assinatura do arquivo, versão): identifica os dados desta entrada"""
+        return (self.assinatura, self.versao)
+
+    def cobre(self, colunas):
+        """True se a entrada tem as colunas pedidas (None = o dataset completo)"""
+        if self.colunas is None:
+            return True
+        return colunas is not None and set(colunas) <= self.colunas
+
+
+class CacheDatasets:
+    """Cache de datasets do processo, invalidado por caminho, mtime e tamanho do arquivo"""
+
+    def __init__(self, max_consultas=32):
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self._locks_dataset = {}
+        # Datasets cuja nova versão está sendo preparada por atualizar()
+        self._em_atualizacao = set()
+        # Resultados recentes de consultar() lidos direto do snapshot
+        self._consultas = OrderedDict()
+        self.max_consultas = max_consultas
+        self.acertos = 0
+        self.falhas = 0
+        self.recargas = 0
+        self.incrementos = 0
+        self.ampliacoes = 0
+        # Marcas das versões entregues à thread desde iniciar_leituras() (ver marcas_lidas())
+        self._leituras = threading.local()
+
+    def _lock_dataset(self, nome):
+        with self._lock:
+            return self._locks_dataset.setdefault(nome, threading.Lock())
+
+    def obter(self, nome, colunas=None):
+        """Retorna o dataset, relendo o arquivo apenas se ele mudou desde a última leitura
+
+        Com `colunas`, basta que o dataset em cache tenha essas colunas (pode ter
+        outras); se ainda não foi carregado, só elas são lidas. Pedir depois
+        colunas que faltam relê a união das projeções, mantendo versão e derivados.
+        """
+        return self.obter_com_marca(nome, colunas)[0]
+
+    def obter_com_marca(self, nome, colunas=None):
+        """obter() e a marca da versão entregue, tiradas da mesma entrada ((None, None) sem arquivo)"""
+        entrada = self._obter_entrada(nome, colunas)
+        if entrada is None:
+            return None, None
+        self.registrar_leitura(nome, entrada.marca)
+        return entrada.df, entrada.marca
+
+    def _obter_entrada(self, nome, colunas):
+        caminho = caminho_dataset(nome)
+        assinatura = assinatura_arquivo(caminho)
+        if assinatura is None:
+            with self._lock:
+                self._entradas.pop(nome, None)
+            return None
+
+        entrada = self._entradas.get(nome)
+        if entrada is not None and entrada.cobre(colunas) and (
+                entrada.assinatura == assinatura or nome in self._em_atualizacao):
+            # Durante atualizar() as sessões continuam com a versão anterior, já aquecida
+            with self._lock:
+                self.acertos += 1
+            return entrada
+
+        # Um lock por dataset evita que várias sessões leiam o mesmo arquivo ao mesmo tempo
+        with self._lock_dataset(nome):
+            entrada = self._entradas.get(nome)
+            if entrada is not None and entrada.assinatura == assinatura:
+                if entrada.cobre(colunas):
+                    with self._lock:
+                        self.acertos += 1
+                    return entrada
+                return self._ampliar(nome, caminho, entrada, colunas)
+
+            nova, tipo = self._nova_versao(nome, caminho, assinatura, entrada, colunas)
+            self._publicar(nome, nova, tipo)
+            if not nova.cobre(colunas):
+                return self._ampliar(nome, caminho, nova, colunas)
+            return nova
+
+    def _nova_versao(self, nome, caminho, assinatura, entrada, colunas=None):
+        """Entrada com o conteúdo atual do arquivo, ainda não publicada, e o tipo da carga
+
+        O tipo é 'falha' (primeira carga), 'incremento' (só a cauda lida),
+        'recarga' (arquivo relido por inteiro) ou None (nada mudou nos dados).
+        """
+        if entrada is not None and entrada.posicao is not None:
+            nova = self._acrescentar(nome, caminho, entrada, assinatura)
+            if nova is not None:
+                return nova, ('incremento' if nova.versao != entrada.versao else None)
+
+        # Arquivo alterado: relê ao menos as colunas que a entrada anterior tinha
+        if entrada is not None:
+            colunas = self._uniao(entrada, colunas)
+        df = ler_dataset(nome, caminho, colunas)
+        posicao = None
+        # Só com o arquivo igual ao de antes da leitura o df termina em assinatura[2]: linhas
+        # acrescentadas durante o parse já estão no df e seriam lidas de novo pela cauda.
+        # Se mudou, a entrada fica sem posição e a próxima obter() relê o arquivo inteiro.
+        # No modo compartilhado também não há cauda: cada versão precisa ser publicada
+        # no diretório comum (por ler_dataset) em vez de virar uma cópia privada do processo.
+        if (DATASETS[nome].get('incremental') and not compartilhamento_ativo()
+                and assinatura_arquivo(caminho) == assinatura):
+            posicao = posicao_apos_carga(caminho, assinatura[2])
+        versao = 1 if entrada is None else entrada.versao + 1
+        nova = EntradaCache(assinatura, df, versao, posicao, None if colunas is None else set(colunas))
+        if entrada is None:
+            return nova, 'falha'
+        # Os derivados são descartados, mas continua-se sabendo como recalculá-los
+        nova.construtores = dict(entrada.construtores)
+        if DATASETS[nome].get('chave'):
+            nova.derivados = self._mesclar_alteradas(nome, entrada, df)
+        return nova, 'recarga'
+
+    @staticmethod
+    def _mesclar_alteradas(nome, entrada, df):
+        """Derivados com função de mesclagem atualizados só com as linhas novas ou alteradas do arquivo
+
+        Os que não podem ser mesclados (linhas removidas ou reordenadas, ou mesclar
+        devolveu None) ficam de fora e são recalculados sob demanda.
+        """
+        mesclaveis = {
+            chave: (mesclar, colunas)
+            for chave, (_, mesclar, colunas) in entrada.construtores.items()
+            if mesclar is not None and chave in entrada.derivados
+        }
+        if not mesclaveis:
+            return {}
+        colunas = set()
+        for _, colunas_derivado in mesclaveis.values():
+            colunas |= set(entrada.df.columns if colunas_derivado is None else colunas_derivado)
+        alteradas = linhas_alteradas(nome, entrada.df, df, sorted(colunas))
+        if alteradas is None:
+            return {}
+        derivados = {}
+        for chave, (mesclar, _) in mesclaveis.items():
+            resultado = mesclar(entrada.derivados[chave], alteradas)
+            if resultado is not None:
+                derivados[chave] = resultado
+        return derivados
+
+    def _publicar(self, nome, nova, tipo):
+        """Troca a entrada do dataset de uma só vez e conta o tipo da carga"""
+        with self._lock:
+            if tipo == 'falha':
+                self.falhas += 1
+            elif tipo == 'recarga':
+                self.recargas += 1
+            elif tipo == 'incremento':
+                self.incrementos += 1
+            self._entradas[nome] = nova
+
+    def atualizar(self, nome):
+        """Prepara a nova versão de um dataset alterado, com os derivados recalculados, e a publica
+
+        Feito para o agendador em segundo plano: enquanto a versão nova é lida e
+        os derivados registrados nela são recalculados, obter() e derivado()
+        seguem respondendo com a versão anterior; a troca é atômica. Retorna True
+        se uma nova versão foi publicada.
+        """
+        entrada = self._entradas.get(nome)
+        caminho = caminho_dataset(nome)
+        assinatura = assinatura_arquivo(caminho)
+        if entrada is None or assinatura is None or assinatura == entrada.assinatura:
+            return False
+        with self._lock:
+            self._em_atualizacao.add(nome)
+        try:
+            with self._lock_dataset(nome):
+                entrada = self._entradas.get(nome)
+                if entrada is None or entrada.assinatura == assinatura:
+                    return False
+                # Mesma projeção da entrada: a versão nova não lê colunas que ninguém pediu
+                nova, tipo = self._nova_versao(nome, caminho, assinatura, entrada, entrada.colunas)
+                for chave, (construtor, _, _) in nova.construtores.items():
+                    if chave not in nova.derivados:
+                        nova.derivados[chave] = construtor(nova.df)
+                self._publicar(nome, nova, tipo)
+                # tipo None: só uma linha incompleta foi escrita, a versão não mudou
+                return tipo is not None
+        finally:
+            with self._lock:
+                self._em_atualizacao.discard(nome)
+
+    def carregados(self):
+        """Nomes dos datasets em cache"""
+        with self._lock:
+            return list(self._entradas)
+
+    @staticmethod
+    def _uniao(entrada, colunas):
+        """Colunas da entrada mais as pedidas (None = todas); com colunas=entrada.colunas, a mesma projeção"""
+        if entrada.colunas is None or colunas is None:
+            return None
+        return list(entrada.colunas | set(colunas))
+
+    def _ampliar(self, nome, caminho, entrada, colunas):
+        """Relê o mesmo arquivo com mais colunas; os dados não mudam, então versão e derivados ficam"""
+        colunas = self._uniao(entrada, colunas)
+        df = ler_dataset(nome, caminho, colunas)
+        nova = EntradaCache(entrada.assinatura, df, entrada.versao, entrada.posicao,
+                            None if colunas is None else set(colunas))
+        nova.derivados, nova.construtores = entrada.derivados, entrada.construtores
+        with self._lock:
+            self.ampliacoes += 1
+            self._entradas[nome] = nova
+        return nova
+
+    def _acrescentar(self, nome, caminho, entrada, assinatura):
+        """Nova entrada com as linhas acrescentadas ao CSV, ou None se for preciso reler tudo
+
+        Só a cauda do arquivo é lida; derivados registrados com função de mesclagem
+        são atualizados a partir das linhas novas e os demais são recalculados sob demanda.
+        Não é usada no modo compartilhado, em que as entradas não guardam posição.
+        """
+        if assinatura[0] != entrada.assinatura[0]:
+            return None
+        cauda = ler_cauda(caminho, entrada.posicao, assinatura[2])
+        if cauda is None:
+            return None
+        bloco, posicao = cauda
+        if not bloco:
+            # Só uma linha ainda incompleta foi escrita: os dados não mudaram
+            nova = EntradaCache(assinatura, entrada.df, entrada.versao, posicao, entrada.colunas)
+            nova.derivados, nova.construtores = entrada.derivados, entrada.construtores
+            return nova
+
+        # As linhas novas são projetadas nas colunas da entrada por concatenar()
+        novas = adicionar_colunas_derivadas(nome, ler_csv(nome, io.BytesIO(bloco), colunas_csv(caminho)))
+        df = ordenar_dataset(nome, concatenar(entrada.df, novas))
+        nova = EntradaCache(assinatura, df, entrada.versao + 1, posicao, entrada.colunas)
+        nova.construtores = dict(entrada.construtores)
+        nova.derivados = {
+            chave: mesclar(entrada.derivados[chave], construtor(novas))
+            for chave, (construtor, mesclar, _) in entrada.construtores.items()
+            if mesclar is not None and chave in entrada.derivados
+        }
+        return nova
+
+    def derivado(self, nome, chave, construtor, mesclar=None, colunas=None):
+        """Resultado de construtor(df) calculado uma única vez por versão do dataset
+
+        Quando o arquivo muda, a entrada é trocada e os derivados antigos são
+        descartados junto com ela. Se `mesclar` for informado, numa ingestão
+        incremental o derivado é atualizado com mesclar(atual, construtor(linhas_novas))
+        em vez de recalculado; em datasets com 'chave', numa recarga ele recebe
+        mesclar(atual, linhas_alteradas), que pode devolver None para pedir o
+        recálculo. `colunas` são as colunas que o construtor usa: se o
+        dataset ainda não foi carregado, só elas são lidas. Retorna None se o
+        dataset não existir.
+        """
+        entrada = self._entradas.get(nome)
+        if entrada is None or not entrada.cobre(colunas):
+            entrada = self._obter_entrada(nome, colunas)
+            if entrada is None:
+                return None
+        if chave not in entrada.derivados:
+            with self._lock_dataset(nome):
+                if chave not in entrada.derivados:
+                    entrada.construtores[chave] = (construtor, mesclar, colunas)
+                    with trecho('agregacao', f"{nome}.{chave}"):
+                        entrada.derivados[chave] = construtor(entrada.df)
+        self.registrar_leitura(nome, entrada.marca)
+        return entrada.derivados[chave]
+
+    def consultar(self, nome, colunas=None, filtros=None):
+        """Linhas do dataset que satisfazem `filtros`, só com as `colunas` pedidas
+
+        `filtros` é uma lista de (coluna, operador, valor) combinados com E, com os
+        operadores de OPERADORES, por exemplo [('tipo', '==', 'Receita')] ou
+        [('data_venda', '>=', inicio), ('data_venda', '<=', fim)]. Se o dataset já
+        está em memória com as colunas necessárias, a consulta é feita nele; senão
+        colunas e filtros são repassados à leitura do snapshot, que não lê as
+        outras colunas nem os grupos de linhas descartados pelas estatísticas.
+        Retorna None se o dataset não existir.
+        """
+        with trecho('filtro', nome):
+            return self._consultar(nome, colunas, filtros)
+
+    def _consultar(self, nome, colunas, filtros):
+        caminho = caminho_dataset(nome)
+        assinatura = assinatura_arquivo(caminho)
+        if assinatura is None:
+            return None
+        necessarias = None if colunas is None else list(colunas) + [coluna for coluna, _, _ in filtros or ()]
+
+        entrada = self._entradas.get(nome)
+        if entrada is not None and entrada.assinatura == assinatura and entrada.cobre(necessarias):
+            with self._lock:
+                self.acertos += 1
+            self.registrar_leitura(nome, entrada.marca)
+            resultado = aplicar_filtros(entrada.df, filtros)
+            return resultado if colunas is None else resultado[list(colunas)]
+
+        if compartilhamento_ativo() or not snapshot_atualizado(caminho):
+            # Sem snapshot válido a leitura passa pelo cache (que também regrava o snapshot);
+            # com memória compartilhada o filtro é feito sobre os buffers já mapeados
+            df = self.obter(nome, necessarias)
+            resultado = aplicar_filtros(df, filtros)
+            return resultado if colunas is None else resultado[list(colunas)]
+
+        # O snapshot é do arquivo atual: a versão só é conhecida se a entrada em cache é do mesmo arquivo
+        self.registrar_leitura(nome, entrada.marca if entrada is not None and entrada.assinatura == assinatura
+                               else (assinatura, None))
+        chave = (nome, assinatura, None if colunas is None else tuple(colunas), _chave_filtros(filtros))
+        with self._lock:
+            if chave in self._consultas:
+                self._consultas.move_to_end(chave)
+                self.acertos += 1
+                return self._consultas[chave]
+        resultado = aplicar_esquema(nome, ler_snapshot(caminho, colunas, filtros))
+        with self._lock:
+            self._consultas[chave] = resultado
+            while len(self._consultas) > self.max_consultas:
+                self._consultas.popitem(last=False)
+        return resultado
+
+    def versao(self, nome):
+        """Versão atual do dataset em cache (0 se ainda não foi carregado)"""
+        entrada = self._entradas.get(nome)
+        return entrada.versao if entrada is not None else 0
+
+    def marca(self, nome):
+        """Identifica os dados em cache do dataset: (assinatura do arquivo, versão), ou None
+
+        Diferente da versão sozinha, não se repete depois de limpar() o cache.
+        É a versão atual: para chavear resultados calculados com dados já
+        entregues (ex.: figuras), use marcas_lidas().
+        """
+        entrada = self._entradas.get(nome)
+        return entrada.marca if entrada is not None else None
+
+    def iniciar_leituras(self):
+        """Começa a registrar, nesta thread, as versões entregues por obter(), derivado() e consultar()
+
+        Chamado a cada rerun (por DadosSobDemanda): o agendador pode publicar uma
+        versão nova entre a carga dos dados e o uso deles na página, então a chave
+        de um resultado deve vir da versão que foi de fato entregue.
+        """
+        self._leituras.marcas = {}
+
+    def registrar_leitura(self, nome, marca):
+        """Anota a versão entregue nesta thread; duas versões diferentes do mesmo dataset anulam a marca"""
+        marcas = getattr(self._leituras, 'marcas', None)
+        if marcas is not None:
+            marcas[nome] = marca if marcas.get(nome, marca) == marca else None
+
+    def marcas_lidas(self, nomes):
+        """Marcas das versões dos datasets entregues a esta thread desde iniciar_leituras()
+
+        None no lugar de um dataset não lido, ou lido em mais de uma versão: o
+        resultado calculado com ele não tem uma versão que o identifique.
+        """
+        marcas = getattr(self._leituras, 'marcas', None) or {}
+        return tuple(marcas.get(nome) for nome in nomes)
+
+    def estatisticas(self):
+        """Contadores de acertos, falhas, recargas e incrementos, mais o estado de cada dataset"""
+        with self._lock:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'recargas': self.recargas,
+                'incrementos': self.incrementos,
+                'ampliacoes': self.ampliacoes,
+                'consultas': len(self._consultas),
+                'datasets': {
+                    nome: {'versao': entrada.versao, 'linhas': len(entrada.df),
+                           'colunas': len(entrada.df.columns)}
+                    for nome, entrada in self._entradas.items()
+                },
+            }
+
+    def limpar(self):
+        """Descarta todos os datasets e zera os contadores"""
+        with self._lock:
+            self._entradas.clear()
+            self._consultas.clear()
+            self.acertos = self.falhas = self.recargas = self.incrementos = self.ampliacoes = 0
+
+
+# Instância única por processo: o Streamlit reexecuta app.py a cada interação,
+# mas os módulos importados permanecem carregados e são compartilhados pelas sessões
+cache_datasets = CacheDatasets()
+
+
+def usa_datasets(*nomes, **projecoes):
+    """Decorador com que cada página declara os datasets que exibe
+
+    Datasets passados por nome são carregados completos; os passados como
+    argumento nomeado (vendas=['data_venda', 'valor_total']) só com essas colunas.
+    """
+    def declarar(funcao):
+        funcao.datasets = {**{nome: None for nome in nomes}, **projecoes}
+        return funcao
+    return declarar
+
+
+class DadosSobDemanda(Mapping):
+    """Dicionário de datasets que lê cada arquivo só no primeiro acesso
+
+    Restrito aos nomes declarados pela página: abrir uma página custa apenas os
+    datasets que ela usa. `'vendas' in dados` também carrega o dataset, então
+    devolve False tanto para arquivo ausente quanto para falha de leitura; as
+    falhas ficam em `erros` e são repassadas uma vez para `ao_falhar(nome, erro)`.
+    """
+
+    def __init__(self, nomes=None, cache=None, ao_falhar=None):
+        # nomes: lista de datasets ou dicionário nome -> colunas (None = todas)
+        self.colunas = dict(nomes) if isinstance(nomes, Mapping) else dict.fromkeys(nomes or DATASETS)
+        self.nomes = list(self.colunas)
+        self._cache = cache if cache is not None else cache_datasets
+        self._ao_falhar = ao_falhar
+        self._carregados = {}
+        self.erros = {}
+        self._cache.iniciar_leituras()
+
+    def _carregar(self, nome):
+        if nome in self._carregados:
+            return self._carregados[nome]
+        if nome not in self.nomes or nome in self.erros:
+            return None
+        try:
+            with trecho('carga', nome):
+                df = self._cache.obter(nome, self.colunas[nome])
+        except Exception as erro:
+            self._falhou(nome, erro)
+            return None
+        if df is not None:
+            self._carregados[nome] = df
+        return df
+
+    def _falhou(self, nome, erro):
+        self.erros[nome] = erro
+        if self._ao_falhar is not None:
+            self._ao_falhar(nome, erro)
+
+    def precarregar(self, nomes=None, max_threads=None):
+        """Lê ao mesmo tempo, num pool de até `max_threads` threads, os datasets ainda não carregados
+
+        `nomes` restringe aos datasets pedidos (entre os declarados). Cada falha
+        fica em `erros` sob o nome do dataset, sem impedir a carga dos demais;
+        ao_falhar() é chamado nesta thread, depois que todas as leituras terminam.
+        """
+        pendentes = [
+            nome for nome in (self.nomes if nomes is None else nomes)
+            if nome in self.colunas and nome not in self._carregados and nome not in self.erros
+            and assinatura_arquivo(caminho_dataset(nome)) is not None
+        ]
+        max_threads = min(max_threads or THREADS_CARGA, len(pendentes))
+        if max_threads <= 1:
+            for nome in pendentes:
+                self._carregar(nome)
+            return
+        with trecho('carga', 'paralela'), ThreadPoolExecutor(max_workers=max_threads,
+                                                             thread_name_prefix='carga') as executor:
+            tarefas = {nome: executor.submit(self._cache.obter_com_marca, nome, self.colunas[nome])
+                       for nome in pendentes}
+        for nome, tarefa in tarefas.items():
+            try:
+                df, marca = tarefa.result()
+            except Exception as erro:
+                self._falhou(nome, erro)
+                continue
+            if df is not None:
+                # Lido em outra thread: a versão entregue é registrada na thread da página
+                self._cache.registrar_leitura(nome, marca)
+                self._carregados[nome] = df
+
+    def __getitem__(self, nome):
+        df = self._carregar(nome)
+        if df is None:
+            raise KeyError(nome)
+        return df
+
+    def __contains__(self, nome):
+        return self._carregar(nome) is not None
+
+    def __iter__(self):
+        return (nome for nome in self.nomes if nome in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def disponiveis(self):
+        """Datasets declarados cujo arquivo existe (sem carregá-los)"""
+        return [nome for nome in self.nomes if assinatura_arquivo(caminho_dataset(nome)) is not None]
@@ -0,0 +1,42 @@
+"""Colunas calculadas a partir das colunas de origem, materializadas uma vez por versão do dataset
+
+A camada de dados acrescenta estas colunas logo após a leitura (e, na ingestão
+incremental, só às linhas novas), então as páginas agregam com reduções nativas
+do pandas (groupby().sum(), .mean()) em vez de funções Python por grupo.
+O snapshot continua guardando só as colunas de origem.
+"""
+
+# dataset -> coluna derivada -> (colunas de origem, função vetorizada sobre o DataFrame)
+COLUNAS_DERIVADAS = {
+    'estoque': {
+        'valor_estoque': (
+            ['quantidade_atual', 'preco_custo'],
+            lambda df: df['quantidade_atual'] * df['preco_custo'],
+        ),
+    },
+    'producao': {
+        'eficiencia': (
+            ['quantidade_produzida', 'quantidade_planejada'],
+            lambda df: df['quantidade_produzida'] / df['quantidade_planejada'] * 100,
+        ),
+    },
+}
+
+
+def colunas_origem(nome, colunas):
+    """Troca as colunas derivadas de uma projeção pelas colunas de origem de que dependem"""
+    derivadas = COLUNAS_DERIVADAS.get(nome, {})
+    resultado = []
+    for coluna in colunas:
+        resultado.extend(derivadas[coluna][0] if coluna in derivadas else [coluna])
+    return list(dict.fromkeys(resultado))
+
+
+def adicionar_colunas_derivadas(nome, df):
+    """DataFrame com as colunas derivadas cujas colunas de origem estão presentes"""
+    novas = {
+        coluna: calcular(df)
+        for coluna, (origem, calcular) in COLUNAS_DERIVADAS.get(nome, {}).items()
+        if coluna not in df.columns and all(item in df.columns for item in origem)
+    }
+    return df.assign(**novas) if novas else df
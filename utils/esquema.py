@@ -0,0 +1,305 @@
+"""Esquema de tipos compactos de cada dataset e relatório de uso de memória"""
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    PYARROW_DISPONIVEL = True
+except ImportError:  # sem pyarrow textos ficam como object e ids como texto
+    PYARROW_DISPONIVEL = False
+
+# Tipos lógicos usados no esquema:
+#   'uuid'      -> 16 bytes binários de tamanho fixo (texto sem pyarrow)
+#   'texto'     -> string armazenada em buffers Arrow, sem um objeto Python por linha
+#   'categoria' -> pandas Categorical (códigos int8/int16 + dicionário)
+#   'data'      -> datetime64 de largura fixa
+#   demais      -> dtype NumPy explícito
+# Valores monetários ficam em float64: somas de milhões de linhas em float32
+# perdem centavos nos totais exibidos nos KPIs.
+ESQUEMAS = {
+    'vendas': {
+        'id': 'uuid',
+        'data_venda': 'data',
+        'cliente': 'texto',
+        'vendedor': 'texto',
+        'produto': 'texto',
+        'categoria': 'categoria',
+        'quantidade': 'int32',
+        'preco_unitario': 'float64',
+        'desconto': 'float32',
+        'regiao': 'categoria',
+        'canal': 'categoria',
+        'valor_total': 'float64',
+    },
+    'financeiro': {
+        'id': 'uuid',
+        'data': 'data',
+        'tipo': 'categoria',
+        'categoria': 'categoria',
+        'descricao': 'texto',
+        'valor': 'float64',
+        'conta': 'categoria',
+        'status': 'categoria',
+    },
+    'estoque': {
+        'id': 'uuid',
+        'nome_produto': 'texto',
+        'categoria': 'categoria',
+        'fornecedor': 'texto',
+        'quantidade_atual': 'int32',
+        'quantidade_minima': 'int32',
+        'preco_custo': 'float64',
+        'preco_venda': 'float64',
+        'data_ultima_entrada': 'data',
+        'localizacao': 'categoria',
+        'validade': 'data',
+    },
+    'rh': {
+        'id': 'uuid',
+        'nome': 'texto',
+        'email': 'texto',
+        'cargo': 'categoria',
+        'departamento': 'categoria',
+        'salario': 'float64',
+        'data_admissao': 'data',
+        'data_desligamento': 'data',
+        'status': 'categoria',
+        'nivel': 'categoria',
+        'avaliacao': 'float32',
+    },
+    'producao': {
+        'id': 'uuid',
+        'data_producao': 'data',
+        'produto': 'texto',
+        'linha_producao': 'categoria',
+        'quantidade_planejada': 'int32',
+        'quantidade_produzida': 'int32',
+        'tempo_producao_horas': 'float32',
+        'custo_producao': 'float64',
+        'qualidade_nota': 'float32',
+        'responsavel': 'texto',
+        'turno': 'categoria',
+        'status': 'categoria',
+    },
+    'empresas_grupo': {
+        'empresa': 'categoria',
+        'ano_mes': 'texto',
+        'data': 'data',
+        'vendas': 'float64',
+        'faturamento': 'float64',
+        'custo': 'float64',
+        'margem_valor': 'float64',
+        'margem_percentual': 'float32',
+        'regiao': 'categoria',
+        'funcionarios': 'int16',
+        'clientes_ativos': 'int16',
+    },
+}
+
+# Posições dos dígitos hexadecimais em um UUID textual (sem os hífens)
+_POSICOES_HEX = np.array([i for i in range(36) if i not in (8, 13, 18, 23)])
+_VALOR_HEX = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate(b'0123456789abcdef'):
+    _VALOR_HEX[_c] = _i
+for _i, _c in enumerate(b'ABCDEF'):
+    _VALOR_HEX[_c] = 10 + _i
+_DIGITOS_HEX = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+
+def colunas_data(nome):
+    """Colunas do dataset declaradas como data"""
+    return [coluna for coluna, tipo in ESQUEMAS[nome].items() if tipo == 'data']
+
+
+def _dtype_texto():
+    return pd.StringDtype('pyarrow') if PYARROW_DISPONIVEL else object
+
+
+def tipos_leitura_csv(nome):
+    """Mapa de dtypes passado ao pd.read_csv, para o parser já gerar colunas compactas"""
+    tipos = {}
+    for coluna, tipo in ESQUEMAS[nome].items():
+        if tipo == 'categoria':
+            tipos[coluna] = 'category'
+        elif tipo in ('texto', 'uuid'):
+            tipos[coluna] = _dtype_texto()
+        elif tipo != 'data':
+            tipos[coluna] = tipo
+    return tipos
+
+
+def uuid_para_bytes(serie):
+    """Converte UUIDs textuais em 16 bytes fixos (vetorizado, sem laço Python)
+
+    Retorna a série como texto quando o pyarrow não está disponível ou quando
+    algum valor não é um UUID válido.
+    """
+    if not PYARROW_DISPONIVEL or serie.isna().any():
+        return serie.astype(_dtype_texto())
+    # O cast para S36 truncaria valores mais longos (e não aceita caracteres fora do ASCII)
+    if not serie.str.len().eq(36).all():
+        return serie.astype(_dtype_texto())
+    try:
+        texto = serie.to_numpy(dtype='S36')
+    except UnicodeEncodeError:
+        return serie.astype(_dtype_texto())
+    matriz = texto.view(np.uint8).reshape(-1, 36)
+    nibbles = _VALOR_HEX[matriz[:, _POSICOES_HEX]]
+    if (nibbles == 255).any() or (matriz[:, [8, 13, 18, 23]] != ord('-')).any():
+        return serie.astype(_dtype_texto())
+    binario = np.ascontiguousarray((nibbles[:, 0::2] << 4) | nibbles[:, 1::2])
+    array = pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(16), len(binario), [None, pa.py_buffer(binario)]
+    )
+    return pd.Series(pd.arrays.ArrowExtensionArray(array), index=serie.index, name=serie.name)
+
+
+def bytes_para_uuid_texto(binario):
+    """Formata uma matriz (n, 16) de bytes como UUIDs textuais (array NumPy de str)"""
+    hexa = np.empty((len(binario), 32), dtype=np.uint8)
+    hexa[:, 0::2] = _DIGITOS_HEX[binario >> 4]
+    hexa[:, 1::2] = _DIGITOS_HEX[binario & 0x0F]
+    matriz = np.full((len(binario), 36), ord('-'), dtype=np.uint8)
+    matriz[:, _POSICOES_HEX] = hexa
+    return matriz.view('S36').ravel().astype(str)
+
+
+def uuid_para_texto(serie):
+    """Converte ids binários de 16 bytes de volta para o formato textual do UUID"""
+    if not isinstance(serie.dtype, pd.ArrowDtype):
+        return serie
+    binario = np.array(serie.to_numpy(), dtype='S16').view(np.uint8).reshape(-1, 16)
+    texto = bytes_para_uuid_texto(binario)
+    return pd.Series(texto, index=serie.index, name=serie.name, dtype=object)
+
+
+def aplicar_esquema(nome, df):
+    """Converte as colunas do DataFrame para os tipos declarados no esquema do dataset
+
+    Colunas que já estão no tipo certo não são copiadas, então aplicar o esquema
+    a um frame lido do snapshot é praticamente gratuito.
+    """
+    convertidas = {}
+    for coluna, tipo in ESQUEMAS[nome].items():
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+        if tipo == 'data':
+            if not pd.api.types.is_datetime64_any_dtype(serie):
+                convertidas[coluna] = pd.to_datetime(serie)
+        elif tipo == 'categoria':
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                convertidas[coluna] = serie.astype('category')
+        elif tipo == 'uuid':
+            if not isinstance(serie.dtype, pd.ArrowDtype):
+                convertidas[coluna] = uuid_para_bytes(serie)
+        elif tipo == 'texto':
+            if serie.dtype != _dtype_texto():
+                convertidas[coluna] = serie.astype(_dtype_texto())
+        elif serie.dtype != tipo:
+            convertidas[coluna] = serie.astype(tipo)
+    if convertidas:
+        df = df.assign(**convertidas)
+    return df
+
+
+def concatenar(anterior, novo):
+    """Concatena dois frames do mesmo esquema preservando as colunas categóricas
+
+    O pandas converte para object categorias com dicionários diferentes; aqui os
+    valores novos são acrescentados ao final do dicionário existente, o que
+    mantém os códigos já gravados no frame anterior.
+    """
+    ajustes_anterior, ajustes_novo = {}, {}
+    for coluna in anterior.columns:
+        tipo_anterior, tipo_novo = anterior[coluna].dtype, novo[coluna].dtype
+        if (isinstance(tipo_anterior, pd.CategoricalDtype)
+                and isinstance(tipo_novo, pd.CategoricalDtype) and tipo_anterior != tipo_novo):
+            categorias = tipo_anterior.categories
+            extras = tipo_novo.categories.difference(categorias)
+            if len(extras):
+                categorias = categorias.append(extras)
+                ajustes_anterior[coluna] = anterior[coluna].cat.add_categories(extras)
+            ajustes_novo[coluna] = novo[coluna].cat.set_categories(categorias)
+    if ajustes_anterior:
+        anterior = anterior.assign(**ajustes_anterior)
+    if ajustes_novo:
+        novo = novo.assign(**ajustes_novo)
+    return pd.concat([anterior, novo[anterior.columns]], ignore_index=True)
+
+
+def concatenar_blocos(blocos):
+    """Concatena vários frames do mesmo esquema (na ordem) numa única cópia
+
+    As colunas categóricas recebem a união ordenada dos dicionários: blocos
+    lidos de trechos de um CSV resultam nas mesmas categorias da leitura do
+    arquivo inteiro.
+    """
+    if len(blocos) == 1:
+        return blocos[0]
+    colunas = blocos[0].columns
+    ajustes = {}
+    for coluna in colunas:
+        tipos = [bloco[coluna].dtype for bloco in blocos]
+        if all(isinstance(tipo, pd.CategoricalDtype) for tipo in tipos) and len(set(tipos)) > 1:
+            categorias = tipos[0].categories
+            for tipo in tipos[1:]:
+                categorias = categorias.union(tipo.categories)
+            ajustes[coluna] = categorias
+    if ajustes:
+        blocos = [
+            bloco.assign(**{coluna: bloco[coluna].cat.set_categories(categorias)
+                            for coluna, categorias in ajustes.items()})
+            for bloco in blocos
+        ]
+    return pd.concat([bloco[colunas] for bloco in blocos], ignore_index=True)
+
+
+def tipos_arrow(tipo):
+    """types_mapper do pyarrow que devolve textos e ids nos mesmos dtypes do esquema"""
+    if pa.types.is_fixed_size_binary(tipo):
+        return pd.ArrowDtype(tipo)
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return pd.StringDtype('pyarrow')
+    return None
+
+
+def relatorio_memoria(dados):
+    """Uso de memória (bytes reais, incluindo textos) de cada dataset carregado"""
+    linhas = []
+    for nome, df in dados.items():
+        memoria = int(df.memory_usage(deep=True, index=True).sum())
+        linhas.append({
+            'dataset': nome,
+            'linhas': len(df),
+            'colunas': len(df.columns),
+            'memoria_mb': round(memoria / 1024 ** 2, 3),
+            'bytes_por_linha': round(memoria / len(df), 1) if len(df) else 0.0,
+        })
+    return pd.DataFrame(linhas, columns=['dataset', 'linhas', 'colunas', 'memoria_mb', 'bytes_por_linha'])
+
+
+if __name__ == "__main__":
+    # Compara a leitura padrão do pandas com a leitura tipada pelo esquema
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.camada_dados import DATASETS, caminho_dataset, colunas_csv
+
+    originais, compactos = {}, {}
+    for nome in DATASETS:
+        caminho = caminho_dataset(nome)
+        if os.path.exists(caminho):
+            # Como em _opcoes_csv: só as datas que o arquivo de fato tem (CSVs antigos podem não ter todas)
+            datas = [coluna for coluna in colunas_data(nome) if coluna in colunas_csv(caminho)]
+            originais[nome] = pd.read_csv(caminho, parse_dates=datas)
+            compactos[nome] = aplicar_esquema(nome, originais[nome])
+    antes = relatorio_memoria(originais).set_index('dataset')
+    depois = relatorio_memoria(compactos).set_index('dataset')
+    comparativo = pd.DataFrame({
+        'linhas': antes['linhas'],
+        'antes_mb': antes['memoria_mb'],
+        'depois_mb': depois['memoria_mb'],
+        'reducao_x': (antes['memoria_mb'] / depois['memoria_mb']).round(1),
+    })
+    print(comparativo.to_string())
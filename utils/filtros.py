@@ -0,0 +1,97 @@
+"""Motor de filtros indexado para o módulo de Vendas"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class IndiceVendas:
+    """Índice das vendas ordenadas por data, com bitmaps por categoria e por região
+
+    O intervalo de datas vira uma busca binária (searchsorted) sobre as datas
+    ordenadas; categorias e regiões viram um OU entre bitmaps pré-calculados,
+    aplicados só à fatia do período. As combinações recentes de filtros ficam
+    memorizadas, limitadas pelo total de linhas guardadas.
+    """
+
+    def __init__(self, df, max_combinacoes=16, max_linhas_memo=2_000_000):
+        # A camada de dados já entrega as vendas ordenadas; sem isso, ordena uma vez aqui
+        if not df['data_venda'].is_monotonic_increasing:
+            df = df.iloc[np.argsort(df['data_venda'].to_numpy(), kind='stable')]
+        self.df = df
+        self.datas = df['data_venda'].to_numpy()
+        self.categorias, self._bitmaps_categoria = self._construir_bitmaps(df['categoria'])
+        self.regioes, self._bitmaps_regiao = self._construir_bitmaps(df['regiao'])
+        self.max_combinacoes = max_combinacoes
+        self.max_linhas_memo = max_linhas_memo
+        self._memo = OrderedDict()
+        self._linhas_memo = 0
+        self._lock = threading.Lock()
+
+    def _construir_bitmaps(self, coluna):
+        codigos, valores = pd.factorize(coluna, sort=True)
+        bitmaps = {valor: codigos == i for i, valor in enumerate(valores)}
+        return list(valores), bitmaps
+
+    @property
+    def data_minima(self):
+        return pd.Timestamp(self.datas[0]) if len(self.datas) else None
+
+    @property
+    def data_maxima(self):
+        return pd.Timestamp(self.datas[-1]) if len(self.datas) else None
+
+    def _mascara(self, bitmaps, selecionados, inicio, fim):
+        """Bitmap da seleção na fatia [inicio, fim), ou None quando tudo está selecionado"""
+        selecionados = set(selecionados)
+        incluidos = [valor for valor in bitmaps if valor in selecionados]
+        if len(incluidos) == len(bitmaps):
+            return None
+        # Combina o lado menor: os selecionados ou, negando, os não selecionados
+        excluidos = [valor for valor in bitmaps if valor not in selecionados]
+        negar = len(excluidos) < len(incluidos)
+        mascara = np.zeros(fim - inicio, dtype=bool)
+        for valor in (excluidos if negar else incluidos):
+            mascara |= bitmaps[valor][inicio:fim]
+        return ~mascara if negar else mascara
+
+    def intervalo(self, data_inicio, data_fim):
+        """Fatia [inicio, fim) das vendas entre as duas datas (inclusive), por busca binária"""
+        inicio = np.searchsorted(self.datas, np.datetime64(pd.Timestamp(data_inicio)), side='left')
+        fim = np.searchsorted(self.datas, np.datetime64(pd.Timestamp(data_fim)), side='right')
+        return int(inicio), int(max(fim, inicio))
+
+    def selecionar(self, categorias, regioes, data_inicio, data_fim):
+        """DataFrame filtrado, sem memorização (fatia sem cópia quando não há máscara)"""
+        inicio, fim = self.intervalo(data_inicio, data_fim)
+        mascara = None
+        for bitmaps, selecionados in (
+            (self._bitmaps_categoria, categorias),
+            (self._bitmaps_regiao, regioes),
+        ):
+            parcial = self._mascara(bitmaps, selecionados, inicio, fim)
+            if parcial is not None:
+                mascara = parcial if mascara is None else mascara & parcial
+        if mascara is None:
+            return self.df.iloc[inicio:fim]
+        return self.df.iloc[np.flatnonzero(mascara) + inicio]
+
+    def filtrar(self, categorias, regioes, data_inicio, data_fim):
+        """DataFrame filtrado (ordenado por data), com memorização das combinações recentes"""
+        chave = (frozenset(categorias), frozenset(regioes), pd.Timestamp(data_inicio), pd.Timestamp(data_fim))
+        with self._lock:
+            if chave in self._memo:
+                self._memo.move_to_end(chave)
+                return self._memo[chave]
+
+        resultado = self.selecionar(categorias, regioes, data_inicio, data_fim)
+
+        with self._lock:
+            if chave not in self._memo and len(resultado) <= self.max_linhas_memo:
+                self._memo[chave] = resultado
+                self._linhas_memo += len(resultado)
+                while len(self._memo) > self.max_combinacoes or self._linhas_memo > self.max_linhas_memo:
+                    _, removido = self._memo.popitem(last=False)
+                    self._linhas_memo -= len(removido)
+        return resultado
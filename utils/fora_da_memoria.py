@@ -0,0 +1,257 @@
+"""Modo fora da memória: agregados de vendas e financeiro calculados lendo o arquivo em blocos
+
+Para arquivos maiores que a memória do processo, os datasets listados em
+AIRCATERING_FORA_DA_MEMORIA (ex.: "vendas,financeiro"; "1" liga os dois) não
+são carregados como DataFrame. O arquivo é lido em blocos de
+AIRCATERING_BLOCO linhas (do snapshot Parquet, se atualizado, ou do CSV) e
+cada bloco vira um agregado parcial: cubo mensal (utils/rollups.py) e, nas
+vendas, totais por vendedor. Os parciais são mesclados um a um, então só um
+bloco e os agregados ficam em memória. Arquivos que só recebem linhas no
+final são atualizados mesclando o parcial da cauda, como na ingestão
+incremental da camada de dados.
+"""
+import io
+import os
+import threading
+
+import pandas as pd
+
+from utils.camada_dados import (
+    DATASETS, assinatura_arquivo, cache_datasets, caminho_dataset, colunas_csv, fim_carga, ler_csv_em_blocos
+)
+from utils.colunas_derivadas import adicionar_colunas_derivadas
+from utils.esquema import aplicar_esquema
+from utils.ingestao import ler_cauda, posicao_apos_carga
+from utils.instrumentacao import trecho
+from utils.rollups import (
+    COLUNAS_FINANCEIRO, COLUNAS_VENDAS, agregar_cubo, construir_cubo_financeiro,
+    construir_cubo_vendas, mesclar_cubo_financeiro, mesclar_cubo_vendas
+)
+from utils.snapshot import colunas_snapshot, ler_snapshot_em_blocos, snapshot_atualizado
+
+
+def _datasets_configurados(valor):
+    if valor in ('', '0'):
+        return frozenset()
+    if valor == '1':
+        return frozenset(AGREGADOS)
+    return frozenset(nome.strip() for nome in valor.split(',') if nome.strip())
+
+
+# Linhas por bloco lido (o pico de memória é proporcional a um bloco)
+TAMANHO_BLOCO = int(os.environ.get('AIRCATERING_BLOCO', 500_000))
+# Vendedores exibidos no ranking
+TOP_VENDEDORES = 10
+
+
+class ParcialVendas:
+    """Agregado mesclável das vendas: cubo mensal, totais por vendedor e maior venda"""
+
+    COLUNAS = COLUNAS_VENDAS + ['vendedor']
+
+    def __init__(self, cubo, vendedores, maior_venda):
+        self.cubo = cubo
+        # Indexado pelo vendedor: valor_total e num_vendas
+        self.vendedores = vendedores
+        self.maior_venda = maior_venda
+
+    @classmethod
+    def de_bloco(cls, df):
+        """Parcial de um bloco de linhas (ou do dataset inteiro)"""
+        vendedores = df.groupby('vendedor', observed=True).agg(
+            valor_total=('valor_total', 'sum'),
+            num_vendas=('valor_total', 'size'),
+        )
+        return cls(construir_cubo_vendas(df), vendedores, df['valor_total'].max())
+
+    def mesclar(self, outro):
+        """Parcial das linhas dos dois parciais"""
+        vendedores = pd.concat([self.vendedores, outro.vendedores]).groupby(level=0).sum()
+        return ParcialVendas(mesclar_cubo_vendas(self.cubo, outro.cubo), vendedores,
+                             max(self.maior_venda, outro.maior_venda))
+
+    @property
+    def total_vendas(self):
+        return self.cubo['valor_total'].sum()
+
+    @property
+    def num_vendas(self):
+        return int(self.cubo['num_vendas'].sum())
+
+    def por(self, dimensoes, medida='valor_total'):
+        """Soma da medida pelas dimensões do cubo (mes, categoria, regiao, canal)"""
+        return agregar_cubo(self.cubo, dimensoes, medida)
+
+    def top_vendedores(self, n=TOP_VENDEDORES):
+        """Os n vendedores com maior valor vendido"""
+        return self.vendedores.nlargest(n, 'valor_total').rename_axis('vendedor').reset_index()
+
+
+class ParcialFinanceiro:
+    """Agregado mesclável do financeiro: o cubo mensal, de onde saem todos os KPIs"""
+
+    COLUNAS = COLUNAS_FINANCEIRO
+
+    def __init__(self, cubo):
+        self.cubo = cubo
+
+    @classmethod
+    def de_bloco(cls, df):
+        """Parcial de um bloco de linhas (ou do dataset inteiro)"""
+        return cls(construir_cubo_financeiro(df))
+
+    def mesclar(self, outro):
+        """Parcial das linhas dos dois parciais"""
+        return ParcialFinanceiro(mesclar_cubo_financeiro(self.cubo, outro.cubo))
+
+
+# Datasets que podem ser agregados em blocos e o tipo do agregado parcial de cada um
+AGREGADOS = {'vendas': ParcialVendas, 'financeiro': ParcialFinanceiro}
+DATASETS_FORA_DA_MEMORIA = _datasets_configurados(os.environ.get('AIRCATERING_FORA_DA_MEMORIA', ''))
+
+
+def ler_em_blocos(nome, caminho, colunas, tamanho_bloco=TAMANHO_BLOCO):
+    """Blocos do dataset só com `colunas`, nos tipos do esquema, do snapshot atualizado ou do CSV"""
+    if snapshot_atualizado(caminho):
+        existentes = set(colunas_snapshot(caminho))
+        blocos = ler_snapshot_em_blocos(caminho, [coluna for coluna in colunas if coluna in existentes],
+                                        tamanho_bloco)
+        blocos = (aplicar_esquema(nome, bloco) for bloco in blocos)
+    else:
+        # Como na carga completa da camada de dados: até a última linha completa
+        blocos = ler_csv_em_blocos(nome, caminho, tamanho_bloco, usar_colunas=colunas, fim=fim_carga(nome, caminho))
+    for bloco in blocos:
+        yield adicionar_colunas_derivadas(nome, bloco)
+
+
+def agregar_blocos(tipo, blocos, parcial=None):
+    """Mescla ao parcial (None = vazio) os parciais de cada bloco; devolve o parcial e o total de linhas"""
+    linhas = 0
+    for bloco in blocos:
+        linhas += len(bloco)
+        atual = tipo.de_bloco(bloco)
+        parcial = atual if parcial is None else parcial.mesclar(atual)
+    return parcial, linhas
+
+
+class EntradaAgregado:
+    """Agregado de uma versão do arquivo e a posição de leitura (arquivos incrementais)"""
+
+    def __init__(self, assinatura, parcial, linhas, posicao=None):
+        self.assinatura = assinatura
+        self.parcial = parcial
+        self.linhas = linhas
+        self.posicao = posicao
+
+
+class CacheAgregadosEmBlocos:
+    """Agregados parciais por dataset, recalculados (ou mesclados com a cauda) quando o arquivo muda"""
+
+    def __init__(self, tamanho_bloco=TAMANHO_BLOCO):
+        self.tamanho_bloco = tamanho_bloco
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self._locks_datasets = {}
+        self.leituras = 0
+        self.incrementos = 0
+
+    def _lock_dataset(self, nome):
+        with self._lock:
+            return self._locks_datasets.setdefault(nome, threading.Lock())
+
+    def obter(self, nome):
+        """Agregado parcial da versão atual do arquivo, ou None se ele não existir ou estiver vazio"""
+        caminho = caminho_dataset(nome)
+        assinatura = assinatura_arquivo(caminho)
+        if assinatura is None:
+            with self._lock:
+                self._entradas.pop(nome, None)
+            return None
+        entrada = self._entradas.get(nome)
+        if entrada is not None and entrada.assinatura == assinatura:
+            return entrada.parcial
+
+        with self._lock_dataset(nome):
+            entrada = self._entradas.get(nome)
+            if entrada is not None and entrada.assinatura == assinatura:
+                return entrada.parcial
+            with trecho('agregacao', f"{nome}.blocos"):
+                nova = None
+                if entrada is not None and entrada.posicao is not None:
+                    nova = self._acrescentar(nome, caminho, entrada, assinatura)
+                if nova is None:
+                    nova = self._agregar(nome, caminho, assinatura)
+            with self._lock:
+                self._entradas[nome] = nova
+            return nova.parcial
+
+    def _agregar(self, nome, caminho, assinatura):
+        tipo = AGREGADOS[nome]
+        parcial, linhas = agregar_blocos(tipo, ler_em_blocos(nome, caminho, tipo.COLUNAS, self.tamanho_bloco))
+        posicao = None
+        # Como na camada de dados: se o arquivo cresceu durante a leitura, a próxima obter() relê tudo
+        if DATASETS[nome].get('incremental') and assinatura_arquivo(caminho) == assinatura:
+            posicao = posicao_apos_carga(caminho, assinatura[2])
+        with self._lock:
+            self.leituras += 1
+        return EntradaAgregado(assinatura, parcial, linhas, posicao)
+
+    def _acrescentar(self, nome, caminho, entrada, assinatura):
+        """Entrada com o parcial das linhas acrescentadas mesclado, ou None se for preciso reler tudo"""
+        if assinatura[0] != entrada.assinatura[0]:
+            return None
+        cauda = ler_cauda(caminho, entrada.posicao, assinatura[2])
+        if cauda is None:
+            return None
+        bloco, posicao = cauda
+        tipo = AGREGADOS[nome]
+        blocos = ler_csv_em_blocos(nome, io.BytesIO(bloco), self.tamanho_bloco,
+                                   colunas_csv(caminho), tipo.COLUNAS) if bloco else []
+        parcial, linhas = agregar_blocos(tipo, (adicionar_colunas_derivadas(nome, df) for df in blocos),
+                                         entrada.parcial)
+        with self._lock:
+            self.incrementos += 1
+        return EntradaAgregado(assinatura, parcial, entrada.linhas + linhas, posicao)
+
+    def estatisticas(self):
+        """Leituras completas, incrementos e linhas agregadas de cada dataset"""
+        with self._lock:
+            return {
+                'leituras': self.leituras,
+                'incrementos': self.incrementos,
+                'datasets': {nome: {'linhas': entrada.linhas} for nome, entrada in self._entradas.items()},
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+# Instância única por processo, como o cache de datasets
+agregados_em_blocos = CacheAgregadosEmBlocos()
+
+
+def agregado_vendas():
+    """ParcialVendas do arquivo inteiro: lido em blocos no modo fora da memória, senão do dataset em cache"""
+    if 'vendas' in DATASETS_FORA_DA_MEMORIA:
+        return agregados_em_blocos.obter('vendas')
+    return cache_datasets.derivado('vendas', 'agregado', ParcialVendas.de_bloco,
+                                   ParcialVendas.mesclar, ParcialVendas.COLUNAS)
+
+
+def cubo_vendas():
+    """Cubo mensal de vendas (None sem arquivo), sem carregar as vendas no modo fora da memória"""
+    if 'vendas' in DATASETS_FORA_DA_MEMORIA:
+        parcial = agregados_em_blocos.obter('vendas')
+        return None if parcial is None else parcial.cubo
+    return cache_datasets.derivado('vendas', 'cubo_mensal', construir_cubo_vendas,
+                                   mesclar_cubo_vendas, COLUNAS_VENDAS)
+
+
+def cubo_financeiro():
+    """Cubo mensal do financeiro (None sem arquivo), sem carregar o financeiro no modo fora da memória"""
+    if 'financeiro' in DATASETS_FORA_DA_MEMORIA:
+        parcial = agregados_em_blocos.obter('financeiro')
+        return None if parcial is None else parcial.cubo
+    return cache_datasets.derivado('financeiro', 'cubo_mensal', construir_cubo_financeiro,
+                                   mesclar_cubo_financeiro, COLUNAS_FINANCEIRO)
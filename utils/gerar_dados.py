@@ -1,8 +1,21 @@
 import pandas as pd
 import numpy as np
 from faker import Faker
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import random
+import os
+import sys
+
+if __package__ in (None, ''):
+    # Executado como script (python utils/gerar_dados.py): torna o pacote utils importável
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.camada_dados import caminho_dataset
+from utils.esquema import aplicar_esquema, bytes_para_uuid_texto
+from utils.snapshot import EscritorSnapshot
 
 fake = Faker('pt_BR')
 
@@ -84,12 +97,18 @@ def gerar_dados_estoque(num_produtos=200):
     
     return pd.DataFrame(dados)
 
+# Fração dos funcionários gerados que já foram desligados
+PROPORCAO_DESLIGADOS = 0.15
+
 def gerar_dados_rh(num_funcionarios=150):
     """Gera dados simulados de RH"""
     dados = []
     
     for _ in range(num_funcionarios):
         data_admissao = fake.date_between(start_date='-5y', end_date='today')
+        # Parte do quadro já saiu da empresa: status Inativo e data de desligamento após a admissão
+        desligado = random.random() < PROPORCAO_DESLIGADOS
+        data_desligamento = fake.date_between(start_date=data_admissao, end_date='today') if desligado else None
         
         registro = {
             'id': fake.uuid4(),
@@ -105,7 +124,8 @@ def gerar_dados_rh(num_funcionarios=150):
             ]),
             'salario': round(random.uniform(2000, 15000), 2),
             'data_admissao': data_admissao,
-            'status': random.choice(['Ativo', 'Férias', 'Licença']),
+            'data_desligamento': data_desligamento,
+            'status': 'Inativo' if desligado else random.choice(['Ativo', 'Férias', 'Licença']),
             'nivel': random.choice(['Júnior', 'Pleno', 'Sênior']),
             'avaliacao': round(random.uniform(1, 5), 1)
         }
@@ -193,33 +213,307 @@ def gerar_dados_empresas_grupo(num_empresas=8):
     
     return pd.DataFrame(dados)
 
-def salvar_todos_os_dados():
-    """Gera e salva todos os datasets"""
-    print("Gerando dados de vendas...")
-    df_vendas = gerar_dados_vendas(1000)
-    df_vendas.to_csv('data/vendas.csv', index=False)
-    
-    print("Gerando dados financeiros...")
-    df_financeiro = gerar_dados_financeiro(500)
-    df_financeiro.to_csv('data/financeiro.csv', index=False)
-    
-    print("Gerando dados de estoque...")
-    df_estoque = gerar_dados_estoque(200)
-    df_estoque.to_csv('data/estoque.csv', index=False)
-    
-    print("Gerando dados de RH...")
-    df_rh = gerar_dados_rh(150)
-    df_rh.to_csv('data/rh.csv', index=False)
-    
-    print("Gerando dados de produção...")
-    df_producao = gerar_dados_producao(300)
-    df_producao.to_csv('data/producao.csv', index=False)
+# ---------------------------------------------------------------------------
+# Geração vetorizada para testes de carga
+#
+# Em vez de chamar o Faker e o random linha a linha, cada lote é gerado com
+# arrays NumPy; textos são amostrados por índice de pools pré-gerados pelo
+# Faker. O gerador de cada lote é semeado com (seed, índice do lote), então o
+# resultado depende só da seed e do tamanho do lote, não do número de processos.
+# ---------------------------------------------------------------------------
+
+TAMANHO_POOL = 5000
+TAMANHO_LOTE = 100_000
+
+def gerar_pools(seed, tamanho=TAMANHO_POOL):
+    """Gera os pools de textos do Faker usados pela geração vetorizada"""
+    gerador = Faker('pt_BR')
+    gerador.seed_instance(seed)
+    return {
+        'nomes': np.array([gerador.name() for _ in range(tamanho)], dtype=object),
+        'empresas': np.array([gerador.company() for _ in range(tamanho)], dtype=object),
+        'frases': np.array([gerador.catch_phrase() for _ in range(tamanho)], dtype=object),
+        'sentencas': np.array([gerador.sentence() for _ in range(tamanho)], dtype=object),
+        'emails': np.array([gerador.email() for _ in range(tamanho)], dtype=object),
+    }
+
+def _uuids(rng, n):
+    """UUIDs versão 4 aleatórios, gerados direto dos bytes"""
+    binario = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    binario[:, 6] = (binario[:, 6] & 0x0F) | 0x40
+    binario[:, 8] = (binario[:, 8] & 0x3F) | 0x80
+    return bytes_para_uuid_texto(binario)
+
+def _escolher(rng, opcoes, n):
+    return np.asarray(opcoes, dtype=object)[rng.integers(0, len(opcoes), n)]
+
+def _amostrar(rng, pool, n):
+    return pool[rng.integers(0, len(pool), n)]
+
+def _datas(rng, n, hoje, dias_antes, dias_depois=0):
+    """Datas uniformes entre hoje - dias_antes e hoje + dias_depois"""
+    return hoje + rng.integers(-dias_antes, dias_depois + 1, n).astype('timedelta64[D]')
+
+def _lote_vendas(rng, n, pools, hoje):
+    quantidade = rng.integers(1, 101, n)
+    preco_unitario = np.round(rng.uniform(10, 500, n), 2)
+    desconto = np.round(rng.uniform(0, 0.2, n), 2)
+    valor_bruto = quantidade * preco_unitario
+    return pd.DataFrame({
+        'id': _uuids(rng, n),
+        'data_venda': _datas(rng, n, hoje, 730),
+        'cliente': _amostrar(rng, pools['empresas'], n),
+        'vendedor': _amostrar(rng, pools['nomes'], n),
+        'produto': _amostrar(rng, pools['frases'], n),
+        'categoria': _escolher(rng, ['Alimentação', 'Bebidas', 'Utensílios', 'Serviços'], n),
+        'quantidade': quantidade,
+        'preco_unitario': preco_unitario,
+        'desconto': desconto,
+        'regiao': _escolher(rng, ['Norte', 'Sul', 'Leste', 'Oeste', 'Centro'], n),
+        'canal': _escolher(rng, ['Online', 'Loja Física', 'Telefone', 'Representante'], n),
+        'valor_total': np.round(valor_bruto - valor_bruto * desconto, 2),
+    })
+
+def _lote_financeiro(rng, n, pools, hoje):
+    return pd.DataFrame({
+        'id': _uuids(rng, n),
+        'data': _datas(rng, n, hoje, 365),
+        'tipo': _escolher(rng, ['Receita', 'Despesa'], n),
+        'categoria': _escolher(rng, [
+            'Vendas', 'Salários', 'Fornecedores', 'Marketing',
+            'Infraestrutura', 'Impostos', 'Investimentos'
+        ], n),
+        'descricao': _amostrar(rng, pools['sentencas'], n),
+        'valor': np.round(rng.uniform(-50000, 100000, n), 2),
+        'conta': _escolher(rng, ['Banco Principal', 'Conta Corrente', 'Poupança', 'Investimentos'], n),
+        'status': _escolher(rng, ['Confirmado', 'Pendente', 'Cancelado'], n),
+    })
+
+def _lote_estoque(rng, n, pools, hoje):
+    setores = np.array([f"Setor {setor}-{numero}" for setor in 'ABC' for numero in range(1, 21)], dtype=object)
+    validade = _datas(rng, n, hoje, 0, 365).astype('datetime64[ns]')
+    validade[rng.random(n) < 0.5] = np.datetime64('NaT')
+    return pd.DataFrame({
+        'id': _uuids(rng, n),
+        'nome_produto': _amostrar(rng, pools['frases'], n),
+        'categoria': _escolher(rng, ['Alimentação', 'Bebidas', 'Utensílios', 'Limpeza'], n),
+        'fornecedor': _amostrar(rng, pools['empresas'], n),
+        'quantidade_atual': rng.integers(0, 1001, n),
+        'quantidade_minima': rng.integers(10, 51, n),
+        'preco_custo': np.round(rng.uniform(5, 200, n), 2),
+        'preco_venda': np.round(rng.uniform(10, 400, n), 2),
+        'data_ultima_entrada': _datas(rng, n, hoje, 180),
+        'localizacao': _amostrar(rng, setores, n),
+        'validade': validade,
+    })
+
+def _lote_rh(rng, n, pools, hoje):
+    data_admissao = _datas(rng, n, hoje, 1825)
+    desligado = rng.random(n) < PROPORCAO_DESLIGADOS
+    # Desligamento uniforme entre a admissão e hoje
+    dias_casa = (hoje - data_admissao).astype(np.int64)
+    data_desligamento = (data_admissao + (rng.random(n) * (dias_casa + 1)).astype('timedelta64[D]')).astype('datetime64[ns]')
+    data_desligamento[~desligado] = np.datetime64('NaT')
+    status = _escolher(rng, ['Ativo', 'Férias', 'Licença'], n)
+    status[desligado] = 'Inativo'
+    return pd.DataFrame({
+        'id': _uuids(rng, n),
+        'nome': _amostrar(rng, pools['nomes'], n),
+        'email': _amostrar(rng, pools['emails'], n),
+        'cargo': _escolher(rng, [
+            'Gerente', 'Supervisor', 'Analista', 'Assistente',
+            'Coordenador', 'Especialista', 'Técnico'
+        ], n),
+        'departamento': _escolher(rng, [
+            'Vendas', 'Marketing', 'Financeiro', 'RH',
+            'TI', 'Operações', 'Produção'
+        ], n),
+        'salario': np.round(rng.uniform(2000, 15000, n), 2),
+        'data_admissao': data_admissao,
+        'data_desligamento': data_desligamento,
+        'status': status,
+        'nivel': _escolher(rng, ['Júnior', 'Pleno', 'Sênior'], n),
+        'avaliacao': np.round(rng.uniform(1, 5, n), 1),
+    })
+
+def _lote_producao(rng, n, pools, hoje):
+    return pd.DataFrame({
+        'id': _uuids(rng, n),
+        'data_producao': _datas(rng, n, hoje, 180),
+        'produto': _amostrar(rng, pools['frases'], n),
+        'linha_producao': _escolher(rng, [f"Linha {i}" for i in range(1, 6)], n),
+        'quantidade_planejada': rng.integers(100, 1001, n),
+        'quantidade_produzida': rng.integers(80, 1001, n),
+        'tempo_producao_horas': np.round(rng.uniform(2, 24, n), 2),
+        'custo_producao': np.round(rng.uniform(500, 5000, n), 2),
+        'qualidade_nota': np.round(rng.uniform(3, 5, n), 1),
+        'responsavel': _amostrar(rng, pools['nomes'], n),
+        'turno': _escolher(rng, ['Manhã', 'Tarde', 'Noite'], n),
+        'status': _escolher(rng, ['Concluído', 'Em Andamento', 'Pausado'], n),
+    })
+
+GERADORES_LOTE = {
+    'vendas': _lote_vendas,
+    'financeiro': _lote_financeiro,
+    'estoque': _lote_estoque,
+    'rh': _lote_rh,
+    'producao': _lote_producao,
+}
+
+def gerar_lote(nome, seed, indice_lote, num_registros, pools, hoje):
+    """Gera um lote de um dataset; o resultado depende só de (seed, indice_lote)"""
+    rng = np.random.default_rng([seed, indice_lote])
+    return GERADORES_LOTE[nome](rng, num_registros, pools, hoje)
+
+def _gerar_lote(tarefa):
+    return gerar_lote(*tarefa)
+
+def _tarefas_lotes(nome, num_registros, seed, tamanho_lote, hoje=None):
+    """Tarefas da geração vetorizada, uma por lote, criadas sob demanda
+
+    As datas são relativas a `hoje` (padrão: a data atual); fixá-lo torna o
+    resultado de uma seed igual em qualquer dia.
+    """
+    pools = gerar_pools(seed)
+    hoje = np.datetime64(hoje or date.today(), 'D')
+    for indice, inicio in enumerate(range(0, num_registros, tamanho_lote)):
+        yield (nome, seed, indice, min(tamanho_lote, num_registros - inicio), pools, hoje)
+
+def _lotes_vetorizados(nome, num_registros, seed, tamanho_lote, processos, hoje=None):
+    tarefas = _tarefas_lotes(nome, num_registros, seed, tamanho_lote, hoje)
+    if processos == 1 or num_registros <= tamanho_lote:
+        for tarefa in tarefas:
+            yield _gerar_lote(tarefa)
+        return
+    # Poucos lotes em andamento por vez: a memória não cresce com o total de lotes
+    limite = 2 * (processos or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        pendentes = deque()
+        for tarefa in tarefas:
+            pendentes.append(executor.submit(_gerar_lote, tarefa))
+            if len(pendentes) >= limite:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+def gerar_dados_vetorizado(nome, num_registros, seed=42, tamanho_lote=TAMANHO_LOTE, processos=None, hoje=None):
+    """Gera um dataset inteiro de forma vetorizada, com os lotes distribuídos em processos"""
+    lotes = list(_lotes_vetorizados(nome, num_registros, seed, tamanho_lote, processos, hoje))
+    if not lotes:
+        return _gerar_lote(next(_tarefas_lotes(nome, 1, seed, tamanho_lote, hoje))).iloc[:0]
+    return pd.concat(lotes, ignore_index=True)
+
+# Geradores linha a linha de cada dataset
+GERADORES = {
+    'vendas': gerar_dados_vendas,
+    'financeiro': gerar_dados_financeiro,
+    'estoque': gerar_dados_estoque,
+    'rh': gerar_dados_rh,
+    'producao': gerar_dados_producao,
+    'empresas_grupo': gerar_dados_empresas_grupo,
+}
+
+def gerar_lotes(nome, num_registros, tamanho_lote=TAMANHO_LOTE, vetorizado=False, seed=42, processos=None,
+                hoje=None):
+    """Gera um dataset em lotes (DataFrames) de até tamanho_lote linhas
+
+    Consumir os lotes um a um mantém a memória constante qualquer que seja
+    num_registros. As empresas do grupo (num_registros = número de empresas)
+    são sempre geradas num lote só.
+    """
+    if nome == 'empresas_grupo':
+        yield gerar_dados_empresas_grupo(num_registros)
+    elif vetorizado:
+        yield from _lotes_vetorizados(nome, num_registros, seed, tamanho_lote, processos, hoje)
+    else:
+        for inicio in range(0, num_registros, tamanho_lote):
+            yield GERADORES[nome](min(tamanho_lote, num_registros - inicio))
+
+def salvar_dataset_em_lotes(nome, lotes):
+    """Grava os lotes de um dataset um a um no CSV e no snapshot colunar usado pelo app
+
+    CSV e snapshot são escritos em arquivos temporários e publicados só no fim,
+    então o app nunca lê um arquivo pela metade. Retorna o total de linhas.
+    """
+    caminho = caminho_dataset(nome)
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    snapshot = EscritorSnapshot(caminho)
+    total = 0
+    try:
+        with open(temporario, 'w', encoding='utf-8', newline='') as arquivo:
+            for indice, lote in enumerate(lotes):
+                lote.to_csv(arquivo, header=(indice == 0), index=False)
+                snapshot.escrever(aplicar_esquema(nome, lote))
+                total += len(lote)
+        os.replace(temporario, caminho)
+        snapshot.finalizar()
+    except BaseException:
+        snapshot.descartar()
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return total
+
+def salvar_dataset(nome, df):
+    """Salva um dataset em CSV e no snapshot colunar usado pelo app"""
+    return salvar_dataset_em_lotes(nome, [df])
+
+# Quantidade de registros padrão de cada dataset
+TAMANHOS_PADRAO = {
+    'vendas': 1000,
+    'financeiro': 500,
+    'estoque': 200,
+    'rh': 150,
+    'producao': 300,
+    'empresas_grupo': 8,
+}
+
+MENSAGENS = {
+    'vendas': "Gerando dados de vendas...",
+    'financeiro': "Gerando dados financeiros...",
+    'estoque': "Gerando dados de estoque...",
+    'rh': "Gerando dados de RH...",
+    'producao': "Gerando dados de produção...",
+    'empresas_grupo': "Gerando dados das empresas do grupo...",
+}
+
+def salvar_todos_os_dados(tamanhos=None, vetorizado=False, seed=42, processos=None, tamanho_lote=TAMANHO_LOTE,
+                          hoje=None):
+    """Gera e salva todos os datasets, lote a lote
+
+    Com vetorizado=True os datasets linha a linha usam a geração NumPy em
+    processos paralelos (determinística pela seed e por `hoje`, a data de
+    referência), própria para testes de carga.
+    """
+    tamanhos = {**TAMANHOS_PADRAO, **(tamanhos or {})}
     
-    print("Gerando dados das empresas do grupo...")
-    df_empresas = gerar_dados_empresas_grupo(8)
-    df_empresas.to_csv('data/empresas_grupo.csv', index=False)
+    for nome, mensagem in MENSAGENS.items():
+        print(mensagem)
+        lotes = gerar_lotes(nome, tamanhos[nome], tamanho_lote=tamanho_lote,
+                            vetorizado=vetorizado, seed=seed, processos=processos, hoje=hoje)
+        salvar_dataset_em_lotes(nome, lotes)
     
     print("✅ Todos os dados foram gerados e salvos!")
 
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Gera os datasets de exemplo do AirCatering BI")
+    parser.add_argument('--vetorizado', action='store_true',
+                        help="usa a geração NumPy em paralelo (para volumes grandes)")
+    parser.add_argument('--seed', type=int, default=42, help="seed da geração vetorizada")
+    parser.add_argument('--data-base', type=date.fromisoformat, default=None, dest='hoje', metavar='AAAA-MM-DD',
+                        help="data de referência das datas da geração vetorizada (padrão: hoje)")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                        help=f"linhas por lote gravado (padrão: {TAMANHO_LOTE})")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="número de processos da geração vetorizada (padrão: núcleos da máquina)")
+    for nome in TAMANHOS_PADRAO:
+        parser.add_argument(f'--{nome.replace("_", "-")}', type=int, dest=nome, default=None,
+                            help=f"registros de {nome} (padrão: {TAMANHOS_PADRAO[nome]})")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    salvar_todos_os_dados()
\ No newline at end of file
+    args = _argumentos()
+    tamanhos = {nome: getattr(args, nome) for nome in TAMANHOS_PADRAO if getattr(args, nome) is not None}
+    salvar_todos_os_dados(tamanhos, vetorizado=args.vetorizado, seed=args.seed,
+                          processos=args.processos, tamanho_lote=args.lote, hoje=args.hoje)
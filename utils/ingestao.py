@@ -0,0 +1,63 @@
+"""Acompanhamento de CSVs que só recebem linhas novas no final (ingestão incremental)"""
+import hashlib
+
+# Bytes antes da posição lida usados para confirmar que o início do arquivo não mudou
+TAMANHO_MARCA = 4096
+# Bloco lido do final do arquivo para achar a última quebra de linha
+TAMANHO_BLOCO_FINAL = 1 << 16
+
+
+class PosicaoLeitura:
+    """Fim da última linha completa já lida de um CSV e a marca dos bytes anteriores a ele"""
+
+    def __init__(self, offset, marca):
+        self.offset = offset
+        self.marca = marca
+
+
+def _ler_bytes(caminho, inicio, fim):
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        return arquivo.read(fim - inicio)
+
+
+def _marca(caminho, offset):
+    return hashlib.sha1(_ler_bytes(caminho, max(0, offset - TAMANHO_MARCA), offset)).digest()
+
+
+def fim_linhas_completas(caminho, tamanho):
+    """Byte logo após a última quebra de linha entre os `tamanho` primeiros bytes do arquivo
+
+    Uma última linha ainda sendo escrita fica de fora. Sem quebra no bloco
+    final, o arquivo inteiro conta como lido.
+    """
+    inicio = max(0, tamanho - TAMANHO_BLOCO_FINAL)
+    quebra = _ler_bytes(caminho, inicio, tamanho).rfind(b'\n')
+    return inicio + quebra + 1 if quebra >= 0 else tamanho
+
+
+def posicao_apos_carga(caminho, tamanho):
+    """Posição de leitura depois de uma carga completa de um arquivo com `tamanho` bytes
+
+    A carga completa precisa ter parado em fim_linhas_completas(caminho, tamanho):
+    a linha incompleta que fica de fora é lida depois pela cauda.
+    """
+    offset = fim_linhas_completas(caminho, tamanho)
+    return PosicaoLeitura(offset, _marca(caminho, offset))
+
+
+def ler_cauda(caminho, posicao, tamanho):
+    """Bytes das linhas completas acrescentadas após a posição e a nova posição de leitura
+
+    Retorna None quando o arquivo não foi apenas acrescido (encolheu ou teve o
+    conteúdo já lido alterado); nesse caso ele precisa ser relido por inteiro.
+    Uma última linha ainda incompleta fica para a próxima leitura.
+    """
+    if tamanho < posicao.offset or _marca(caminho, posicao.offset) != posicao.marca:
+        return None
+    bloco = _ler_bytes(caminho, posicao.offset, tamanho)
+    quebra = bloco.rfind(b'\n')
+    if quebra < 0:
+        return b'', posicao
+    offset = posicao.offset + quebra + 1
+    return bloco[:quebra + 1], PosicaoLeitura(offset, _marca(caminho, offset))
@@ -0,0 +1,154 @@
+"""Instrumentação das execuções do app: trechos cronometrados por etapa, com variação de memória
+
+Cada rerun do Streamlit roda numa thread; execucao() abre o registro do rerun
+nessa thread e trecho() mede um pedaço do caminho quente (carga, filtro,
+agregação, figura, render). Trechos aninhados guardam a profundidade, então o
+painel mostra tanto o total de cada etapa quanto o detalhe. Desligada (padrão),
+trecho() não mede nada. Com AIRCATERING_TRACE, cada trecho vira uma linha JSON
+no arquivo, para comparar versões sob carga real.
+"""
+import contextlib
+import itertools
+import json
+import os
+import threading
+import time
+
+# Liga a instrumentação e o painel na sidebar
+INSTRUMENTACAO_ATIVA = os.environ.get('AIRCATERING_INSTRUMENTACAO', '') not in ('', '0')
+# Arquivo JSON lines que recebe os trechos de todas as execuções (vazio desativa a exportação)
+ARQUIVO_TRACE = os.environ.get('AIRCATERING_TRACE', '')
+# Etapas reconhecidas, na ordem exibida no painel
+ETAPAS = ['pagina', 'carga', 'filtro', 'agregacao', 'figura', 'render']
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGINA_BYTES = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def memoria_rss():
+    """Memória residente do processo em bytes (do /proc no Linux; pico do processo nos demais)"""
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * _PAGINA_BYTES
+    except OSError:
+        if resource is None:
+            return 0
+        # ru_maxrss é o pico, em KB no Linux e em bytes no macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Execucao:
+    """Trechos de um rerun, na ordem em que terminaram"""
+
+    _sequencia = itertools.count(1)
+
+    def __init__(self, pagina):
+        self.id = f"{os.getpid()}-{next(self._sequencia)}"
+        self.pagina = pagina
+        self.inicio = time.time()
+        self._inicio_relogio = time.perf_counter()
+        self.duracao = None
+        self.trechos = []
+        self._pilha = []
+
+    def resumo(self):
+        """Tempo total (s) de cada etapa contando só os trechos de mais alto nível dela"""
+        totais = {}
+        for trecho in self.trechos:
+            if not trecho['dentro_da_etapa']:
+                totais[trecho['etapa']] = totais.get(trecho['etapa'], 0.0) + trecho['duracao_s']
+        return totais
+
+
+class Instrumentacao:
+    """Cronometragem dos reruns e exportação dos trechos
+
+    As execuções não ficam num registro do processo, que misturaria as sessões:
+    quem abre o bloco execucao() recebe a sua e a guarda (o app, na sessão).
+    """
+
+    def __init__(self, ativa=INSTRUMENTACAO_ATIVA, arquivo_trace=ARQUIVO_TRACE, max_execucoes=50):
+        self.ativa = ativa or bool(arquivo_trace)
+        self.arquivo_trace = arquivo_trace
+        # Execuções guardadas por sessão (as mais antigas saem primeiro)
+        self.max_execucoes = max_execucoes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def atual(self):
+        """Execução em andamento nesta thread, ou None"""
+        return getattr(self._local, 'execucao', None)
+
+    @contextlib.contextmanager
+    def execucao(self, pagina):
+        """Registra um rerun: os trechos medidos nesta thread até o fim do bloco pertencem a ele"""
+        if not self.ativa:
+            yield None
+            return
+        execucao = Execucao(pagina)
+        self._local.execucao = execucao
+        try:
+            yield execucao
+        finally:
+            execucao.duracao = time.perf_counter() - execucao._inicio_relogio
+            self._local.execucao = None
+            if self.arquivo_trace:
+                self.exportar([execucao], self.arquivo_trace)
+
+    @contextlib.contextmanager
+    def trecho(self, etapa, nome=''):
+        """Cronometra o bloco como um trecho da etapa, com a variação da memória residente"""
+        execucao = self.atual
+        if execucao is None:
+            yield
+            return
+        pai = execucao._pilha[-1] if execucao._pilha else None
+        execucao._pilha.append((etapa, nome))
+        memoria = memoria_rss()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            execucao._pilha.pop()
+            execucao.trechos.append({
+                'etapa': etapa,
+                'nome': nome,
+                # Segundos desde o início do rerun
+                'inicio_s': inicio - execucao._inicio_relogio,
+                'duracao_s': duracao,
+                'memoria_delta_mb': (memoria_rss() - memoria) / 1024 ** 2,
+                'profundidade': len(execucao._pilha),
+                'pai': f"{pai[0]}:{pai[1]}" if pai else None,
+                # Trecho dentro de outro da mesma etapa: já contado no total da etapa
+                'dentro_da_etapa': any(item[0] == etapa for item in execucao._pilha),
+            })
+
+    @staticmethod
+    def linhas_json(execucoes):
+        """Uma linha JSON por trecho, com o id, a página e o horário da execução"""
+        for execucao in execucoes:
+            for trecho in execucao.trechos:
+                yield json.dumps({
+                    'execucao': execucao.id,
+                    'pagina': execucao.pagina,
+                    'horario': execucao.inicio,
+                    'execucao_duracao_s': execucao.duracao,
+                    **{chave: valor for chave, valor in trecho.items() if chave != 'dentro_da_etapa'},
+                }, ensure_ascii=False)
+
+    def exportar(self, execucoes, caminho):
+        """Acrescenta os trechos das execuções ao arquivo JSON lines"""
+        linhas = ''.join(linha + '\n' for linha in self.linhas_json(execucoes))
+        with self._lock, open(caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(linhas)
+
+
+# Instância única por processo, como os caches
+instrumentacao = Instrumentacao()
+trecho = instrumentacao.trecho
@@ -0,0 +1,116 @@
+"""Datasets publicados uma única vez em arquivos Arrow mapeados em memória pelos processos do servidor
+
+Com vários processos do Streamlit atrás de um balanceador, cada um teria a sua
+cópia de cada dataset. Neste modo o primeiro processo que precisa de uma versão
+do dataset grava-a em formato Arrow IPC (sem compressão) no diretório
+compartilhado; todos os processos mapeiam esse arquivo somente para leitura e o
+DataFrame aponta direto para as páginas mapeadas, que o sistema operacional
+mantém uma única vez na memória (em /dev/shm, ou no cache de páginas do disco).
+"""
+import contextlib
+import hashlib
+import os
+
+from utils.esquema import tipos_arrow
+
+try:
+    import pyarrow as pa
+    ARROW_DISPONIVEL = True
+except ImportError:
+    ARROW_DISPONIVEL = False
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos, dois processos podem publicar a mesma versão
+    fcntl = None
+
+# Diretório compartilhado pelos processos (ex.: /dev/shm/aircatering); vazio desativa o modo
+DIRETORIO_COMPARTILHADO = os.environ.get('AIRCATERING_COMPARTILHADO', '')
+
+
+def compartilhamento_ativo():
+    """True se os datasets devem ser publicados e mapeados no diretório compartilhado"""
+    return bool(DIRETORIO_COMPARTILHADO) and ARROW_DISPONIVEL
+
+
+def _prefixo(assinatura):
+    caminho = assinatura[0]
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    return os.path.join(DIRETORIO_COMPARTILHADO, f"{nome}-{hashlib.sha1(caminho.encode()).hexdigest()[:10]}")
+
+
+def caminho_publicacao(assinatura):
+    """Arquivo Arrow da versão do dataset identificada pela assinatura (caminho, mtime, tamanho)"""
+    _, mtime, tamanho = assinatura
+    return f"{_prefixo(assinatura)}-{mtime}-{tamanho}.arrow"
+
+
+@contextlib.contextmanager
+def _lock_publicacao(assinatura):
+    """Lock entre processos: só um deles lê o arquivo de origem e publica a versão"""
+    os.makedirs(DIRETORIO_COMPARTILHADO, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(f"{_prefixo(assinatura)}.lock", 'w') as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def publicar(df, assinatura):
+    """Grava o DataFrame como Arrow IPC (troca atômica) e remove as versões anteriores"""
+    destino = caminho_publicacao(assinatura)
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    try:
+        with pa.OSFile(temporario, 'wb') as arquivo:
+            with pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    # Processos que ainda mapeiam uma versão antiga continuam com ela até relerem:
+    # remover o arquivo não invalida mapeamentos já abertos
+    prefixo = os.path.basename(_prefixo(assinatura)) + '-'
+    for arquivo in os.listdir(DIRETORIO_COMPARTILHADO):
+        caminho = os.path.join(DIRETORIO_COMPARTILHADO, arquivo)
+        if arquivo.startswith(prefixo) and arquivo.endswith('.arrow') and caminho != destino:
+            with contextlib.suppress(OSError):
+                os.remove(caminho)
+
+
+def mapear(assinatura, colunas=None):
+    """DataFrame somente leitura sobre o arquivo publicado, ou None se a versão não foi publicada
+
+    Colunas numéricas, datas, categorias e textos apontam para as páginas
+    mapeadas, sem cópia; `colunas` seleciona as colunas também sem copiar.
+    """
+    caminho = caminho_publicacao(assinatura)
+    try:
+        tabela = pa.ipc.open_file(pa.memory_map(caminho, 'r')).read_all()
+    except FileNotFoundError:
+        return None
+    if colunas is not None:
+        tabela = tabela.select([coluna for coluna in colunas if coluna in tabela.schema.names])
+    # split_blocks evita que o pandas consolide (e copie) colunas do mesmo tipo num bloco só
+    return tabela.to_pandas(split_blocks=True, ignore_metadata=True, types_mapper=tipos_arrow)
+
+
+def obter_compartilhado(assinatura, carregar, colunas=None):
+    """Mapeia a versão publicada do dataset; se ela não existe, carrega com carregar() e publica
+
+    carregar() deve devolver o dataset completo: a projeção em `colunas` é feita
+    no mapeamento, então todas as projeções compartilham o mesmo arquivo.
+    """
+    df = mapear(assinatura, colunas)
+    if df is not None:
+        return df
+    with _lock_publicacao(assinatura):
+        # Outro processo pode ter publicado enquanto este esperava o lock
+        if not os.path.exists(caminho_publicacao(assinatura)):
+            publicar(carregar(), assinatura)
+    return mapear(assinatura, colunas)
@@ -0,0 +1,350 @@
+"""Relatório em lote (sem a interface): KPIs, tabelas e gráficos de cada módulo gravados em disco
+
+Uso típico num agendamento diário:
+
+    python utils/relatorio.py --saida relatorios
+
+Os datasets são lidos uma única vez pelo processo principal e os módulos
+(dashboard, financeiro, estoque, rh, producao) rodam em paralelo num pool de
+processos, com os mesmos agregados das páginas do app (utils/agregados.py,
+cubos de utils/rollups.py, alertas e séries das empresas). Os processos do
+pool não relêem os arquivos: mapeiam a versão publicada em Arrow no diretório
+compartilhado (utils/memoria_compartilhada.py) ou, sem pyarrow, herdam o
+cache do processo principal no fork.
+
+Cada módulo grava em <saida>/<AAAA-MM-DD>/<modulo>/ o kpis.csv, um CSV por
+tabela e os gráficos; <saida>/<AAAA-MM-DD>/resumo.json consolida os KPIs,
+os arquivos gerados e os erros. Gráficos em PNG/SVG precisam do kaleido;
+sem ele são gravados em HTML (plotly.js carregado da CDN).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+if __package__ in (None, ''):
+    # Executado como script (python utils/relatorio.py): torna o pacote utils importável
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from utils import camada_dados, memoria_compartilhada
+from utils.agregados import kpis_financeiro, resumo_estoque, resumo_producao, resumo_rh
+from utils.alertas_estoque import LIMITE_ALERTAS, TOP_CRITICOS, indice_alertas
+from utils.camada_dados import DadosSobDemanda, cache_datasets
+from utils.fora_da_memoria import (
+    DATASETS_FORA_DA_MEMORIA, agregado_vendas, agregados_em_blocos, cubo_financeiro, cubo_vendas
+)
+from utils.rollups import agregar_cubo
+from utils.series_empresas import SeriesEmpresas
+
+# Dias do alerta de validade (o padrão do slider da página de estoque)
+DIAS_VALIDADE = 30
+# Formatos de gráfico aceitos; png e svg dependem do kaleido
+FORMATOS = ['png', 'svg', 'html']
+KALEIDO_DISPONIVEL = importlib.util.find_spec('kaleido') is not None
+
+
+def relatorio_dashboard():
+    """KPIs principais, vendas por mês e categoria e a consolidação das empresas do grupo"""
+    kpis, tabelas, figuras = {}, {}, {}
+    cubo = cubo_vendas()
+    if cubo is not None:
+        kpis['total_vendas'] = cubo['valor_total'].sum()
+        tabelas['vendas_mes'] = agregar_cubo(cubo, ['mes'], 'valor_total')
+        tabelas['vendas_categoria'] = agregar_cubo(cubo, ['categoria'], 'valor_total')
+        figuras['vendas_mes'] = px.line(tabelas['vendas_mes'], x='mes', y='valor_total',
+                                        title="Evolução das Vendas")
+        figuras['vendas_categoria'] = px.pie(tabelas['vendas_categoria'], values='valor_total',
+                                             names='categoria', title="Distribuição por Categoria")
+        vendas = agregado_vendas()
+        tabelas['vendas_canal'] = vendas.por(['canal'])
+        tabelas['top_vendedores'] = vendas.top_vendedores()
+        figuras['top_vendedores'] = px.bar(tabelas['top_vendedores'].sort_values('valor_total'), x='valor_total',
+                                           y='vendedor', orientation='h', title="Top 10 Vendedores")
+    cubo = cubo_financeiro()
+    if cubo is not None:
+        kpis['receitas'] = kpis_financeiro(cubo)['receitas']
+    estoque = cache_datasets.obter('estoque', ['id'])
+    if estoque is not None:
+        kpis['produtos_estoque'] = len(estoque)
+    rh = cache_datasets.obter('rh', ['status'])
+    if rh is not None:
+        kpis['funcionarios_ativos'] = int((rh['status'] == 'Ativo').sum())
+
+    if cache_datasets.obter('empresas_grupo') is not None:
+        series = cache_datasets.derivado('empresas_grupo', 'series', SeriesEmpresas)
+        if series.ultimo_periodo is not None:
+            grupo = series.grupo.iloc[-1]
+            kpis.update({
+                'periodo_empresas': str(series.ultimo_periodo),
+                'faturamento_grupo': grupo['faturamento'],
+                'crescimento_mom_grupo': grupo['crescimento_mom'],
+                'vendas_grupo': grupo['vendas'],
+                'margem_media_grupo': grupo['margem_media'],
+                'margem_12m_grupo': grupo['margem_12m'],
+                'funcionarios_grupo': grupo['funcionarios'],
+            })
+            tabelas['empresas_ultimo_mes'] = series.ultimo
+            tabelas['grupo_mensal'] = series.grupo
+            figuras['faturamento_empresa'] = px.bar(
+                series.ultimo.sort_values('faturamento'), x='faturamento', y='empresa',
+                orientation='h', title="Faturamento Mensal por Empresa")
+            figuras['margem_empresa'] = px.bar(
+                series.ultimo.sort_values('margem_percentual'), x='margem_percentual', y='empresa',
+                orientation='h', title="Margem % por Empresa")
+            fig = px.line(series.grupo, x='ano_mes', y='margem_media', markers=True,
+                          title="Evolução da Margem Média (%)")
+            fig.add_scatter(x=series.grupo['ano_mes'], y=series.grupo['margem_12m'],
+                            mode='lines', name='Margem 12 meses', line=dict(dash='dash'))
+            figuras['evolucao_margem'] = fig
+            figuras['evolucao_faturamento'] = px.line(series.grupo, x='ano_mes', y='faturamento',
+                                                      markers=True, title="Evolução do Faturamento Total")
+    return kpis, tabelas, figuras
+
+
+def relatorio_financeiro():
+    """Receitas, despesas, lucro, fluxo de caixa mensal e valores por categoria"""
+    cubo = cubo_financeiro()
+    if cubo is None:
+        return None
+    resultado = kpis_financeiro(cubo)
+    kpis = {chave: resultado[chave] for chave in ['receitas', 'despesas', 'lucro', 'margem']}
+    tabelas = {chave: resultado[chave] for chave in ['fluxo_mensal', 'receitas_categoria', 'despesas_categoria']}
+    figuras = {
+        'fluxo_caixa': px.bar(tabelas['fluxo_mensal'], x='mes', y='valor', color='tipo',
+                              title="Fluxo de Caixa Mensal", barmode='group'),
+        'receitas_categoria': px.pie(tabelas['receitas_categoria'], values='valor', names='categoria',
+                                     title="Receitas por Categoria"),
+        'despesas_categoria': px.pie(tabelas['despesas_categoria'], values='valor', names='categoria',
+                                     title="Despesas por Categoria"),
+    }
+    return kpis, tabelas, figuras
+
+
+def relatorio_estoque():
+    """Valor e categorias do estoque, produtos abaixo do mínimo e próximos do vencimento"""
+    df = cache_datasets.obter('estoque')
+    if df is None:
+        return None
+    resumo = cache_datasets.derivado('estoque', 'resumo', resumo_estoque)
+    alertas = indice_alertas()
+    kpis = {
+        'total_produtos': len(df),
+        'valor_total': resumo['valor_total'],
+        'num_categorias': resumo['num_categorias'],
+        'estoque_baixo': alertas.num_estoque_baixo,
+        f'vencendo_{DIAS_VALIDADE}_dias': alertas.num_vencendo(DIAS_VALIDADE),
+    }
+    tabelas = {
+        'quantidade_categoria': resumo['quantidade_categoria'].rename('quantidade').reset_index(),
+        'valor_categoria': resumo['valor_categoria'].rename('valor').reset_index(),
+        'estoque_baixo': alertas.estoque_baixo(limite=LIMITE_ALERTAS),
+        'mais_criticos': alertas.mais_criticos(TOP_CRITICOS),
+        'vencendo': alertas.vencendo(DIAS_VALIDADE, limite=LIMITE_ALERTAS),
+    }
+    figuras = {
+        'quantidade_categoria': px.bar(tabelas['quantidade_categoria'], x='categoria', y='quantidade',
+                                       title="Quantidade por Categoria"),
+        'valor_categoria': px.pie(tabelas['valor_categoria'], values='valor', names='categoria',
+                                  title="Valor por Categoria"),
+    }
+    return kpis, tabelas, figuras
+
+
+def relatorio_rh():
+    """Quadro, folha, turnover por departamento e cargo × nível e turnover mensal
+
+    O absenteísmo da página de RH é simulado e fica fora do relatório.
+    """
+    if cache_datasets.obter('rh') is None:
+        return None
+    resumo = cache_datasets.derivado('rh', 'resumo', resumo_rh)
+    kpis = {chave: resumo[chave] for chave in
+            ['total', 'ativos', 'inativos', 'turnover', 'folha', 'salario_medio', 'tempo_medio_anos']}
+    departamentos = resumo['departamentos'].reset_index()
+    tabelas = {'departamentos': departamentos}
+    figuras = {
+        'funcionarios_departamento': px.bar(departamentos, x='departamento', y='funcionarios',
+                                            title="Funcionários por Departamento"),
+        'salario_departamento': px.bar(departamentos, x='departamento', y='salario_medio',
+                                       title="Salário Médio por Departamento"),
+        'turnover_departamento': px.bar(departamentos, x='departamento', y='turnover',
+                                        title="Taxa de Turnover por Departamento"),
+    }
+    if resumo['cargo_nivel'] is not None:
+        tabelas['cargo_nivel'] = resumo['cargo_nivel']
+        figuras['turnover_cargo_nivel'] = px.bar(resumo['cargo_nivel'], x='cargo', y='turnover', color='nivel',
+                                                 barmode='group', title="Taxa de Turnover por Cargo e Nível")
+    if resumo['turnover_mensal'] is not None:
+        tabelas['turnover_mensal'] = resumo['turnover_mensal']
+        figuras['evolucao_turnover'] = px.line(resumo['turnover_mensal'], x='mes', y='turnover', markers=True,
+                                               title="Evolução do Turnover (12 meses)")
+    return kpis, tabelas, figuras
+
+
+def relatorio_producao():
+    """Produção, eficiência, custo e qualidade, por linha e por turno"""
+    if cache_datasets.obter('producao') is None:
+        return None
+    resumo = cache_datasets.derivado('producao', 'resumo', resumo_producao)
+    kpis = {chave: resumo[chave] for chave in ['total_produzido', 'eficiencia_media', 'custo_total', 'qualidade_media']}
+    tabelas = {
+        'producao_linha': resumo['producao_linha'].rename('quantidade_produzida').reset_index(),
+        'eficiencia_turno': resumo['eficiencia_turno'].rename('eficiencia').reset_index(),
+    }
+    figuras = {
+        'producao_linha': px.bar(tabelas['producao_linha'], x='linha_producao',
+                                 y='quantidade_produzida', title="Produção por Linha"),
+        'eficiencia_turno': px.bar(tabelas['eficiencia_turno'], x='turno',
+                                   y='eficiencia', title="Eficiência por Turno (%)"),
+    }
+    return kpis, tabelas, figuras
+
+
+# Módulo do relatório -> (função, datasets lidos pelo processo principal antes do pool)
+MODULOS = {
+    'dashboard': (relatorio_dashboard, ['vendas', 'financeiro', 'estoque', 'rh', 'empresas_grupo']),
+    'financeiro': (relatorio_financeiro, ['financeiro']),
+    'estoque': (relatorio_estoque, ['estoque']),
+    'rh': (relatorio_rh, ['rh']),
+    'producao': (relatorio_producao, ['producao']),
+}
+
+
+def _valor_json(valor):
+    """KPI como tipo nativo do JSON (NaN vira null)"""
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and np.isnan(valor):
+        return None
+    return valor
+
+
+def salvar_figura(fig, caminho_base, formato):
+    """Grava a figura no formato pedido; PNG e SVG sem o kaleido caem para HTML"""
+    if formato != 'html' and KALEIDO_DISPONIVEL:
+        caminho = f"{caminho_base}.{formato}"
+        fig.write_image(caminho)
+    else:
+        caminho = f"{caminho_base}.html"
+        fig.write_html(caminho, include_plotlyjs='cdn')
+    return caminho
+
+
+def _iniciar_processo(diretorio_dados, diretorio_compartilhado):
+    """Inicializador do pool: mesmos diretórios do processo principal (também no spawn)"""
+    camada_dados.DIRETORIO_DADOS = diretorio_dados
+    memoria_compartilhada.DIRETORIO_COMPARTILHADO = diretorio_compartilhado
+
+
+def gerar_modulo(modulo, destino, formato):
+    """Calcula um módulo e grava kpis.csv, as tabelas e os gráficos em destino/modulo"""
+    inicio = time.perf_counter()
+    resultado = MODULOS[modulo][0]()
+    if resultado is None:
+        return {'modulo': modulo, 'kpis': {}, 'arquivos': [], 'aviso': 'dados não disponíveis'}
+    kpis, tabelas, figuras = resultado
+    pasta = os.path.join(destino, modulo)
+    os.makedirs(pasta, exist_ok=True)
+
+    kpis = {nome: _valor_json(valor) for nome, valor in kpis.items()}
+    arquivos = [os.path.join(pasta, 'kpis.csv')]
+    pd.DataFrame({'indicador': list(kpis), 'valor': list(kpis.values())}).to_csv(arquivos[0], index=False)
+    for nome, tabela in tabelas.items():
+        arquivos.append(os.path.join(pasta, f"{nome}.csv"))
+        tabela.to_csv(arquivos[-1], index=False)
+    for nome, fig in figuras.items():
+        arquivos.append(salvar_figura(fig, os.path.join(pasta, nome), formato))
+    return {'modulo': modulo, 'kpis': kpis, 'arquivos': arquivos,
+            'duracao_s': round(time.perf_counter() - inicio, 3)}
+
+
+def gerar_relatorio(saida='relatorios', modulos=None, processos=None, formato='png'):
+    """Gera o relatório dos módulos pedidos (todos por padrão) e grava o resumo.json
+
+    Retorna o resumo; módulos que falharem aparecem em 'erros' sem interromper os demais.
+    """
+    modulos = modulos or list(MODULOS)
+    destino = os.path.join(saida, datetime.now().strftime('%Y-%m-%d'))
+    os.makedirs(destino, exist_ok=True)
+    inicio = time.perf_counter()
+
+    diretorio_compartilhado = memoria_compartilhada.DIRETORIO_COMPARTILHADO
+    with tempfile.TemporaryDirectory(prefix='aircatering-relatorio-') as temporario:
+        try:
+            # Sem diretório compartilhado configurado, um temporário só para esta execução
+            if not diretorio_compartilhado and memoria_compartilhada.ARROW_DISPONIVEL:
+                memoria_compartilhada.DIRETORIO_COMPARTILHADO = temporario
+
+            # Passada única de leitura: os datasets são lidos (e publicados) aqui, em paralelo; os do
+            # modo fora da memória são só agregados em blocos, e o pool herda os agregados no fork
+            nomes = list(dict.fromkeys(dataset for modulo in modulos for dataset in MODULOS[modulo][1]))
+            dados = DadosSobDemanda([nome for nome in nomes if nome not in DATASETS_FORA_DA_MEMORIA])
+            dados.precarregar()
+            erros = {nome: repr(erro) for nome, erro in dados.erros.items()}
+            for nome in DATASETS_FORA_DA_MEMORIA.intersection(nomes):
+                try:
+                    agregados_em_blocos.obter(nome)
+                except Exception as erro:
+                    erros[nome] = repr(erro)
+
+            with ProcessPoolExecutor(max_workers=min(processos or os.cpu_count() or 1, len(modulos)),
+                                     initializer=_iniciar_processo,
+                                     initargs=(camada_dados.DIRETORIO_DADOS,
+                                               memoria_compartilhada.DIRETORIO_COMPARTILHADO)) as executor:
+                tarefas = {modulo: executor.submit(gerar_modulo, modulo, destino, formato) for modulo in modulos}
+                resultados = {}
+                for modulo, tarefa in tarefas.items():
+                    try:
+                        resultados[modulo] = tarefa.result()
+                    except Exception as erro:
+                        erros[modulo] = repr(erro)
+        finally:
+            # O temporário é apagado ao sair: quem chamar de novo no mesmo processo não pode herdá-lo
+            memoria_compartilhada.DIRETORIO_COMPARTILHADO = diretorio_compartilhado
+
+    resumo = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'diretorio_dados': os.path.abspath(camada_dados.DIRETORIO_DADOS),
+        'formato_graficos': formato if formato == 'html' or KALEIDO_DISPONIVEL else 'html',
+        'duracao_s': round(time.perf_counter() - inicio, 3),
+        'modulos': resultados,
+        'erros': erros,
+    }
+    with open(os.path.join(destino, 'resumo.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(resumo, arquivo, ensure_ascii=False, indent=2)
+    return resumo
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Gera o relatório de KPIs e gráficos do AirCatering BI em disco")
+    parser.add_argument('--saida', default='relatorios',
+                        help="diretório dos relatórios; cada execução grava em <saida>/<AAAA-MM-DD>")
+    parser.add_argument('--dados', default=None,
+                        help=f"diretório dos datasets (padrão: {camada_dados.DIRETORIO_DADOS})")
+    parser.add_argument('--modulos', nargs='+', choices=list(MODULOS), default=None,
+                        help="módulos do relatório (padrão: todos)")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="processos do pool (padrão: núcleos da máquina, até um por módulo)")
+    parser.add_argument('--formato', choices=FORMATOS, default='png',
+                        help="formato dos gráficos (png e svg precisam do kaleido; sem ele, html)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = _argumentos()
+    if args.dados:
+        camada_dados.DIRETORIO_DADOS = args.dados
+    resumo = gerar_relatorio(args.saida, args.modulos, args.processos, args.formato)
+    for modulo, resultado in resumo['modulos'].items():
+        print(f"{modulo}: {len(resultado['arquivos'])} arquivos {resultado.get('aviso', '')}".rstrip())
+    for nome, erro in resumo['erros'].items():
+        print(f"ERRO {nome}: {erro}", file=sys.stderr)
+    sys.exit(1 if resumo['erros'] else 0)
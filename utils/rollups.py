@@ -0,0 +1,56 @@
+"""Cubos mensais pré-agregados de vendas e financeiro usados pelos gráficos"""
+from utils.esquema import concatenar
+
+# Dimensões de cada cubo, além do mês
+DIMENSOES_VENDAS = ['categoria', 'regiao', 'canal']
+DIMENSOES_FINANCEIRO = ['tipo', 'categoria', 'conta']
+# Colunas lidas para montar cada cubo (projeção usada quando só o cubo é necessário)
+COLUNAS_VENDAS = ['data_venda'] + DIMENSOES_VENDAS + ['valor_total', 'quantidade']
+COLUNAS_FINANCEIRO = ['data'] + DIMENSOES_FINANCEIRO + ['valor']
+
+
+def _mes(datas):
+    return datas.dt.to_period('M').rename('mes')
+
+
+def construir_cubo_vendas(df):
+    """Cubo mês × categoria × região × canal com valor, quantidade e número de vendas"""
+    chaves = [_mes(df['data_venda'])] + [df[coluna] for coluna in DIMENSOES_VENDAS]
+    return df.groupby(chaves, observed=True).agg(
+        valor_total=('valor_total', 'sum'),
+        quantidade=('quantidade', 'sum'),
+        num_vendas=('valor_total', 'size'),
+    ).reset_index()
+
+
+def construir_cubo_financeiro(df):
+    """Cubo mês × tipo × categoria × conta com valor e número de lançamentos"""
+    chaves = [_mes(df['data'])] + [df[coluna] for coluna in DIMENSOES_FINANCEIRO]
+    return df.groupby(chaves, observed=True).agg(
+        valor=('valor', 'sum'),
+        num_lancamentos=('valor', 'size'),
+    ).reset_index()
+
+
+def agregar_cubo(cubo, por, medida):
+    """Soma uma medida do cubo pelas dimensões pedidas (mês vira texto 'AAAA-MM')"""
+    resultado = cubo.groupby(por, observed=True)[medida].sum().reset_index()
+    if 'mes' in por:
+        resultado['mes'] = resultado['mes'].astype(str)
+    return resultado
+
+
+def _mesclar(cubo, parcial, dimensoes):
+    juntos = concatenar(cubo, parcial)
+    medidas = [coluna for coluna in cubo.columns if coluna not in dimensoes]
+    return juntos.groupby(dimensoes, observed=True, sort=True)[medidas].sum().reset_index()
+
+
+def mesclar_cubo_vendas(cubo, parcial):
+    """Soma ao cubo de vendas o cubo parcial das linhas novas (ingestão incremental)"""
+    return _mesclar(cubo, parcial, ['mes'] + DIMENSOES_VENDAS)
+
+
+def mesclar_cubo_financeiro(cubo, parcial):
+    """Soma ao cubo financeiro o cubo parcial das linhas novas (ingestão incremental)"""
+    return _mesclar(cubo, parcial, ['mes'] + DIMENSOES_FINANCEIRO)
@@ -0,0 +1,124 @@
+"""Séries mensais das empresas do grupo, indexadas por (empresa, período)"""
+import numpy as np
+import pandas as pd
+
+# Medidas de fluxo (somadas dentro do mês) e de estoque (último valor do mês)
+MEDIDAS_SOMA = ['vendas', 'faturamento', 'custo', 'margem_valor']
+MEDIDAS_ULTIMO = ['funcionarios', 'clientes_ativos']
+# Janela da margem acumulada e defasagem do crescimento anual, em meses
+JANELA_12M = 12
+
+
+def _defasagem(matriz, meses):
+    """Crescimento (%) de cada período sobre o período `meses` antes, por linha da matriz"""
+    crescimento = np.full(matriz.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crescimento[..., meses:] = (matriz[..., meses:] / matriz[..., :-meses] - 1) * 100
+    return crescimento
+
+
+def _soma_movel(matriz, janela):
+    """Soma dos últimos `janela` períodos (NaN enquanto algum período da janela não tem dado)"""
+    acumulada = np.cumsum(np.nan_to_num(matriz), axis=-1)
+    presentes = np.cumsum(~np.isnan(matriz), axis=-1)
+    zeros = np.zeros(matriz.shape[:-1] + (1,))
+    acumulada = np.concatenate([zeros, acumulada], axis=-1)
+    presentes = np.concatenate([zeros, presentes], axis=-1)
+    soma = np.full(matriz.shape, np.nan)
+    completa = (presentes[..., janela:] - presentes[..., :-janela]) == janela
+    soma[..., janela - 1:] = np.where(completa, acumulada[..., janela:] - acumulada[..., :-janela], np.nan)
+    return soma
+
+
+class SeriesEmpresas:
+    """Matrizes empresa × mês ordenadas, com crescimentos e margem de 12 meses já calculados
+
+    Os lançamentos (diários ou mensais) são agregados uma vez por mês do campo
+    `data`, numa grade contínua de meses: o último período é a última coluna,
+    o valor de (empresa, período) é um acesso direto à matriz e as janelas
+    (mês a mês, ano a ano, 12 meses) são deslocamentos e somas acumuladas
+    vetorizadas. Tudo é calculado na construção, uma vez por versão do dataset.
+    """
+
+    def __init__(self, df):
+        if 'data' in df.columns:
+            # Ordenado por data, o 'last' de cada mês é a observação mais recente
+            df = df.iloc[np.argsort(df['data'].to_numpy(), kind='stable')]
+            periodos = df['data'].dt.to_period('M')
+        else:
+            periodos = pd.PeriodIndex(df['ano_mes'].astype(str), freq='M')
+        chaves = [df['empresa'].astype(str).rename('empresa'), pd.Series(periodos, index=df.index, name='periodo')]
+        agregado = df.groupby(chaves, sort=True).agg(
+            {**{medida: 'sum' for medida in MEDIDAS_SOMA if medida in df.columns},
+             **{medida: 'last' for medida in MEDIDAS_ULTIMO if medida in df.columns}}
+        )
+        self.empresas = agregado.index.get_level_values('empresa').unique()
+        existentes = agregado.index.get_level_values('periodo')
+        if len(existentes):
+            self.periodos = pd.period_range(existentes.min(), existentes.max(), freq='M')
+        else:
+            self.periodos = pd.PeriodIndex([], freq='M')
+
+        grade = pd.MultiIndex.from_product([self.empresas, self.periodos], names=['empresa', 'periodo'])
+        agregado = agregado.reindex(grade)
+        forma = (len(self.empresas), len(self.periodos))
+        self.matrizes = {medida: agregado[medida].to_numpy(dtype=np.float64).reshape(forma) for medida in agregado.columns}
+
+        faturamento, margem = self.matrizes['faturamento'], self.matrizes['margem_valor']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.matrizes['margem_percentual'] = margem / faturamento * 100
+            self.matrizes['margem_12m'] = _soma_movel(margem, JANELA_12M) / _soma_movel(faturamento, JANELA_12M) * 100
+        self.matrizes['crescimento_mom'] = _defasagem(faturamento, 1)
+        self.matrizes['crescimento_yoy'] = _defasagem(faturamento, JANELA_12M)
+        self._posicao_empresa = {empresa: i for i, empresa in enumerate(self.empresas)}
+
+        self.grupo = self._consolidar()
+        # Tabela do último mês, usada pelos KPIs e gráficos por empresa
+        self.ultimo = self.periodo()
+
+    def _consolidar(self):
+        """Série do grupo por mês: totais, margem média das empresas, crescimentos e margem de 12 meses"""
+        presentes = ~np.isnan(self.matrizes['faturamento'])
+        com_dado = presentes.any(axis=0)
+        totais = {
+            medida: np.where(com_dado, np.nansum(self.matrizes[medida], axis=0), np.nan)
+            for medida in MEDIDAS_SOMA + MEDIDAS_ULTIMO if medida in self.matrizes
+        }
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margem_media = np.nanmean(self.matrizes['margem_percentual'], axis=0) if presentes.size else np.array([])
+            margem_12m = _soma_movel(totais['margem_valor'], JANELA_12M) / _soma_movel(totais['faturamento'], JANELA_12M) * 100
+        return pd.DataFrame({
+            'ano_mes': self.periodos.strftime('%Y-%m'),
+            **totais,
+            'margem_media': margem_media,
+            'margem_12m': margem_12m,
+            'crescimento_mom': _defasagem(totais['faturamento'], 1),
+            'crescimento_yoy': _defasagem(totais['faturamento'], JANELA_12M),
+            'empresas': presentes.sum(axis=0),
+        })
+
+    @property
+    def ultimo_periodo(self):
+        """Último mês com dados (última coluna da grade), ou None se não há dados"""
+        return self.periodos[-1] if len(self.periodos) else None
+
+    def valor(self, empresa, periodo, medida):
+        """Medida de uma empresa num mês (NaN se não houve lançamento)"""
+        coluna = (pd.Period(periodo, freq='M') - self.periodos[0]).n
+        if empresa not in self._posicao_empresa or not 0 <= coluna < len(self.periodos):
+            return np.nan
+        return self.matrizes[medida][self._posicao_empresa[empresa], coluna]
+
+    def periodo(self, indice=-1):
+        """Empresas com dados no mês da coluna `indice` (padrão: o último), com todas as medidas"""
+        if not len(self.periodos):
+            return pd.DataFrame(columns=['empresa'] + list(self.matrizes))
+        tabela = pd.DataFrame({'empresa': self.empresas,
+                               **{medida: matriz[:, indice] for medida, matriz in self.matrizes.items()}})
+        return tabela[~np.isnan(tabela['faturamento'])].reset_index(drop=True)
+
+    def serie(self, empresa):
+        """Série mensal de uma empresa com todas as medidas"""
+        linha = self._posicao_empresa[empresa]
+        return pd.DataFrame({'ano_mes': self.periodos.strftime('%Y-%m'),
+                             **{medida: matriz[linha] for medida, matriz in self.matrizes.items()}})
@@ -0,0 +1,164 @@
+"""Snapshots colunares (Parquet) dos datasets, gerados automaticamente a partir do CSV"""
+import json
+import os
+import threading
+
+from utils.esquema import tipos_arrow
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_DISPONIVEL = True
+except ImportError:  # sem pyarrow o app continua lendo apenas os CSVs
+    PARQUET_DISPONIVEL = False
+
+# Chave dos metadados do Parquet que guarda a assinatura do CSV de origem
+CHAVE_ORIGEM = b'aircatering.origem'
+# Linhas por grupo do Parquet: grupos menores deixam os filtros descartarem mais
+# dados pelas estatísticas (ex.: intervalos de datas nas vendas ordenadas)
+LINHAS_POR_GRUPO = 131_072
+
+
+def caminho_snapshot(caminho_csv):
+    """Caminho do snapshot correspondente a um CSV (data/snapshots/<nome>.parquet)"""
+    diretorio, arquivo = os.path.split(caminho_csv)
+    nome = os.path.splitext(arquivo)[0]
+    return os.path.join(diretorio, 'snapshots', f'{nome}.parquet')
+
+
+def assinatura_csv(caminho_csv):
+    """Assinatura (mtime e tamanho) da versão atual do CSV, gravada nos metadados do snapshot"""
+    info = os.stat(caminho_csv)
+    return {'mtime_ns': info.st_mtime_ns, 'tamanho': info.st_size}
+
+
+def snapshot_atualizado(caminho_csv):
+    """True se existe snapshot gerado a partir da versão atual do CSV"""
+    if not PARQUET_DISPONIVEL:
+        return False
+    caminho = caminho_snapshot(caminho_csv)
+    if not os.path.exists(caminho):
+        return False
+    try:
+        metadados = pq.read_metadata(caminho).metadata or {}
+        origem = json.loads(metadados.get(CHAVE_ORIGEM, b'{}'))
+    except (OSError, ValueError, pa.ArrowException):
+        return False
+    return origem == assinatura_csv(caminho_csv)
+
+
+def _caminho_temporario(caminho):
+    """Arquivo temporário próprio do processo e da thread: gravações simultâneas não se misturam"""
+    return f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def salvar_snapshot(df, caminho_csv, assinatura=None):
+    """Grava o snapshot Parquet de um dataset já tipado, vinculado à versão do CSV lida
+
+    `assinatura` é a de assinatura_csv() tomada antes da leitura que gerou df
+    (padrão: a atual). Se o CSV mudou desde então, df não corresponde mais a ele
+    e o snapshot não é gravado. Retorna False (sem erro) nesse caso, quando o
+    pyarrow não está instalado ou o diretório não pode ser escrito: o CSV
+    continua sendo a fonte dos dados.
+    """
+    if not PARQUET_DISPONIVEL:
+        return False
+    if assinatura is None:
+        assinatura = assinatura_csv(caminho_csv)
+    caminho = caminho_snapshot(caminho_csv)
+    temporario = _caminho_temporario(caminho)
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        metadados = dict(tabela.schema.metadata or {})
+        metadados[CHAVE_ORIGEM] = json.dumps(assinatura).encode()
+        pq.write_table(tabela.replace_schema_metadata(metadados), temporario,
+                       row_group_size=LINHAS_POR_GRUPO)
+        if assinatura_csv(caminho_csv) != assinatura:
+            os.remove(temporario)
+            return False
+        # Troca atômica: leitores em outros processos nunca veem um arquivo pela metade
+        os.replace(temporario, caminho)
+    except OSError:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        return False
+    return True
+
+
+class EscritorSnapshot:
+    """Grava o snapshot de um dataset em lotes, sem manter o dataset inteiro em memória
+
+    O esquema Arrow é fixado pelo primeiro lote e os seguintes são convertidos
+    para ele. A assinatura do CSV só é gravada em finalizar(), depois que o CSV
+    estiver completo; até lá o snapshot fica num arquivo temporário.
+    """
+
+    def __init__(self, caminho_csv):
+        self.caminho_csv = caminho_csv
+        self.caminho = caminho_snapshot(caminho_csv)
+        self.temporario = _caminho_temporario(self.caminho)
+        self._escritor = None
+        self._esquema = None
+
+    def escrever(self, df):
+        """Acrescenta um lote (já tipado pelo esquema do dataset)"""
+        if not PARQUET_DISPONIVEL:
+            return
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        if self._escritor is None:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            self._esquema = tabela.schema
+            self._escritor = pq.ParquetWriter(self.temporario, self._esquema)
+        else:
+            tabela = tabela.cast(self._esquema)
+        self._escritor.write_table(tabela, row_group_size=LINHAS_POR_GRUPO)
+
+    def finalizar(self):
+        """Vincula o snapshot ao CSV já gravado e o publica com troca atômica"""
+        if self._escritor is None:
+            return False
+        self._escritor.add_key_value_metadata(
+            {CHAVE_ORIGEM: json.dumps(assinatura_csv(self.caminho_csv)).encode()}
+        )
+        self._escritor.close()
+        self._escritor = None
+        os.replace(self.temporario, self.caminho)
+        return True
+
+    def descartar(self):
+        """Abandona um snapshot incompleto (por exemplo após um erro na geração)"""
+        if self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+        if os.path.exists(self.temporario):
+            os.remove(self.temporario)
+
+
+def colunas_snapshot(caminho_csv):
+    """Nomes das colunas gravadas no snapshot de um CSV"""
+    return pq.read_schema(caminho_snapshot(caminho_csv)).names
+
+
+def ler_snapshot(caminho_csv, colunas=None, filtros=None):
+    """Lê o snapshot de um CSV como DataFrame
+
+    `colunas` limita as colunas lidas do arquivo e `filtros` (lista de
+    (coluna, operador, valor), combinados com E) é avaliado pelo pyarrow, que
+    descarta grupos de linhas inteiros pelas estatísticas de mínimo e máximo.
+    """
+    tabela = pq.read_table(caminho_snapshot(caminho_csv), columns=colunas, filters=filtros or None)
+    # Os metadados pandas do arquivo não sabem reconstruir ids binários de tamanho fixo;
+    # o mapeamento de tipos do esquema devolve textos e ids já nos dtypes compactos
+    return tabela.to_pandas(ignore_metadata=True, types_mapper=tipos_arrow)
+
+
+def ler_snapshot_em_blocos(caminho_csv, colunas=None, tamanho_bloco=LINHAS_POR_GRUPO):
+    """Lê o snapshot de um CSV em DataFrames de até `tamanho_bloco` linhas, um de cada vez
+
+    Só um lote de cada coluna pedida fica em memória por vez (o pyarrow lê os
+    grupos de linhas do arquivo sob demanda).
+    """
+    arquivo = pq.ParquetFile(caminho_snapshot(caminho_csv))
+    for lote in arquivo.iter_batches(batch_size=tamanho_bloco, columns=colunas):
+        yield pa.Table.from_batches([lote]).to_pandas(ignore_metadata=True, types_mapper=tipos_arrow)
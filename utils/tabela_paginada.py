@@ -0,0 +1,108 @@
+"""Tabela paginada no servidor: só a página visível é estilizada e enviada ao navegador"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+
+from utils.cache_figuras import normalizar_parametros
+from utils.camada_dados import cache_datasets
+from utils.instrumentacao import trecho
+
+TAMANHOS_PAGINA = [25, 50, 100, 250]
+
+# Ordenações recentes, compartilhadas entre reruns e sessões:
+# (tabela, marcas dos datasets, filtros, coluna, ascendente) -> (linhas, posições)
+_MAX_ORDENACOES = 8
+_ordenacoes = OrderedDict()
+_lock_ordenacoes = threading.Lock()
+
+
+def limpar_ordenacoes():
+    """Descarta as ordenações memorizadas"""
+    with _lock_ordenacoes:
+        _ordenacoes.clear()
+
+
+def ordenar_posicoes(df, coluna, ascendente, chave=None):
+    """Posições das linhas de df ordenadas pela coluna
+
+    Com `chave` (que identifica o conteúdo de df, ver mostrar_tabela_paginada),
+    o resultado é memorizado e reaproveitado por frames recriados a cada rerun.
+    """
+    if chave is not None:
+        chave = (*chave, coluna, ascendente)
+        with _lock_ordenacoes:
+            # O número de linhas confirma que as posições servem para este df
+            if chave in _ordenacoes and _ordenacoes[chave][0] == len(df):
+                _ordenacoes.move_to_end(chave)
+                return _ordenacoes[chave][1]
+
+    serie = df[coluna].reset_index(drop=True)
+    if serie.is_monotonic_increasing:
+        posicoes = np.arange(len(df))
+        if not ascendente:
+            posicoes = posicoes[::-1]
+    else:
+        posicoes = serie.sort_values(ascending=ascendente, kind='stable', na_position='last').index.to_numpy()
+
+    if chave is not None:
+        with _lock_ordenacoes:
+            _ordenacoes[chave] = (len(df), posicoes)
+            while len(_ordenacoes) > _MAX_ORDENACOES:
+                _ordenacoes.popitem(last=False)
+    return posicoes
+
+
+def mostrar_tabela_paginada(df, chave, datasets=None, filtros=None, ordenar_por=None, ascendente=True,
+                            formatar=None, estilo=None):
+    """Mostra df em páginas: ordena e fatia no servidor e envia só a janela visível
+
+    df é descrito pelos `datasets` de que foi calculado e pelos `filtros` aplicados
+    (como em mostrar_grafico): com eles a ordenação é memorizada pela versão dos
+    dados entregue a este rerun, e não pelo objeto df, que cada rerun recria. formatar recebe a janela
+    (DataFrame) e estilo recebe o Styler da janela, então conversões e formatação
+    condicional custam o tamanho da página, não da tabela.
+    """
+    colunas = list(df.columns)
+    total = len(df)
+
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        indice_coluna = colunas.index(ordenar_por) if ordenar_por in colunas else 0
+        coluna = st.selectbox("Ordenar por", colunas, index=indice_coluna, key=f"{chave}_ordenar_por")
+    with col2:
+        direcao = st.selectbox("Ordem", ["Crescente", "Decrescente"],
+                               index=0 if ascendente else 1, key=f"{chave}_direcao")
+    with col3:
+        tamanho = st.selectbox("Linhas por página", TAMANHOS_PAGINA, index=1, key=f"{chave}_tamanho")
+
+    num_paginas = max(1, math.ceil(total / tamanho))
+    chave_pagina = f"{chave}_pagina"
+    # Filtros podem encolher a tabela: mantém a página escolhida dentro do novo limite
+    if st.session_state.get(chave_pagina, 1) > num_paginas:
+        st.session_state[chave_pagina] = num_paginas
+    with col4:
+        pagina = st.number_input("Página", min_value=1, max_value=num_paginas, value=1,
+                                 step=1, key=chave_pagina)
+
+    inicio = (int(pagina) - 1) * tamanho
+    fim = min(inicio + tamanho, total)
+    memo = None
+    if datasets is not None:
+        marcas = cache_datasets.marcas_lidas(datasets)
+        # Dataset não lido neste rerun (marca None): não há versão que identifique df
+        if None not in marcas:
+            memo = (chave, marcas, normalizar_parametros(filtros or {}))
+    posicoes = ordenar_posicoes(df, coluna, direcao == "Crescente", memo)[inicio:fim]
+    janela = df.iloc[posicoes]
+    if formatar is not None:
+        janela = formatar(janela)
+
+    with trecho('render', chave):
+        st.dataframe(estilo(janela.style) if estilo is not None else janela, use_container_width=True)
+    if total:
+        st.caption(f"Exibindo {inicio + 1:,}–{fim:,} de {total:,} registros · página {int(pagina)} de {num_paginas}")
+    else:
+        st.caption("Nenhum registro encontrado")
@@ -0,0 +1,87 @@
+"""Indicadores de quadro de pessoal e turnover do RH, calculados sem laços por departamento"""
+import numpy as np
+import pandas as pd
+
+# Quebras do quadro: agrupadas uma única vez, as demais visões são somas dessa tabela
+DIMENSOES_QUADRO = ['departamento', 'cargo', 'nivel']
+
+
+def desligados(df):
+    """Máscara dos funcionários desligados: status 'Inativo' ou data de desligamento preenchida"""
+    mascara = (df['status'] == 'Inativo').to_numpy()
+    if 'data_desligamento' in df.columns:
+        mascara |= df['data_desligamento'].notna().to_numpy()
+    return mascara
+
+
+def _com_turnover(tabela):
+    tabela['salario_medio'] = tabela['salario'] / tabela['funcionarios']
+    tabela['turnover'] = (tabela['desligados'] / tabela['funcionarios'] * 100).fillna(0.0)
+    return tabela.drop(columns='salario')
+
+
+def quadro(df):
+    """Funcionários, desligados, salário médio e turnover por departamento e por cargo × nível
+
+    Um único groupby por departamento × cargo × nível percorre as linhas; as
+    visões por departamento e por cargo × nível somam essa tabela pequena.
+    """
+    dimensoes = [coluna for coluna in DIMENSOES_QUADRO if coluna in df.columns]
+    base = pd.DataFrame({'desligados': desligados(df), 'salario': df['salario'].to_numpy()}, index=df.index)
+    base = base.groupby([df[coluna] for coluna in dimensoes], observed=True).agg(
+        funcionarios=('desligados', 'size'),
+        desligados=('desligados', 'sum'),
+        salario=('salario', 'sum'),
+    )
+    por_departamento = _com_turnover(base.groupby(level='departamento', observed=True).sum())
+    por_cargo_nivel = None
+    if {'cargo', 'nivel'} <= set(dimensoes):
+        por_cargo_nivel = _com_turnover(base.groupby(level=['cargo', 'nivel'], observed=True).sum()).reset_index()
+    return por_departamento, por_cargo_nivel
+
+
+def tempo_medio_empresa(df, hoje=None):
+    """Tempo médio de casa em anos (até o desligamento, ou até hoje para quem está ativo)"""
+    hoje = pd.Timestamp(hoje) if hoje is not None else pd.Timestamp.today().normalize()
+    if 'data_desligamento' in df.columns:
+        saida = df['data_desligamento'].fillna(hoje)
+    else:
+        saida = pd.Series(hoje, index=df.index)
+    dias = (saida - df['data_admissao']).dt.days.mean()
+    return 0.0 if pd.isna(dias) else dias / 365.25
+
+
+def turnover_mensal(df, meses=12, hoje=None):
+    """Admissões, desligamentos, quadro e turnover real de cada um dos últimos `meses` meses
+
+    O quadro no início de cada mês é o número de admitidos antes dele menos o de
+    desligados antes dele: com as datas ordenadas uma vez, cada mês custa duas
+    buscas binárias. Turnover = desligamentos / quadro médio do mês × 100.
+    Retorna None se o arquivo não tem a coluna data_desligamento.
+    """
+    if 'data_desligamento' not in df.columns:
+        return None
+    hoje = pd.Timestamp(hoje) if hoje is not None else pd.Timestamp.today().normalize()
+    periodos = pd.period_range(end=hoje.to_period('M'), periods=meses, freq='M')
+    inicios = periodos.start_time.to_numpy()
+    fins = (periodos + 1).start_time.to_numpy()
+
+    admissoes = np.sort(df['data_admissao'].dropna().to_numpy())
+    saidas = np.sort(df['data_desligamento'].dropna().to_numpy())
+
+    def antes(datas, limites):
+        return np.searchsorted(datas, limites, side='left')
+
+    quadro_inicio = antes(admissoes, inicios) - antes(saidas, inicios)
+    quadro_fim = antes(admissoes, fins) - antes(saidas, fins)
+    saidas_mes = antes(saidas, fins) - antes(saidas, inicios)
+    quadro_medio = (quadro_inicio + quadro_fim) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        turnover = np.where(quadro_medio > 0, saidas_mes / quadro_medio * 100, 0.0)
+    return pd.DataFrame({
+        'mes': periodos.strftime('%Y-%m'),
+        'quadro': quadro_fim,
+        'admissoes': antes(admissoes, fins) - antes(admissoes, inicios),
+        'desligamentos': saidas_mes,
+        'turnover': turnover,
+    })